@@ -0,0 +1,250 @@
+import time
+
+_STARTED = time.perf_counter()
+
+import argparse  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+
+from typing import Dict, List, Tuple  # noqa: E402
+
+# Modules that are slow to import and that only the interface or packet export should load
+HEAVY_MODULES = ('scapy', 'tkinter', 'numpy')
+STARTUP_MODULES = ('fyre.fyre_scenario', 'fyre.fyre_optimizer', 'fyre.fyre_replay')
+# The longest any of the startup modules may take to import, in milliseconds
+STARTUP_BUDGET_MS = 250.0
+
+
+class Timings:
+    """
+    The time spent in each phase of a command, for the --timings breakdown.
+    """
+    def __init__(self):
+        self.phases: List[Tuple[str, float]] = []
+        self.last = _STARTED
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def format(self) -> str:
+        lines = [f"{phase:<32}{seconds * 1000:>10.1f} ms" for phase, seconds in self.phases]
+        lines.append(f"{'total':<32}{sum(seconds for _, seconds in self.phases) * 1000:>10.1f} ms")
+        loaded = [module for module in HEAVY_MODULES if module in sys.modules]
+        lines.append(f"heavy modules loaded: {', '.join(loaded) if loaded else 'none'}")
+        return "\n".join(lines)
+
+
+def load(path: str, timings: Timings):
+    from fyre.fyre_scenario import load_scenario
+    timings.mark("import fyre")
+    platform = load_scenario(path)
+    timings.mark("load scenario")
+    return platform
+
+
+def command_run(args, timings: Timings) -> int:
+    platform = load(args.scenario, timings)
+    from fyre.common.fyre_events import WARNING
+    from fyre.fyre_bench import generate_traffic
+    platform.events.level = WARNING
+    if not platform.clients or not platform.servers:
+        print("The scenario needs at least one client and one server to generate traffic.")
+        return 1
+    traffic = generate_traffic(platform, args.packets, args.mix, args.seed)
+    timings.mark("generate traffic")
+
+    from fyre.common.fyre_packet import FyrePacket
+    allowed = 0
+    for client, ip, dport, sport in traffic:
+        typehint, destination = platform.get_fyre_component_by_ip(ip)
+        allowed += destination.receive_packet(FyrePacket(client.ip, ip, sport, dport))
+    timings.mark("deliver packets")
+
+    print(f"{len(traffic)} packets: {allowed} allowed, {len(traffic) - allowed} dropped")
+    for firewall in platform.firewalls:
+        counters = firewall.metrics.counters
+        print(f"{firewall.name}: {counters['packets']} checked, {counters['allowed']} allowed, "
+              f"{counters['dropped']} dropped")
+    return 0
+
+
+def command_check(args, timings: Timings) -> int:
+    platform = load(args.scenario, timings)
+    from fyre.fyre_optimizer import optimize_configuration, verify
+    timings.mark("import optimizer")
+
+    findings = 0
+    for firewall in platform.firewalls:
+        if args.firewall and firewall.name != args.firewall:
+            continue
+        original = firewall.configuration()
+        optimized, report = optimize_configuration(original)
+        mismatches = verify(original, optimized, count=args.verify)
+        findings += len(report.findings)
+        print(f"== {firewall.name}")
+        print(report.format())
+        print(f"verified on {args.verify} sample packets: "
+              f"{'equivalent' if not mismatches else f'{len(mismatches)} different verdicts'}")
+        if mismatches:
+            return 2
+    timings.mark("check rules")
+    return 1 if args.strict and findings else 0
+
+
+def command_flow(args, timings: Timings) -> int:
+    platform = load(args.scenario, timings)
+    from fyre.common.fyre_rules import ALLOW, parse_protocol
+    typehint, destination = platform.get_fyre_component_by_ip(args.dst)
+    protocol = parse_protocol(args.protocol)
+
+    path = platform.firewalls_between(args.src, destination)
+    print(f"{args.src} -> {destination.name} ({args.dst}) port {args.dport}: "
+          f"{' -> '.join(firewall.name for firewall in path) if path else 'no firewalls'}")
+    verdict = ALLOW
+    for firewall in path:
+        verdict, index = firewall.ruleset.match(args.src, args.dst, args.sport, args.dport, protocol)
+        rule = firewall.ruleset.rules[index] if index >= 0 else 'default'
+        print(f"  {firewall.name}: {verdict} ({rule})")
+        if verdict != ALLOW:
+            break
+    timings.mark("evaluate flow")
+    print(verdict)
+    return 0 if verdict == ALLOW else 1
+
+
+def command_replay(args, timings: Timings) -> int:
+    platform = load(args.scenario, timings)
+    from fyre.common.fyre_events import WARNING
+    from fyre.fyre_replay import replay
+    platform.events.level = WARNING
+    stats = replay(platform, args.capture, args.realtime, args.speed)
+    timings.mark("replay capture")
+    print(', '.join(f"{key}: {value}" for key, value in stats.to_dict().items()))
+    return 0
+
+
+def measure_import(module: str, repeat: int = 3) -> Tuple[float, Dict[str, int]]:
+    """
+    Imports a module in fresh interpreters and measures how long it takes.
+    :param module:  the module to import
+    :param repeat:  the number of interpreters to start; the fastest run is kept
+    :return:        the import time in seconds of the fastest run, and the time in microseconds spent importing each
+                    top-level package in that run
+    """
+    import subprocess
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+    best, packages = None, {}
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], env=environment,
+                                capture_output=True, text=True, check=True)
+        totals: Dict[str, int] = {}
+        for line in result.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            if not line.startswith('import time:') or line.endswith('imported package'):
+                continue
+            self_us, _, name = line[len('import time:'):].split('|')
+            package = name.strip().split('.')[0]
+            totals[package] = totals.get(package, 0) + int(self_us)
+        elapsed = sum(totals.values()) / 1e6
+        if best is None or elapsed < best:
+            best, packages = elapsed, totals
+    return best, packages
+
+
+def check_startup(modules=STARTUP_MODULES, budget: float = STARTUP_BUDGET_MS, repeat: int = 3) -> List[str]:
+    """
+    Checks that modules import within a time budget without loading any of the heavy modules.
+    :param modules: the modules to import
+    :param budget:  the longest an import may take, in milliseconds, or None for no limit
+    :param repeat:  the number of interpreters to start per module; the fastest run is kept
+    :return:        a description of every problem found
+    """
+    problems = []
+    for module in modules:
+        elapsed, packages = measure_import(module, repeat)
+        heavy = [package for package in HEAVY_MODULES if package in packages]
+        if heavy:
+            problems.append(f"{module} loads {', '.join(heavy)}")
+        if budget is not None and elapsed * 1000 > budget:
+            problems.append(f"{module} takes {elapsed * 1000:.1f} ms to import, over the budget of {budget:.0f} ms")
+    return problems
+
+
+def command_startup(args, timings: Timings) -> int:
+    failed = False
+    for module in args.modules or STARTUP_MODULES:
+        elapsed, packages = measure_import(module, args.repeat)
+        heavy = [package for package in HEAVY_MODULES if package in packages]
+        print(f"{module}: {elapsed * 1000:.1f} ms" + (f" (loads {', '.join(heavy)})" if heavy else ""))
+        for package, microseconds in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+            print(f"  {package:<28}{microseconds / 1000:>8.1f} ms")
+        if heavy:
+            failed = True
+        if args.budget is not None and elapsed * 1000 > args.budget:
+            print(f"  over the budget of {args.budget:.0f} ms")
+            failed = True
+    return 1 if failed else 0
+
+
+def main(argv: List[str] = None) -> int:
+    timings = Timings()
+    parser = argparse.ArgumentParser(description="Runs FyreFyre scenarios and rule checks without the interface.")
+    parser.add_argument('--timings', action='store_true', help="print how long each phase of the command took")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="send generated traffic through a scenario")
+    run.add_argument('scenario')
+    run.add_argument('--packets', type=int, default=10000)
+    run.add_argument('--mix', choices=('uniform', 'skewed'), default='uniform')
+    run.add_argument('--seed', type=int, default=0)
+    run.set_defaults(handler=command_run)
+
+    check = commands.add_parser('check', help="find duplicate, shadowed and redundant rules")
+    check.add_argument('scenario')
+    check.add_argument('--firewall', help="only check the firewall with this name")
+    check.add_argument('--verify', type=int, default=10000, help="sample packets to verify the optimized rules on")
+    check.add_argument('--strict', action='store_true', help="exit with status 1 if anything was found")
+    check.set_defaults(handler=command_check)
+
+    flow = commands.add_parser('flow', help="show the firewalls a flow passes and their verdicts")
+    flow.add_argument('scenario')
+    flow.add_argument('src')
+    flow.add_argument('dst')
+    flow.add_argument('dport', type=int)
+    flow.add_argument('--sport', type=int, default=40000)
+    flow.add_argument('--protocol', default='tcp')
+    flow.set_defaults(handler=command_flow)
+
+    replay = commands.add_parser('replay', help="replay a pcap or pcapng capture through a scenario")
+    replay.add_argument('scenario')
+    replay.add_argument('capture')
+    replay.add_argument('--realtime', action='store_true')
+    replay.add_argument('--speed', type=float, default=1.0)
+    replay.set_defaults(handler=command_replay)
+
+    startup = commands.add_parser('startup', help="measure import times in fresh interpreters")
+    startup.add_argument('modules', nargs='*', help=f"the modules to import (default: {', '.join(STARTUP_MODULES)})")
+    startup.add_argument('--budget', type=float, default=STARTUP_BUDGET_MS,
+                         help=f"exit with status 1 if any import takes longer, in ms (default {STARTUP_BUDGET_MS:.0f})")
+    startup.add_argument('--repeat', type=int, default=3)
+    startup.add_argument('--top', type=int, default=5, help="the number of slowest packages to list")
+    startup.set_defaults(handler=command_startup)
+
+    args = parser.parse_args(argv)
+    timings.mark("cli imports and arguments")
+    try:
+        status = args.handler(args, timings)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        status = 1
+    if args.timings:
+        print(timings.format())
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+from collections import OrderedDict
+
+
+class VerdictCache:
+    """
+    A bounded least-recently-used cache of firewall verdicts. Every entry belongs to the rule generation it was
+    computed under, and the whole cache is dropped as soon as it is asked about a newer generation, so a verdict from
+    an old ruleset is never served.
+    """
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self.entries: OrderedDict = OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, generation: int):
+        """
+        Gets a cached verdict.
+        :param key:         the flow key
+        :param generation:  the current rule generation
+        :return:            the verdict, or None if it is not cached for this generation
+        """
+        if generation != self.generation:
+            if self.entries:
+                self.entries.clear()
+                self.invalidations += 1
+            self.generation = generation
+        verdict = self.entries.get(key)
+        if verdict is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return verdict
+
+    def put(self, key, verdict):
+        """
+        Caches a verdict for the current generation, evicting the least recently used verdict if the cache is full.
+        :param key:         the flow key
+        :param verdict:     the verdict
+        """
+        if key in self.entries:
+            self.entries.move_to_end(key)
+        elif len(self.entries) >= self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        self.entries[key] = verdict
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "capacity": self.max_entries,
+            "generation": self.generation,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
@@ -1,7 +1,9 @@
 import random
+import time
 
-from scapy.layers.inet import TCP, IP
-from scapy.packet import Raw
+from fyre.common.fyre_events import INFO
+from fyre.common.fyre_metrics import FyreMetrics
+from fyre.common.fyre_packet import FyrePacket, as_fyre_packet
 
 
 def generate_ip_address() -> str:
@@ -9,27 +11,101 @@ def generate_ip_address() -> str:
 
 
 class FyreComponent:
-    def __init__(self, platform, parent_ui_component):
+    def __init__(self, platform):
         self.platform = platform
-        self.parent_ui_component = parent_ui_component
+        self.parent_ui_component = None
+        self.canvas = None
+        self.metrics = FyreMetrics()
 
     def __str__(self):
+        if self.parent_ui_component is None:
+            return f"{self.__class__.__name__} {getattr(self, 'name', '')}"
         return f"{self.__class__.__name__} {self.parent_ui_component}"
 
-    def send_packet(self, ip: str, port: int, sport: int, content):
-        packet = IP(dst=ip)/TCP(sport=sport, dport=port,flags='S')/Raw(load=content)
-        typehint, destination = self.platform.get_fyre_component_by_ip(ip)
-        if destination:
-            destination.receive_packet(packet)
-        else:
-            raise ValueError(f"Destination IP {ip} not found.")
-
-    def receive_packet(self, packet):
-        firewall = self.platform.determine_if_component_is_within_firewall(self)
-        if firewall:
-            firewall.process_packet(packet)
-        else:
+    @property
+    def has_view(self) -> bool:
+        return self.parent_ui_component is not None
+
+    def attach_view(self, canvas, fyre_ui_component):
+        """
+        Attaches a UI view to this component. Components work headless without a view, in which case firewall
+        membership must be declared on the platform instead of inferred from frame geometry.
+        :param canvas:              the canvas the view is drawn on
+        :param fyre_ui_component:   the UI component to display this component in
+        """
+        self.canvas = canvas
+        self.parent_ui_component = fyre_ui_component
+        self.parent_ui_component.on_geometry_change(lambda: self.platform.invalidate_containment(self))
+        self.build_view()
+        self.platform.invalidate_containment(self)
+
+    def build_view(self):
+        """
+        Adds the widgets of this component to its UI component. Overridden by subclasses.
+        """
+        pass
+
+    def send_packet(self, ip: str, port: int, sport: int, content, flags: str = 'S'):
+        """
+        Sends a packet to the component with the given IP. If the platform has a scheduler, the packet is queued on the
+        link to the destination and delivered in virtual time, otherwise it is delivered immediately.
+        :param ip:      the destination IP
+        :param port:    the destination port
+        :param sport:   the source port
+        :param content: the payload
+        :param flags:   the TCP flags
+        :return:        False if the packet was dropped because the link's queue was full, True otherwise
+        """
+        scheduler = self.platform.scheduler
+        packet = FyrePacket(getattr(self, 'ip', '0.0.0.0'), ip, sport, port, flags=flags, load=content,
+                            timestamp=scheduler.now if scheduler else 0.0)
+        if not self.platform.metrics_enabled:
+            return self._deliver(packet)
+        start = time.perf_counter_ns()
+        sent = self._deliver(packet)
+        self.metrics.observe('send_packet', time.perf_counter_ns() - start)
+        self.metrics.counters['packets_sent' if sent else 'send_dropped'] += 1
+        self.metrics.counters['bytes_sent'] += len(packet)
+        return sent
+
+    def _deliver(self, packet) -> bool:
+        typehint, destination = self.platform.get_fyre_component_by_ip(packet.dst)
+        if not destination:
+            raise ValueError(f"Destination IP {packet.dst} not found.")
+        scheduler = self.platform.scheduler
+        if scheduler:
+            sent = scheduler.transmit(self, destination, packet)
+            traffic = self.platform.traffic
+            if not sent and traffic is not None:
+                traffic.record(packet.src, packet.dst, len(packet), False)
+            return sent
+        destination.receive_packet(packet)
+        return True
+
+    def receive_packet(self, packet) -> bool:
+        """
+        Receives a packet, passing it through every firewall between its source and this component, outermost first,
+        and processes it if every firewall allowed it.
+        :param packet:  a fyre packet or a scapy packet
+        :return:        False if a firewall dropped the packet, True otherwise
+        """
+        # Scapy frames are converted first, so the zone lookup uses the IP source rather than the link-layer one
+        packet = as_fyre_packet(packet)
+        if self.platform.metrics_enabled:
+            self.metrics.counters['packets_received'] += 1
+            self.metrics.counters['bytes_received'] += len(packet)
+        firewall, allowed = None, True
+        for firewall in self.platform.firewalls_between(packet.src, self):
+            if not firewall.process_packet(packet):
+                allowed = False
+                break
+        if allowed:
             self.process_packet(packet)
+        traffic = self.platform.traffic
+        if traffic is not None:
+            traffic.record(packet.src, packet.dst, len(packet), allowed, firewall)
+        return allowed
 
     def process_packet(self, packet):
-        print(f"Packet processed by {self}: {packet.summary()}")
+        self.platform.events.emit(INFO, 'processed', "Packet processed by {component}: {packet}", component=self,
+                                  packet=packet)
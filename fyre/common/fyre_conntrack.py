@@ -0,0 +1,214 @@
+import sys
+
+from collections import Counter, OrderedDict
+from typing import List, Optional, Set
+
+from fyre.common.fyre_rules import PROTOCOLS
+
+NEW = 'new'
+SYN_SENT = 'syn_sent'
+SYN_RECEIVED = 'syn_received'
+ESTABLISHED = 'established'
+CLOSING = 'closing'
+
+
+class FyreConnection:
+    """
+    A tracked flow. The key is the 5-tuple of the packet that opened it, so packets in the reply direction match it
+    reversed.
+    """
+    __slots__ = ('key', 'state', 'last_seen', 'packets', 'bytes', 'slot')
+
+    def __init__(self, key: tuple, state: str, now: float):
+        self.key = key
+        self.state = state
+        self.last_seen = now
+        self.packets = 0
+        self.bytes = 0
+        self.slot = -1
+
+
+def _next_tcp_state(state: str, flags: str, reply: bool) -> Optional[str]:
+    """
+    Gets the state of a TCP connection after a packet.
+    :param state:   the current state
+    :param flags:   the TCP flags of the packet
+    :param reply:   True if the packet travels in the reply direction
+    :return:        the new state, or None if the connection is closed
+    """
+    if 'R' in flags:
+        return None
+    if 'F' in flags:
+        return CLOSING
+    if state == SYN_SENT and reply and 'S' in flags and 'A' in flags:
+        return SYN_RECEIVED
+    if state == SYN_RECEIVED and not reply and 'A' in flags:
+        return ESTABLISHED
+    if state == SYN_SENT and 'A' in flags and 'S' not in flags:
+        return ESTABLISHED
+    return state
+
+
+class ConnectionTracker:
+    """
+    A table of the flows a firewall has allowed, keyed by 5-tuple. Packets belonging to a tracked flow can skip rule
+    evaluation. Idle flows are expired by a timer wheel, and the least recently used flow is evicted when the table is
+    full.
+    """
+    def __init__(self, max_connections: int = 65536, idle_timeout: float = 300.0, tick: float = 1.0,
+                 wheel_size: int = 512):
+        """
+        :param max_connections:     the hard cap on tracked flows
+        :param idle_timeout:        how long a flow may go without packets before it is evicted, in seconds
+        :param tick:                the resolution of the timer wheel, in seconds
+        :param wheel_size:          the number of slots in the timer wheel
+        """
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.tick = tick
+        self.connections: OrderedDict = OrderedDict()
+        self.wheel: List[Set[tuple]] = [set() for _ in range(wheel_size)]
+        self.current_tick = None
+        self.hits = 0
+        self.misses = 0
+        self.idle_evictions = 0
+        self.lru_evictions = 0
+        self.closed = 0
+
+    def __len__(self):
+        return len(self.connections)
+
+    def _schedule(self, connection: FyreConnection):
+        expiry_tick = int((connection.last_seen + self.idle_timeout) // self.tick)
+        if self.current_tick is not None:
+            # Slots up to the current tick have already been drained and are not visited again until the wheel wraps
+            expiry_tick = max(expiry_tick, self.current_tick + 1)
+        slot = expiry_tick % len(self.wheel)
+        if slot != connection.slot:
+            if connection.slot >= 0:
+                self.wheel[connection.slot].discard(connection.key)
+            self.wheel[slot].add(connection.key)
+            connection.slot = slot
+
+    def _remove(self, connection: FyreConnection):
+        del self.connections[connection.key]
+        self.wheel[connection.slot].discard(connection.key)
+
+    def expire(self, now: float):
+        """
+        Advances the timer wheel to the given time, evicting flows that have been idle for longer than the timeout.
+        Flows that were seen since they were scheduled, or that expire later within the current tick, are moved to the
+        slot of their new expiry instead.
+        :param now: the current time, in seconds
+        """
+        now_tick = int(now // self.tick)
+        if self.current_tick is None:
+            self.current_tick = now_tick
+        if now_tick <= self.current_tick:
+            return
+        start = max(self.current_tick + 1, now_tick - len(self.wheel) + 1)
+        self.current_tick = now_tick
+        for tick in range(start, now_tick + 1):
+            slot = self.wheel[tick % len(self.wheel)]
+            for key in list(slot):
+                connection = self.connections[key]
+                if connection.last_seen + self.idle_timeout <= now:
+                    self._remove(connection)
+                    self.idle_evictions += 1
+                else:
+                    self._schedule(connection)
+
+    def lookup(self, packet, now: float) -> Optional[FyreConnection]:
+        """
+        Finds the tracked flow a packet belongs to in either direction, and updates its state.
+        :param packet:  the fyre packet
+        :param now:     the current time, in seconds
+        :return:        the flow, or None if the packet does not belong to a tracked flow
+        """
+        self.expire(now)
+        key = (packet.src, packet.dst, packet.sport, packet.dport, packet.proto)
+        reply = False
+        connection = self.connections.get(key)
+        if connection is None:
+            connection = self.connections.get((packet.dst, packet.src, packet.dport, packet.sport, packet.proto))
+            reply = True
+        if connection is not None and connection.last_seen + self.idle_timeout <= now:
+            # The flow went idle between two ticks of the wheel
+            self._remove(connection)
+            self.idle_evictions += 1
+            connection = None
+        if connection is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        connection.packets += 1
+        connection.bytes += len(packet)
+        connection.last_seen = now
+        if packet.proto == PROTOCOLS['tcp']:
+            state = _next_tcp_state(connection.state, packet.flags, reply)
+            if state is None:
+                self._remove(connection)
+                self.closed += 1
+                return connection
+            connection.state = state
+        elif reply:
+            connection.state = ESTABLISHED
+        self.connections.move_to_end(connection.key)
+        self._schedule(connection)
+        return connection
+
+    def open(self, packet, now: float) -> FyreConnection:
+        """
+        Starts tracking the flow of a packet the rules allowed. If the table is full, the least recently used flow is
+        evicted.
+        :param packet:  the fyre packet
+        :param now:     the current time, in seconds
+        :return:        the new flow
+        """
+        key = (packet.src, packet.dst, packet.sport, packet.dport, packet.proto)
+        if packet.proto == PROTOCOLS['tcp']:
+            state = SYN_SENT if 'S' in packet.flags and 'A' not in packet.flags else ESTABLISHED
+        else:
+            state = NEW
+        while len(self.connections) >= self.max_connections:
+            _, evicted = self.connections.popitem(last=False)
+            self.wheel[evicted.slot].discard(evicted.key)
+            self.lru_evictions += 1
+        connection = FyreConnection(key, state, now)
+        connection.packets, connection.bytes = 1, len(packet)
+        self.connections[key] = connection
+        self._schedule(connection)
+        return connection
+
+    def clear(self):
+        """
+        Stops tracking every flow.
+        """
+        self.connections.clear()
+        for slot in self.wheel:
+            slot.clear()
+
+    def stats(self) -> dict:
+        """
+        Gets the occupancy of the table and an estimate of its memory use.
+        :return:    a dictionary of table statistics
+        """
+        memory = sys.getsizeof(self.connections) + sum(sys.getsizeof(slot) for slot in self.wheel)
+        if self.connections:
+            connection = next(iter(self.connections.values()))
+            per_connection = sys.getsizeof(connection) + sys.getsizeof(connection.key) + \
+                sum(sys.getsizeof(field) for field in connection.key)
+            memory += per_connection * len(self.connections)
+        return {
+            "connections": len(self.connections),
+            "capacity": self.max_connections,
+            "occupancy": len(self.connections) / self.max_connections if self.max_connections else 0.0,
+            "states": dict(Counter(connection.state for connection in self.connections.values())),
+            "hits": self.hits,
+            "misses": self.misses,
+            "idle_evictions": self.idle_evictions,
+            "lru_evictions": self.lru_evictions,
+            "closed": self.closed,
+            "memory_bytes": memory
+        }
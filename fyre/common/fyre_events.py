@@ -0,0 +1,162 @@
+import json
+import threading
+import time
+
+from collections import deque
+from typing import List
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+LEVEL_NAMES = {DEBUG: 'debug', INFO: 'info', WARNING: 'warning'}
+
+
+def _text(value) -> str:
+    if isinstance(value, bytes):
+        return value.decode(errors='replace')
+    return str(value)
+
+
+class FyreEvent:
+    """
+    A structured event. The message is only formatted from its template and fields when something reads it.
+    """
+    __slots__ = ('timestamp', 'level', 'kind', 'template', 'fields')
+
+    def __init__(self, timestamp: float, level: int, kind: str, template: str, fields: dict):
+        self.timestamp = timestamp
+        self.level = level
+        self.kind = kind
+        self.template = template
+        self.fields = fields
+
+    @property
+    def message(self) -> str:
+        return self.template.format(**{key: _text(value) for key, value in self.fields.items()})
+
+    def to_dict(self) -> dict:
+        return {
+            "timestamp": self.timestamp,
+            "level": LEVEL_NAMES.get(self.level, self.level),
+            "kind": self.kind,
+            "message": self.message,
+            **{key: value if isinstance(value, (int, float, bool, type(None))) else _text(value)
+               for key, value in self.fields.items()}
+        }
+
+
+class EventLog:
+    """
+    A fixed-size ring buffer of events. Events below the minimum level are discarded, and of the rest only one in every
+    sample_every is kept, except warnings which are always kept. When the buffer is full the oldest event is
+    overwritten.
+    """
+    def __init__(self, capacity: int = 10000, level: int = INFO, sample_every: int = 1):
+        """
+        :param capacity:        the number of events kept in memory
+        :param level:           the minimum level of events to keep
+        :param sample_every:    keep one in this many events
+        """
+        self.buffer = deque(maxlen=capacity)
+        self.level = level
+        self.sample_every = sample_every
+        self.emitted = 0
+        self.filtered = 0
+        self.sampled_out = 0
+        self.overwritten = 0
+        self._writer = None
+
+    def enabled_for(self, level: int) -> bool:
+        return level >= self.level
+
+    def emit(self, level: int, kind: str, template: str, **fields):
+        """
+        Records an event. The fields are stored as-is and the message is not formatted here.
+        :param level:       the level of the event
+        :param kind:        a short machine-readable name for the event, such as "drop"
+        :param template:    a str.format template for the message, using the field names
+        :param fields:      the values of the event
+        """
+        if level < self.level:
+            self.filtered += 1
+            return
+        self.emitted += 1
+        if level < WARNING and self.sample_every > 1 and self.emitted % self.sample_every:
+            self.sampled_out += 1
+            return
+        if len(self.buffer) == self.buffer.maxlen:
+            self.overwritten += 1
+        self.buffer.append(FyreEvent(time.time(), level, kind, template, fields))
+
+    def events(self) -> List[FyreEvent]:
+        """
+        Gets a snapshot of the events in the buffer, oldest first, without removing them.
+        :return:    the events
+        """
+        return list(self.buffer)
+
+    def drain(self) -> List[FyreEvent]:
+        """
+        Removes and returns the events in the buffer, oldest first.
+        :return:    the events
+        """
+        events = []
+        while True:
+            try:
+                events.append(self.buffer.popleft())
+            except IndexError:
+                return events
+
+    def start_writer(self, path: str, interval: float = 0.5):
+        """
+        Starts a background thread that periodically drains the buffer to a JSON Lines file. Messages are formatted on
+        that thread rather than where the events are emitted.
+        :param path:        the path of the file to append to
+        :param interval:    how often to drain the buffer, in seconds
+        """
+        if self._writer:
+            raise ValueError("An event writer is already running.")
+        self._writer = EventWriter(self, path, interval)
+        self._writer.start()
+
+    def stop_writer(self):
+        """
+        Stops the background writer, after writing any events still in the buffer.
+        """
+        if self._writer:
+            self._writer.stop()
+            self._writer = None
+
+    def stats(self) -> dict:
+        return {"buffered": len(self.buffer), "capacity": self.buffer.maxlen, "emitted": self.emitted,
+                "filtered": self.filtered, "sampled_out": self.sampled_out, "overwritten": self.overwritten}
+
+
+class EventWriter(threading.Thread):
+    """
+    A daemon thread that drains an event log to a JSON Lines file.
+    """
+    def __init__(self, log: EventLog, path: str, interval: float):
+        super().__init__(name='fyre-event-writer', daemon=True)
+        self.log = log
+        self.path = path
+        self.interval = interval
+        self.written = 0
+        self._stopped = threading.Event()
+
+    def run(self):
+        with open(self.path, 'a') as output:
+            while not self._stopped.wait(self.interval):
+                self.write(output)
+            self.write(output)
+
+    def write(self, output):
+        events = self.log.drain()
+        if events:
+            output.writelines(json.dumps(event.to_dict()) + '\n' for event in events)
+            output.flush()
+            self.written += len(events)
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
@@ -0,0 +1,234 @@
+import heapq
+import random
+
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Dict, Iterable, Iterator, List, Union
+
+DISTRIBUTIONS = ('uniform', 'zipf')
+EPHEMERAL_PORTS = (49152, 65535)
+
+
+def zipf_weights(count: int, exponent: float = 1.0) -> List[float]:
+    """
+    :param count:       the number of items
+    :param exponent:    the skew; 0 is uniform, and higher values send more traffic to the first items
+    :return:            the weight of each item, proportional to 1 / rank ** exponent
+    """
+    return [1.0 / rank ** exponent for rank in range(1, count + 1)]
+
+
+class _Choice:
+    """
+    Picks items at random according to fixed weights, with one binary search per pick.
+    """
+    def __init__(self, items: list, weights: List[float] = None):
+        if not items:
+            raise ValueError("Cannot choose from an empty list.")
+        self.items = items
+        self.totals = list(accumulate(weights)) if weights is not None else None
+        if self.totals is not None and self.totals[-1] <= 0:
+            raise ValueError("The weights must not all be zero.")
+
+    def pick(self, rng: random.Random):
+        if self.totals is None:
+            return self.items[int(rng.random() * len(self.items))]
+        index = bisect_right(self.totals, rng.random() * self.totals[-1])
+        return self.items[min(index, len(self.items) - 1)]
+
+
+def _weights(count: int, mix, exponent: float) -> List[float]:
+    if mix == 'uniform':
+        return None
+    if mix == 'zipf':
+        return zipf_weights(count, exponent)
+    raise ValueError(f"Unknown distribution {mix}, expected one of {DISTRIBUTIONS} or a map of weights.")
+
+
+def service_ports(server, mix: Union[str, Dict[str, float]] = 'uniform', exponent: float = 1.0) -> _Choice:
+    """
+    Builds the port distribution of a server from its registered services.
+    :param server:      the server
+    :param mix:         "uniform", "zipf" to favour services in the order they were registered, or a map from service
+                        name to weight; services missing from the map get no traffic
+    :param exponent:    the skew of the Zipf distribution
+    :return:            the distribution
+    """
+    services = list(getattr(server, 'services', {}).values())
+    if not services:
+        raise ValueError(f"{server.name} has no services to send traffic to; pass explicit ports instead.")
+    if isinstance(mix, dict):
+        unknown = set(mix) - {service.name for service in services}
+        if unknown:
+            raise ValueError(f"{server.name} has no services named {', '.join(sorted(unknown))}.")
+        return _Choice([service.port for service in services], [mix.get(service.name, 0.0) for service in services])
+    return _Choice([service.port for service in services], _weights(len(services), mix, exponent))
+
+
+def generate_flows(client, rate: float, duration: float = None, destinations: list = None,
+                   destination_mix: str = 'uniform', service_mix: Union[str, Dict[str, float]] = 'uniform',
+                   ports: List[int] = None, payload_sizes: Union[int, List[int]] = 64, sport: int = None,
+                   poisson: bool = True, start: float = 0.0, exponent: float = 1.0,
+                   seed: int = None) -> Iterator[tuple]:
+    """
+    Lazily generates the flows one client sends. Nothing is precomputed per flow, so a generator can describe millions
+    of flows, or an endless stream when no duration is given.
+    :param client:          the sending client
+    :param rate:            the average number of flows per second
+    :param duration:        the length of the load, in seconds, or None to generate flows forever
+    :param destinations:    the servers to send to, or None for every server on the platform
+    :param destination_mix: "uniform", or "zipf" to favour the first destinations
+    :param service_mix:     how to pick the port of each flow from the destination's services, see service_ports
+    :param ports:           the destination ports to pick from uniformly instead of the destinations' services
+    :param payload_sizes:   the payload size in bytes, or a list of sizes to pick from uniformly
+    :param sport:           the source port, or None to pick a random ephemeral port for every flow
+    :param poisson:         True to space flows by exponentially distributed gaps, False to space them evenly
+    :param start:           the time of the first flow, in seconds of virtual time
+    :param exponent:        the skew of Zipf distributions
+    :param seed:            the random seed, or None for a random one
+    :return:                an iterator over (time, client, destination IP, destination port, source port, payload
+                            size) tuples, in time order
+    """
+    if rate <= 0:
+        raise ValueError(f"The rate must be positive: {rate}")
+    rng = random.Random(seed)
+    servers = list(destinations) if destinations is not None else list(client.platform.servers)
+    pick_server = _Choice(servers, _weights(len(servers), destination_mix, exponent))
+    if ports is not None:
+        pick_port = {server: _Choice(list(ports)) for server in servers}
+    else:
+        pick_port = {server: service_ports(server, service_mix, exponent) for server in servers}
+    pick_size = _Choice([payload_sizes] if isinstance(payload_sizes, int) else list(payload_sizes))
+    low, high = EPHEMERAL_PORTS
+    end = start + duration if duration is not None else None
+
+    time, index = start, 0
+    while end is None or time < end:
+        server = pick_server.pick(rng)
+        source_port = sport if sport is not None else rng.randint(low, high)
+        yield time, client, server.ip, pick_port[server].pick(rng), source_port, pick_size.pick(rng)
+        index += 1
+        time = time + rng.expovariate(rate) if poisson else start + index / rate
+
+
+def merge_flows(generators: Iterable[Iterator[tuple]]) -> Iterator[tuple]:
+    """
+    Interleaves the flows of many clients in time order, holding only one pending flow per client.
+    :param generators:  the flow iterators, see generate_flows
+    :return:            an iterator over all flows in time order
+    """
+    return heapq.merge(*generators, key=lambda flow: flow[0])
+
+
+class LoadDriver:
+    """
+    Sends generated flows through the platform's scheduler at their scheduled times. Only the next flow is taken from
+    the generator at a time. When the delivery path falls behind, because the scheduler has too many events pending or
+    the link to the destination is full, the driver holds the flow and retries later instead of dropping it, so the
+    offered load slows down to what the platform can carry.
+    """
+    def __init__(self, platform, flows: Iterator[tuple], max_pending: int = 10000, backoff: float = 0.001):
+        """
+        :param platform:    the platform to send through
+        :param flows:       the flows to send, in time order, see generate_flows and merge_flows
+        :param max_pending: the number of pending scheduler events above which sending is held back
+        :param backoff:     how long to wait before retrying a held flow, in seconds of virtual time
+        """
+        self.platform = platform
+        self.flows = iter(flows)
+        self.max_pending = max_pending
+        self.backoff = backoff
+        self.payloads: Dict[int, bytes] = {}
+        self.sent = 0
+        self.dropped = 0
+        self.deferred = 0
+        self.max_lag = 0.0
+        self.done = False
+
+    def _payload(self, size: int) -> bytes:
+        try:
+            return self.payloads[size]
+        except KeyError:
+            payload = self.payloads[size] = b'x' * size
+            return payload
+
+    def _send(self, flow: tuple) -> bool:
+        _, client, ip, dport, sport, size = flow
+        sent = client.send_packet(ip, dport, sport, self._payload(size))
+        if sent:
+            self.sent += 1
+        else:
+            self.dropped += 1
+        return sent
+
+    def _congested(self, flow: tuple) -> bool:
+        scheduler = self.platform.scheduler
+        if scheduler.pending >= self.max_pending:
+            return True
+        _, client, ip, _, _, _ = flow
+        destination = self.platform.get_fyre_component_by_ip(ip)[1]
+        link = scheduler.links.get((client, destination))
+        return link is not None and link.queue_limit is not None and link.queued >= link.queue_limit
+
+    def _next(self):
+        flow = next(self.flows, None)
+        if flow is None:
+            self.done = True
+            return
+        scheduler = self.platform.scheduler
+        scheduler.schedule(max(flow[0] - scheduler.now, 0.0), self._fire, flow)
+
+    def _fire(self, flow: tuple):
+        scheduler = self.platform.scheduler
+        if self._congested(flow):
+            self.deferred += 1
+            scheduler.schedule(self.backoff, self._fire, flow)
+            return
+        self.max_lag = max(self.max_lag, scheduler.now - flow[0])
+        self._send(flow)
+        self._next()
+
+    def start(self):
+        """
+        Schedules the first flow. The rest are scheduled one by one as the scheduler runs.
+        """
+        if self.platform.scheduler is None:
+            raise ValueError("The platform needs a scheduler to send load at scheduled times.")
+        self._next()
+
+    def run(self, until: float = None) -> dict:
+        """
+        Sends the flows. With a scheduler, the flows are sent at their scheduled times and the scheduler is run until
+        they have all been delivered; without one, every flow is delivered immediately, in order.
+        :param until:   the virtual time to stop at, or None to run until the flows are exhausted
+        :return:        the driver's stats
+        """
+        if self.platform.scheduler is None:
+            for flow in self.flows:
+                if until is not None and flow[0] > until:
+                    break
+                self._send(flow)
+            self.done = True
+        else:
+            self.start()
+            self.platform.scheduler.run(until)
+        if self.platform.traffic is not None:
+            self.platform.traffic.flush()
+        return self.stats()
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "dropped": self.dropped, "deferred": self.deferred, "max_lag": self.max_lag,
+                "done": self.done}
+
+
+def drive_clients(platform, generators: Iterable[Iterator[tuple]], max_pending: int = 10000,
+                  backoff: float = 0.001) -> LoadDriver:
+    """
+    Creates a driver that sends the flows of many clients together, in time order.
+    :param platform:    the platform to send through
+    :param generators:  the flow iterators of each client, see FyreClient.generate_flows
+    :param max_pending: the number of pending scheduler events above which sending is held back
+    :param backoff:     how long to wait before retrying a held flow, in seconds of virtual time
+    :return:            the driver; call run or start on it
+    """
+    return LoadDriver(platform, merge_flows(generators), max_pending, backoff)
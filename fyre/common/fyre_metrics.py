@@ -0,0 +1,93 @@
+from collections import Counter
+from typing import Dict
+
+DEFAULT_RULE = 'default'
+
+
+class LatencyHistogram:
+    """
+    A histogram of durations in power-of-two nanosecond buckets. Recording is a bit_length and a list increment, and
+    percentiles are reported as the upper bound of the bucket they fall in.
+    """
+    __slots__ = ('buckets', 'count', 'total_ns', 'max_ns')
+
+    def __init__(self):
+        self.buckets = [0] * 65
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, duration_ns: int):
+        self.buckets[duration_ns.bit_length()] += 1
+        self.count += 1
+        self.total_ns += duration_ns
+        if duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+
+    def percentile(self, fraction: float, buckets=None) -> int:
+        """
+        Gets an upper bound for a percentile of the recorded durations.
+        :param fraction:    the percentile, between 0 and 1
+        :param buckets:     a copy of the buckets to use, or None to use the live buckets
+        :return:            the upper bound, in nanoseconds
+        """
+        buckets = buckets if buckets is not None else self.buckets
+        target = fraction * sum(buckets)
+        seen = 0
+        for bucket, count in enumerate(buckets):
+            seen += count
+            if count and seen >= target:
+                return (1 << bucket) - 1
+        return 0
+
+    def snapshot(self) -> dict:
+        buckets = list(self.buckets)
+        count, total = self.count, self.total_ns
+        return {
+            "count": count,
+            "mean_ns": total / count if count else 0.0,
+            "max_ns": self.max_ns,
+            "p50_ns": self.percentile(0.5, buckets),
+            "p90_ns": self.percentile(0.9, buckets),
+            "p99_ns": self.percentile(0.99, buckets)
+        }
+
+
+class FyreMetrics:
+    """
+    The counters, rule hits and latency histograms of one component.
+    """
+    def __init__(self):
+        self.counters = Counter()
+        self.rule_hits = Counter()
+        self.latency: Dict[str, LatencyHistogram] = {}
+
+    def observe(self, operation: str, duration_ns: int):
+        """
+        Records the duration of an operation.
+        :param operation:   the name of the operation, such as "process_packet"
+        :param duration_ns: the duration, in nanoseconds
+        """
+        histogram = self.latency.get(operation)
+        if histogram is None:
+            histogram = self.latency[operation] = LatencyHistogram()
+        histogram.record(duration_ns)
+
+    def snapshot(self) -> dict:
+        """
+        Copies the current values. Safe to call while packets are being processed on another thread.
+        :return:    a dictionary of counters, rule hits by rule label and latency summaries by operation
+        """
+        rule_hits = Counter()
+        for rule, hits in dict(self.rule_hits).items():
+            rule_hits[DEFAULT_RULE if rule is None else str(rule)] += hits
+        return {
+            "counters": dict(self.counters),
+            "rules": dict(rule_hits),
+            "latency": {operation: histogram.snapshot() for operation, histogram in dict(self.latency).items()}
+        }
+
+    def reset(self):
+        self.counters.clear()
+        self.rule_hits.clear()
+        self.latency.clear()
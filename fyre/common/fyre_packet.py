@@ -0,0 +1,96 @@
+from fyre.common.fyre_rules import PROTOCOLS
+
+HEADER_LENGTH = 40  # IPv4 and TCP headers without options
+
+
+class FyrePacket:
+    """
+    A lightweight packet carrying only the headers the platform needs. It is converted to a scapy packet on demand, for
+    display, summaries or pcap export, so the hot path never pays for building scapy layers.
+    """
+    __slots__ = ('src', 'dst', 'sport', 'dport', 'proto', 'flags', 'load', 'timestamp')
+
+    def __init__(self, src: str, dst: str, sport: int, dport: int, proto: int = PROTOCOLS['tcp'], flags: str = 'S',
+                 load=b'', timestamp: float = 0.0):
+        self.src = src
+        self.dst = dst
+        self.sport = sport
+        self.dport = dport
+        self.proto = proto
+        self.flags = flags
+        self.load = load.encode() if isinstance(load, str) else bytes(load)
+        self.timestamp = timestamp
+
+    def __len__(self):
+        return HEADER_LENGTH + len(self.load)
+
+    def __repr__(self):
+        return f"FyrePacket({self.src}:{self.sport} > {self.dst}:{self.dport} proto={self.proto} flags={self.flags})"
+
+    @property
+    def five_tuple(self) -> tuple:
+        return self.src, self.dst, self.sport, self.dport, self.proto
+
+    def summary(self) -> str:
+        return self.to_scapy().summary()
+
+    def to_scapy(self):
+        """
+        Converts this packet into a scapy packet.
+        :return:    the scapy packet
+        """
+        from scapy.layers.inet import IP, TCP, UDP
+        from scapy.packet import Raw
+
+        ip = IP(src=self.src, dst=self.dst, proto=self.proto)
+        if self.proto == PROTOCOLS['udp']:
+            packet = ip / UDP(sport=self.sport, dport=self.dport)
+        else:
+            packet = ip / TCP(sport=self.sport, dport=self.dport, flags=self.flags)
+        if self.load:
+            packet = packet / Raw(load=self.load)
+        packet.time = self.timestamp
+        return packet
+
+    @classmethod
+    def from_scapy(cls, packet):
+        """
+        Creates a packet from the IP and TCP/UDP layers of a scapy packet.
+        :param packet:  the scapy packet
+        :return:        the fyre packet
+        """
+        from scapy.layers.inet import IP, TCP, UDP
+        from scapy.packet import Raw
+
+        ip = packet[IP]
+        sport, dport, flags = 0, 0, ''
+        if TCP in packet:
+            sport, dport, flags = packet[TCP].sport, packet[TCP].dport, str(packet[TCP].flags)
+        elif UDP in packet:
+            sport, dport = packet[UDP].sport, packet[UDP].dport
+        load = packet[Raw].load if Raw in packet else b''
+        return cls(ip.src, ip.dst, sport, dport, ip.proto, flags, load, float(packet.time))
+
+
+def as_fyre_packet(packet) -> FyrePacket:
+    """
+    Accepts either packet type wherever packets are passed through the platform.
+    :param packet:  a fyre packet or a scapy packet
+    :return:        the packet as a fyre packet
+    """
+    if isinstance(packet, FyrePacket):
+        return packet
+    return FyrePacket.from_scapy(packet)
+
+
+def write_pcap(path: str, packets):
+    """
+    Writes packets to a pcap file, converting them to scapy packets one at a time.
+    :param path:        the path of the pcap file
+    :param packets:     an iterable of fyre or scapy packets
+    """
+    from scapy.utils import PcapWriter
+
+    with PcapWriter(path) as writer:
+        for packet in packets:
+            writer.write(packet.to_scapy() if isinstance(packet, FyrePacket) else packet)
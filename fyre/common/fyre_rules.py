@@ -0,0 +1,383 @@
+import ipaddress
+
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+ALLOW = 'allow'
+DENY = 'deny'
+ACTIONS = (ALLOW, DENY)
+
+PROTOCOLS = {'icmp': 1, 'tcp': 6, 'udp': 17}
+
+MAX_PORT = 65535
+
+
+def parse_networks(value) -> Optional[List]:
+    """
+    Parses an address specification into a list of networks.
+    :param value:   None, "any", a single IP/CIDR string or a list of them
+    :return:        A list of ipaddress networks, or None if the specification matches any address
+    """
+    if value is None or value == 'any' or value == '*':
+        return None
+    if isinstance(value, (str, int)):
+        value = [value]
+    networks = []
+    for entry in value:
+        try:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            raise ValueError(f"Invalid IP address or network: {entry}")
+    return networks
+
+
+def parse_port_ranges(value) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parses a port specification into a list of inclusive port ranges.
+    :param value:   None, "any", a port, a "low-high" string, a (low, high) tuple or a list of them
+    :return:        A list of (low, high) tuples, or None if the specification matches any port
+    """
+    if value is None or value == 'any' or value == '*':
+        return None
+    if isinstance(value, (str, int, tuple)):
+        value = [value]
+    ranges = []
+    for entry in value:
+        if isinstance(entry, int):
+            low = high = entry
+        elif isinstance(entry, str):
+            low, _, high = entry.partition('-')
+            try:
+                low, high = int(low), int(high or low)
+            except ValueError:
+                raise ValueError(f"Invalid port or port range: {entry}")
+        else:
+            low, high = entry
+        if not 0 <= low <= high <= MAX_PORT:
+            raise ValueError(f"Invalid port or port range: {entry}")
+        ranges.append((low, high))
+    return ranges
+
+
+def parse_protocol(value) -> Optional[int]:
+    """
+    Parses a protocol name or number.
+    :param value:   None, "any", a protocol name (tcp, udp, icmp) or an IP protocol number
+    :return:        The IP protocol number, or None if the specification matches any protocol
+    """
+    if value is None or value == 'any' or value == '*':
+        return None
+    if isinstance(value, int):
+        return value
+    if value.lower() in PROTOCOLS:
+        return PROTOCOLS[value.lower()]
+    raise ValueError(f"Unknown protocol: {value}")
+
+
+def address_to_int(address) -> Tuple[int, int]:
+    """
+    Converts an address into its integer form.
+    :param address: the address as a string, integer or ipaddress object
+    :return:        A tuple of (IP version, integer value)
+    """
+    if isinstance(address, int):
+        return 4, address
+    if isinstance(address, str):
+        address = ipaddress.ip_address(address)
+    return address.version, int(address)
+
+
+class FyreRule:
+    """
+    A single firewall rule. Any field left as None matches everything.
+    """
+    def __init__(self, action: str, src=None, dst=None, sport=None, dport=None, protocol=None, name: str = None):
+        if action not in ACTIONS:
+            raise ValueError(f"Invalid rule action: {action}")
+        self.action = action
+        self.src = parse_networks(src)
+        self.dst = parse_networks(dst)
+        self.sport = parse_port_ranges(sport)
+        self.dport = parse_port_ranges(dport)
+        self.protocol = parse_protocol(protocol)
+        self.name = name
+
+    def __str__(self):
+        return self.name if self.name else f"{self.action} {self.to_dict()}"
+
+    @classmethod
+    def from_dict(cls, config: dict):
+        """
+        Creates a rule from its JSON representation.
+        :param config:  the rule as a dictionary
+        :return:        the rule object
+        """
+        if "action" not in config:
+            raise ValueError(f"Rule is missing an action: {config}")
+        return cls(config["action"], config.get("src"), config.get("dst"), config.get("sport"),
+                   config.get("dport"), config.get("protocol"), config.get("name"))
+
+    def to_dict(self) -> dict:
+        """
+        Converts the rule into its JSON representation.
+        :return:    the rule as a dictionary
+        """
+        def ports(ranges):
+            return [str(low) if low == high else f"{low}-{high}" for low, high in ranges]
+
+        config = {"action": self.action}
+        if self.name:
+            config["name"] = self.name
+        if self.src is not None:
+            config["src"] = [str(network) for network in self.src]
+        if self.dst is not None:
+            config["dst"] = [str(network) for network in self.dst]
+        if self.sport is not None:
+            config["sport"] = ports(self.sport)
+        if self.dport is not None:
+            config["dport"] = ports(self.dport)
+        if self.protocol is not None:
+            names = {number: name for name, number in PROTOCOLS.items()}
+            config["protocol"] = names.get(self.protocol, self.protocol)
+        return config
+
+
+class _PrefixTable:
+    """
+    A hash table per prefix length. Each prefix length that appears in the rules gets its own dictionary from network
+    prefix to a bitmask of rules, and a lookup probes every one of them and ORs the masks it finds. The number of probes
+    depends on the number of distinct prefix lengths rather than on the number of networks, but each OR costs time in
+    proportion to the number of rules, since a mask has one bit per rule.
+    """
+    def __init__(self, bits: int):
+        self.bits = bits
+        self.any = 0
+        self.levels: Dict[int, Dict[int, int]] = {}
+        self.lookups: List[Tuple[int, Dict[int, int]]] = []
+
+    def add(self, network, mask: int):
+        level = self.levels.setdefault(network.prefixlen, {})
+        key = int(network.network_address) >> (self.bits - network.prefixlen)
+        level[key] = level.get(key, 0) | mask
+
+    def freeze(self):
+        self.lookups = [(self.bits - prefixlen, level) for prefixlen, level in sorted(self.levels.items())]
+
+    def lookup(self, address: int) -> int:
+        mask = self.any
+        for shift, level in self.lookups:
+            mask |= level.get(address >> shift, 0)
+        return mask
+
+
+class _IntervalTable:
+    """
+    A sorted interval table over the port space. The boundaries of every rule's ranges split the port space into
+    segments, and each segment stores the bitmask of rules covering it.
+    """
+    def __init__(self):
+        self.any = 0
+        self.ranges: List[Tuple[int, int, int]] = []
+        self.starts: List[int] = [0]
+        self.masks: List[int] = [0]
+
+    def add(self, low: int, high: int, bit: int):
+        self.ranges.append((low, high, bit))
+
+    def freeze(self):
+        events: Dict[int, List[Tuple[int, int]]] = {}
+        for low, high, bit in self.ranges:
+            events.setdefault(low, []).append((bit, 1))
+            events.setdefault(high + 1, []).append((bit, -1))
+        counts: Dict[int, int] = {}
+        starts, masks, mask = [0], [0], 0
+        for point in sorted(events):
+            for bit, delta in events[point]:
+                counts[bit] = counts.get(bit, 0) + delta
+                if counts[bit]:
+                    mask |= 1 << bit
+                else:
+                    mask &= ~(1 << bit)
+            if starts[-1] == point:
+                masks[-1] = mask
+            else:
+                starts.append(point)
+                masks.append(mask)
+        self.starts, self.masks = starts, masks
+
+    def lookup(self, port: int) -> int:
+        return self.any | self.masks[bisect_right(self.starts, port) - 1]
+
+
+class FyreRuleSet:
+    """
+    An ordered list of rules compiled into an indexed matcher. Every rule is assigned one bit, each packet field is
+    looked up in its own index to find the rules matching that field, and the lowest bit set in the intersection is the
+    first matching rule. A match is a few dictionary probes and binary searches, plus ORs and ANDs of masks with one bit
+    per rule; those grow with the number of rules, so a match is much cheaper than checking the rules one by one but
+    still slows down as the ruleset grows.
+    """
+    def __init__(self, rules: List[FyreRule], default_action: str = DENY):
+        if default_action not in ACTIONS:
+            raise ValueError(f"Invalid default action: {default_action}")
+        self.rules = list(rules)
+        self.default_action = default_action
+        self.all_rules = (1 << len(self.rules)) - 1
+        self.src = {4: _PrefixTable(32), 6: _PrefixTable(128)}
+        self.dst = {4: _PrefixTable(32), 6: _PrefixTable(128)}
+        self.sport = _IntervalTable()
+        self.dport = _IntervalTable()
+        self.protocols: Dict[int, int] = {}
+        self.any_protocol = 0
+        self._batch = None
+
+        for bit, rule in enumerate(self.rules):
+            self._index_networks(self.src, rule.src, bit)
+            self._index_networks(self.dst, rule.dst, bit)
+            self._index_ports(self.sport, rule.sport, bit)
+            self._index_ports(self.dport, rule.dport, bit)
+            if rule.protocol is None:
+                self.any_protocol |= 1 << bit
+            else:
+                self.protocols[rule.protocol] = self.protocols.get(rule.protocol, 0) | 1 << bit
+
+        for table in (*self.src.values(), *self.dst.values(), self.sport, self.dport):
+            table.freeze()
+        # Whether any rule looks at the source port, which decides if verdicts can be shared across source ports
+        self.uses_sport = bool(self.sport.ranges)
+
+    @staticmethod
+    def _index_networks(tables, networks, bit: int):
+        if networks is None:
+            for table in tables.values():
+                table.any |= 1 << bit
+            return
+        for network in networks:
+            tables[network.version].add(network, 1 << bit)
+
+    @staticmethod
+    def _index_ports(table, ranges, bit: int):
+        if ranges is None:
+            table.any |= 1 << bit
+            return
+        for low, high in ranges:
+            table.add(low, high, bit)
+
+    def match(self, src, dst, sport: int, dport: int, protocol: int = PROTOCOLS['tcp']) -> Tuple[str, int]:
+        """
+        Finds the first rule matching a packet.
+        :param src:         the source address
+        :param dst:         the destination address
+        :param sport:       the source port
+        :param dport:       the destination port
+        :param protocol:    the IP protocol number
+        :return:            A tuple of (action, rule index), where the index is -1 if the default action applied
+        """
+        mask = self.all_rules
+        if not mask:
+            return self.default_action, -1
+        src_version, src = address_to_int(src)
+        mask &= self.src[src_version].lookup(src)
+        if mask:
+            dst_version, dst = address_to_int(dst)
+            mask &= self.dst[dst_version].lookup(dst)
+        if mask:
+            mask &= self.dport.lookup(dport) & self.sport.lookup(sport)
+        if mask:
+            mask &= self.any_protocol | self.protocols.get(protocol, 0)
+        if not mask:
+            return self.default_action, -1
+        index = (mask & -mask).bit_length() - 1
+        return self.rules[index].action, index
+
+    def _batch_tables(self) -> list:
+        """
+        Converts each rule into the sorted arrays used by evaluate_batch. Built once per ruleset on first use.
+        """
+        import numpy as np
+
+        def networks(value):
+            if value is None:
+                return None
+            levels = {}
+            for network in value:
+                if network.version == 4:
+                    levels.setdefault(network.prefixlen, set()).add(int(network.network_address) >> (32 - network.prefixlen))
+            return [(32 - prefixlen, np.array(sorted(keys), dtype=np.uint64)) for prefixlen, keys in sorted(levels.items())]
+
+        def ports(ranges):
+            if ranges is None:
+                return None
+            merged = []
+            for low, high in sorted(ranges):
+                if merged and low <= merged[-1][1] + 1:
+                    merged[-1][1] = max(merged[-1][1], high)
+                else:
+                    merged.append([low, high])
+            return np.array([low for low, _ in merged], dtype=np.int64), np.array([high for _, high in merged], dtype=np.int64)
+
+        return [(rule.action, networks(rule.src), networks(rule.dst), ports(rule.sport), ports(rule.dport), rule.protocol)
+                for rule in self.rules]
+
+    def evaluate_batch(self, src, dst, sport, dport, protocol=None):
+        """
+        Evaluates many packets at once with vectorized comparisons, one rule at a time in order. Produces the same
+        verdicts as calling match for each packet. Requires NumPy, and only supports IPv4 addresses.
+        :param src:         the source addresses, as an array of integers or a sequence of address strings
+        :param dst:         the destination addresses, as an array of integers or a sequence of address strings
+        :param sport:       the source ports
+        :param dport:       the destination ports
+        :param protocol:    the IP protocol numbers, or None if every packet is TCP
+        :return:            A tuple of (allowed, rule index) arrays, where the index is -1 if the default action applied
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("Batch evaluation requires NumPy. Install it with 'pip install numpy'.")
+
+        def addresses(values):
+            values = np.asarray(values)
+            if values.dtype.kind in 'US' or values.dtype == object:
+                values = np.array([int(ipaddress.IPv4Address(str(value))) for value in values])
+            return values.astype(np.uint64)
+
+        src, dst = addresses(src), addresses(dst)
+        sport, dport = np.asarray(sport, dtype=np.int64), np.asarray(dport, dtype=np.int64)
+        count = len(src)
+        protocol = np.full(count, PROTOCOLS['tcp']) if protocol is None else np.asarray(protocol, dtype=np.int64)
+
+        if self._batch is None:
+            self._batch = self._batch_tables()
+
+        def in_networks(values, levels):
+            matched = np.zeros(count, dtype=bool)
+            for shift, keys in levels:
+                matched |= np.isin(values >> np.uint64(shift), keys)
+            return matched
+
+        def in_ports(values, ranges):
+            starts, ends = ranges
+            index = np.searchsorted(starts, values, side='right') - 1
+            return (index >= 0) & (values <= ends[np.maximum(index, 0)])
+
+        allowed = np.full(count, self.default_action == ALLOW)
+        indices = np.full(count, -1, dtype=np.int64)
+        undecided = np.ones(count, dtype=bool)
+        for index, (action, src_levels, dst_levels, sport_ranges, dport_ranges, rule_protocol) in enumerate(self._batch):
+            matched = undecided.copy()
+            if rule_protocol is not None:
+                matched &= protocol == rule_protocol
+            if dport_ranges is not None:
+                matched &= in_ports(dport, dport_ranges)
+            if sport_ranges is not None:
+                matched &= in_ports(sport, sport_ranges)
+            if src_levels is not None:
+                matched &= in_networks(src, src_levels)
+            if dst_levels is not None:
+                matched &= in_networks(dst, dst_levels)
+            allowed[matched] = action == ALLOW
+            indices[matched] = index
+            undecided &= ~matched
+            if not undecided.any():
+                break
+        return allowed, indices
@@ -0,0 +1,159 @@
+import heapq
+import itertools
+import time
+
+from typing import Dict, Tuple
+
+
+class FyreLink:
+    """
+    A directional link between two components. Packets are serialized onto the link one at a time at its bandwidth,
+    then arrive after its latency. Packets that arrive while the queue is full are dropped.
+    """
+    def __init__(self, latency: float = 0.001, bandwidth: float = None, queue_limit: int = 1000):
+        """
+        :param latency:         the propagation delay, in seconds
+        :param bandwidth:       the bandwidth, in bits per second, or None for an infinitely fast link
+        :param queue_limit:     the maximum number of packets queued or in flight, or None for no limit
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.queue_limit = queue_limit
+        self.busy_until = 0.0
+        self.queued = 0
+        self.sent = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def stats(self) -> dict:
+        return {"queued": self.queued, "sent": self.sent, "delivered": self.delivered, "dropped": self.dropped}
+
+
+class FyreScheduler:
+    """
+    A discrete-event scheduler with a virtual clock. Events are kept in a priority queue ordered by virtual time, with
+    ties broken in scheduling order, and run as fast as possible unless real-time pacing is requested.
+    """
+    def __init__(self, default_latency: float = 0.001, default_bandwidth: float = None,
+                 default_queue_limit: int = 1000):
+        self.now = 0.0
+        self.default_latency = default_latency
+        self.default_bandwidth = default_bandwidth
+        self.default_queue_limit = default_queue_limit
+        self.links: Dict[Tuple[object, object], FyreLink] = {}
+        self.events_run = 0
+        self._queue = []
+        self._sequence = itertools.count()
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def schedule(self, delay: float, callback, *args):
+        """
+        Schedules a callback to run after a delay in virtual time.
+        :param delay:       the delay, in seconds of virtual time
+        :param callback:    the function to call
+        :param args:        the arguments to pass to the callback
+        """
+        if delay < 0:
+            raise ValueError(f"Cannot schedule an event in the past: {delay}")
+        heapq.heappush(self._queue, (self.now + delay, next(self._sequence), callback, args))
+
+    def set_link(self, source, destination, latency: float = None, bandwidth: float = None,
+                 queue_limit: int = None) -> FyreLink:
+        """
+        Configures the link from one component to another. Unspecified values use the scheduler's defaults.
+        :param source:          the sending component
+        :param destination:     the receiving component
+        :param latency:         the propagation delay, in seconds
+        :param bandwidth:       the bandwidth, in bits per second
+        :param queue_limit:     the maximum number of packets queued or in flight
+        :return:                the link
+        """
+        link = FyreLink(self.default_latency if latency is None else latency,
+                        self.default_bandwidth if bandwidth is None else bandwidth,
+                        self.default_queue_limit if queue_limit is None else queue_limit)
+        self.links[(source, destination)] = link
+        return link
+
+    def get_link(self, source, destination) -> FyreLink:
+        link = self.links.get((source, destination))
+        if link is None:
+            link = self.set_link(source, destination)
+        return link
+
+    def transmit(self, source, destination, packet) -> bool:
+        """
+        Queues a packet on the link from one component to another. The destination receives it once it has been
+        serialized onto the link and has crossed the link's latency.
+        :param source:          the sending component
+        :param destination:     the receiving component
+        :param packet:          the packet to deliver
+        :return:                True if the packet was queued, False if the link's queue was full and it was dropped
+        """
+        link = self.get_link(source, destination)
+        if link.queue_limit is not None and link.queued >= link.queue_limit:
+            link.dropped += 1
+            return False
+        start = max(self.now, link.busy_until)
+        transmission = len(packet) * 8 / link.bandwidth if link.bandwidth else 0.0
+        link.busy_until = start + transmission
+        link.queued += 1
+        link.sent += 1
+        self.schedule(link.busy_until + link.latency - self.now, self._deliver, link, destination, packet)
+        return True
+
+    @staticmethod
+    def _deliver(link: FyreLink, destination, packet):
+        link.queued -= 1
+        link.delivered += 1
+        destination.receive_packet(packet)
+
+    def step(self) -> bool:
+        """
+        Runs the next event, advancing the virtual clock to its time.
+        :return:    True if an event was run, False if the queue is empty
+        """
+        if not self._queue:
+            return False
+        self.now, _, callback, args = heapq.heappop(self._queue)
+        self.events_run += 1
+        callback(*args)
+        return True
+
+    def run(self, until: float = None, max_events: int = None, realtime: bool = False, speed: float = 1.0) -> int:
+        """
+        Runs events in virtual time order.
+        :param until:       the virtual time to stop at, or None to run until the queue is empty
+        :param max_events:  the maximum number of events to run, or None for no limit
+        :param realtime:    True to pace events against the wall clock, False to run as fast as possible
+        :param speed:       how many seconds of virtual time pass per second of wall time when running in real time
+        :return:            the number of events run
+        """
+        count = 0
+        started_at, started_now = time.monotonic(), self.now
+        while self._queue and (max_events is None or count < max_events):
+            next_time = self._queue[0][0]
+            if until is not None and next_time > until:
+                break
+            if realtime:
+                delay = (next_time - started_now) / speed - (time.monotonic() - started_at)
+                if delay > 0:
+                    time.sleep(delay)
+            self.step()
+            count += 1
+        if until is not None and until > self.now and (max_events is None or count < max_events):
+            self.now = until
+        return count
+
+    def stats(self) -> dict:
+        """
+        Gets the totals of every link managed by the scheduler.
+        :return:    a dictionary of the virtual time, pending events and link totals
+        """
+        totals = {"queued": 0, "sent": 0, "delivered": 0, "dropped": 0}
+        for link in self.links.values():
+            for key, value in link.stats().items():
+                totals[key] += value
+        return {"now": self.now, "pending": self.pending, "events_run": self.events_run, **totals}
@@ -0,0 +1,48 @@
+from typing import Dict, Iterator, List, Tuple
+
+Bounds = Tuple[int, int, int, int]
+
+
+def bounds_contain(outer: Bounds, inner: Bounds) -> bool:
+    """
+    Checks if one set of bounds is entirely inside another.
+    :param outer:   The (x, y, width, height) of the containing bounds
+    :param inner:   The (x, y, width, height) of the contained bounds
+    :return:        True if the inner bounds are inside the outer bounds, False otherwise
+    """
+    outer_x, outer_y, outer_width, outer_height = outer
+    inner_x, inner_y, inner_width, inner_height = inner
+    return outer_x <= inner_x and outer_y <= inner_y and \
+        outer_x + outer_width >= inner_x + inner_width and outer_y + outer_height >= inner_y + inner_height
+
+
+class SpatialGrid:
+    """
+    A uniform grid over screen space. Each item is stored in every cell its bounds overlap, so the items that could
+    contain a point are found by looking at a single cell instead of every item.
+    """
+    def __init__(self, cell_size: int = 100):
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], List[Tuple[object, Bounds]]] = {}
+
+    def insert(self, item, bounds: Bounds):
+        """
+        Adds an item to every cell overlapped by its bounds. Items are kept in insertion order within a cell.
+        :param item:    the item to store
+        :param bounds:  the (x, y, width, height) of the item
+        """
+        x, y, width, height = bounds
+        for cell_x in range(x // self.cell_size, (x + width) // self.cell_size + 1):
+            for cell_y in range(y // self.cell_size, (y + height) // self.cell_size + 1):
+                self.cells.setdefault((cell_x, cell_y), []).append((item, bounds))
+
+    def containing(self, bounds: Bounds) -> Iterator:
+        """
+        Finds the items whose bounds entirely contain the given bounds, in insertion order.
+        :param bounds:  the (x, y, width, height) to look up
+        :return:        an iterator over the containing items
+        """
+        x, y = bounds[0], bounds[1]
+        for item, item_bounds in self.cells.get((x // self.cell_size, y // self.cell_size), ()):
+            if bounds_contain(item_bounds, bounds):
+                yield item
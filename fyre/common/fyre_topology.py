@@ -0,0 +1,217 @@
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+from fyre.common.fyre_spatial import SpatialGrid
+
+MAX_SOURCES = 65536
+
+
+def _area(bounds: Tuple[int, int, int, int]) -> int:
+    return bounds[2] * bounds[3]
+
+
+def zone_path(parents: Dict, links: Dict[object, list], source, destination) -> tuple:
+    """
+    Finds the firewalls a packet passes between two zones. Zones are firewalls, or None for the outside. The zones form
+    a graph where each firewall is connected to the zone it is nested in and to the zones it is explicitly linked to.
+    The packet takes the shortest route, and is checked by each firewall whose zone it enters, in order; leaving a zone
+    is not checked. The destination's own firewall always checks the packet, even when it comes from inside the same
+    zone.
+    :param parents:     a map from each firewall to the firewall it is nested in, or None
+    :param links:       a map from each firewall to the firewalls it is explicitly linked to
+    :param source:      the zone of the sender
+    :param destination: the zone of the receiver
+    :return:            the firewalls to pass, outermost first
+    """
+    children: Dict[object, list] = {}
+    for firewall, parent in parents.items():
+        children.setdefault(parent, []).append(firewall)
+
+    previous = {source: source}
+    queue = deque([source])
+    while queue and destination not in previous:
+        zone = queue.popleft()
+        neighbours = children.get(zone, []) + links.get(zone, [])
+        if zone is not None:
+            neighbours.append(parents.get(zone))
+        for neighbour in neighbours:
+            if neighbour not in previous:
+                previous[neighbour] = zone
+                queue.append(neighbour)
+
+    firewalls = []
+    if destination in previous:
+        zone = destination
+        while zone != source:
+            parent = previous[zone]
+            # Stepping out to the enclosing zone is not checked; entering a nested or linked zone is
+            if zone is not None and parents.get(parent) is not zone:
+                firewalls.append(zone)
+            zone = parent
+        firewalls.reverse()
+    if destination is not None and destination not in firewalls:
+        firewalls.append(destination)
+    return tuple(firewalls)
+
+
+class FyreTopology:
+    """
+    The zones of a platform and the firewalls between them. Each firewall is a zone, nested in the zone that contains
+    it; clients and servers sit in the innermost zone containing them. The firewalls on the path between two zones are
+    computed once and cached. Moving a client or server only forgets its own zone, while changes to firewalls, nesting
+    or links discard the zone structure and the cached paths.
+    """
+    def __init__(self, platform):
+        self.platform = platform
+        self.links: Dict[object, list] = {}
+        self.paths: Dict[tuple, tuple] = {}
+        self.zones: Dict[object, Optional[object]] = {}
+        self.sources: Dict[str, object] = {}
+        self._parents = None
+        self._grid = None
+        self.rebuilds = 0
+        self.path_misses = 0
+
+    def invalidate(self, component=None):
+        """
+        Forgets what depends on a component. Called when components are added, moved or removed.
+        :param component:   the component that changed, or None if anything may have changed
+        """
+        from fyre.parts.firewall import Fyrewall
+
+        if component is None or isinstance(component, Fyrewall):
+            self._parents = None
+            self._grid = None
+            self.zones.clear()
+            self.paths.clear()
+        else:
+            self.zones.pop(component, None)
+
+    def invalidate_addresses(self):
+        """
+        Forgets which component each source address belongs to. Called when components are registered or removed.
+        """
+        self.sources.clear()
+
+    def link(self, first, second):
+        """
+        Connects two firewall zones directly, so packets between them do not pass through the zones around them.
+        :param first:   a firewall
+        :param second:  another firewall
+        """
+        if first is second:
+            raise ValueError(f"Cannot link firewall {first} to itself.")
+        for one, other in ((first, second), (second, first)):
+            if other not in self.links.setdefault(one, []):
+                self.links[one].append(other)
+        self.invalidate()
+
+    def unlink(self, firewall):
+        """
+        Removes every explicit link of a firewall.
+        :param firewall:    the firewall
+        """
+        for other in self.links.pop(firewall, []):
+            self.links[other].remove(firewall)
+        self.invalidate()
+
+    def _firewall_grid(self) -> SpatialGrid:
+        if self._grid is None:
+            self._grid = SpatialGrid()
+            for firewall in self.platform.firewalls:
+                if firewall.has_view:
+                    self._grid.insert(firewall, firewall.parent_ui_component.bounds())
+        return self._grid
+
+    def _enclosing(self, component) -> Optional[object]:
+        memberships = self.platform.memberships
+        if component in memberships:
+            return memberships[component] or None
+        if not component.has_view:
+            return None
+        bounds = component.parent_ui_component.bounds()
+        # A firewall can only be nested in a strictly larger one, which keeps geometric nesting free of cycles
+        candidates = [firewall for firewall in self._firewall_grid().containing(bounds)
+                      if firewall is not component and _area(firewall.parent_ui_component.bounds()) > _area(bounds)]
+        return min(candidates, key=lambda firewall: _area(firewall.parent_ui_component.bounds()), default=None)
+
+    @property
+    def parents(self) -> Dict:
+        """
+        :return: a map from each firewall to the firewall it is nested in, or None
+        """
+        if self._parents is None:
+            self._parents = {firewall: self._enclosing(firewall) for firewall in self.platform.firewalls}
+            self.rebuilds += 1
+        return self._parents
+
+    def zone_of(self, component) -> Optional[object]:
+        """
+        Gets the innermost firewall a client or server is behind.
+        :param component:   the client or server
+        :return:            the firewall, or None if it is outside every firewall
+        """
+        try:
+            return self.zones[component]
+        except KeyError:
+            zone = self.zones[component] = self._enclosing(component)
+            return zone
+
+    def zone_of_address(self, ip: str) -> Optional[object]:
+        """
+        Gets the zone of the component with an address. Addresses that belong to no component are outside.
+        :param ip:  the IP address
+        :return:    the firewall, or None
+        """
+        try:
+            component = self.sources[ip]
+        except KeyError:
+            try:
+                component = self.platform.get_fyre_component_by_ip(ip)[1]
+            except ValueError:
+                component = None
+            if len(self.sources) >= MAX_SOURCES:
+                # Traffic from many outside addresses, such as a replayed capture, would otherwise grow this forever
+                self.sources.clear()
+            self.sources[ip] = component
+        return self.zone_of(component) if component is not None else None
+
+    def path(self, source_zone, destination_zone) -> tuple:
+        """
+        Gets the firewalls between two zones, in the order they check packets.
+        :param source_zone:         the zone of the sender
+        :param destination_zone:    the zone of the receiver
+        :return:                    the firewalls, see zone_path
+        """
+        key = (source_zone, destination_zone)
+        try:
+            return self.paths[key]
+        except KeyError:
+            self.path_misses += 1
+            path = self.paths[key] = zone_path(self.parents, self.links, source_zone, destination_zone)
+            return path
+
+    def firewalls_between(self, source_ip: str, destination) -> tuple:
+        """
+        Gets the firewalls a packet passes on its way to a component, in order.
+        :param source_ip:   the source address of the packet
+        :param destination: the receiving client or server
+        :return:            the firewalls
+        """
+        return self.path(self.zone_of_address(source_ip), self.zone_of(destination))
+
+    def would_nest(self, firewall, parent) -> bool:
+        """
+        Checks whether nesting a firewall in another would create a cycle.
+        :param firewall:    the firewall to nest
+        :param parent:      the firewall to nest it in
+        :return:            True if the parent is the firewall itself or nested in it
+        """
+        parents = self.parents
+        zone, seen = parent, set()
+        while zone is not None and zone not in seen:
+            if zone is firewall:
+                return True
+            seen.add(zone)
+            zone = parents.get(zone)
+        return False
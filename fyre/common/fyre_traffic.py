@@ -0,0 +1,133 @@
+import threading
+import time
+
+from collections import deque
+from typing import Dict, Tuple
+
+
+class TrafficSample:
+    """
+    The traffic seen over one sampling window, as rates per second.
+    """
+    def __init__(self, duration: float, links: Dict[Tuple[str, str], list], firewalls: Dict[object, list]):
+        """
+        :param duration:    the length of the window, in seconds
+        :param links:       a map from (source IP, destination IP) to [packets, bytes, drops] during the window
+        :param firewalls:   a map from firewall to [allowed, dropped] during the window
+        """
+        self.duration = duration
+        self.links = links
+        self.firewalls = firewalls
+
+    def link_rates(self) -> Dict[Tuple[str, str], Tuple[float, float, float]]:
+        """
+        :return: a map from (source IP, destination IP) to (packets/s, bytes/s, drops/s)
+        """
+        if self.duration <= 0:
+            return {}
+        return {link: (packets / self.duration, size / self.duration, drops / self.duration)
+                for link, (packets, size, drops) in self.links.items()}
+
+    def firewall_rates(self) -> Dict[object, Tuple[float, float]]:
+        """
+        :return: a map from firewall to (allowed/s, dropped/s)
+        """
+        if self.duration <= 0:
+            return {}
+        return {firewall: (allowed / self.duration, dropped / self.duration)
+                for firewall, (allowed, dropped) in self.firewalls.items()}
+
+
+class TrafficMonitor:
+    """
+    Aggregates per-link and per-firewall traffic on the thread that sends packets, and hands the aggregates to a
+    reader, such as the interface, through a deque. Appending to and popping from a deque are atomic, so neither side
+    takes a lock, and the reader does work proportional to the number of active links rather than to the number of
+    packets. The first thread to record a packet is the only writer: the reader never publishes on its behalf, so the
+    writer calls flush when a run ends to hand over the last partial aggregate.
+    """
+    def __init__(self, interval: float = 0.1, backlog: int = 64):
+        """
+        :param interval:    how often the aggregates are published, in seconds
+        :param backlog:     the number of unread publications kept; older ones are discarded if the reader falls behind
+        """
+        self.interval = interval
+        self.published = deque(maxlen=backlog)
+        self.links: Dict[Tuple[str, str], list] = {}
+        self.firewalls: Dict[object, list] = {}
+        self.window_start = time.monotonic()
+        self.last_sample = self.window_start
+        self.writer = None
+
+    def record(self, source: str, destination: str, size: int, allowed: bool, firewall=None):
+        """
+        Counts a packet on the link between two addresses. Called from the packet path, so it only updates the current
+        aggregate, publishing it when the interval has passed.
+        :param source:      the source IP address
+        :param destination: the destination IP address
+        :param size:        the size of the packet, in bytes
+        :param allowed:     False if the packet was dropped by the firewall or the link
+        :param firewall:    the firewall that judged the packet, if any
+        """
+        if self.writer is None:
+            # The first thread to record owns the aggregate; only it may publish
+            self.writer = threading.get_ident()
+        key = (source, destination)
+        link = self.links.get(key)
+        if link is None:
+            link = self.links[key] = [0, 0, 0]
+        link[0] += 1
+        link[1] += size
+        if not allowed:
+            link[2] += 1
+        if firewall is not None:
+            verdicts = self.firewalls.get(firewall)
+            if verdicts is None:
+                verdicts = self.firewalls[firewall] = [0, 0]
+            verdicts[0 if allowed else 1] += 1
+        now = time.monotonic()
+        if now - self.window_start >= self.interval:
+            self.publish(now)
+
+    def publish(self, now: float = None):
+        """
+        Hands the current aggregate to the reader and starts a new one. Must be called from the thread that records.
+        :param now: the current monotonic time, or None to read the clock
+        """
+        self.published.append((self.links, self.firewalls))
+        self.links, self.firewalls = {}, {}
+        self.window_start = time.monotonic() if now is None else now
+
+    def flush(self):
+        """
+        Publishes the partial aggregate, so the last packets of a run reach the reader without waiting for the interval.
+        Only has an effect on the thread that records.
+        """
+        if self.writer == threading.get_ident() and (self.links or self.firewalls):
+            self.publish()
+
+    def sample(self) -> TrafficSample:
+        """
+        Collects everything published since the last sample. If packets are recorded on this same thread, such as when
+        the scheduler is run from the interface's event loop, the current aggregate is published first.
+        :return: the traffic since the last sample
+        """
+        self.flush()
+        links, firewalls = {}, {}
+        while True:
+            try:
+                published_links, published_firewalls = self.published.popleft()
+            except IndexError:
+                break
+            for key, (packets, size, drops) in published_links.items():
+                total = links.setdefault(key, [0, 0, 0])
+                total[0] += packets
+                total[1] += size
+                total[2] += drops
+            for firewall, (allowed, dropped) in published_firewalls.items():
+                total = firewalls.setdefault(firewall, [0, 0])
+                total[0] += allowed
+                total[1] += dropped
+        now = time.monotonic()
+        duration, self.last_sample = now - self.last_sample, now
+        return TrafficSample(duration, links, firewalls)
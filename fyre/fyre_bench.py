@@ -0,0 +1,268 @@
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from typing import Callable, Dict, List
+
+from fyre.common.fyre_events import WARNING
+from fyre.common.fyre_packet import FyrePacket
+from fyre.fyre_logic import create_packet
+from fyre.fyre_scenario import build_scenario
+
+SERVICE_PORTS = [21, 22, 25, 80, 443, 3306, 8080]
+TRAFFIC_MIXES = ('uniform', 'skewed')
+# The benchmarks whose paths record metrics, which are rerun with metrics off to measure their overhead
+METRICS_BENCHMARKS = ('process_packet', 'send_packet')
+
+
+def _address(index: int, network: int) -> str:
+    return f"{network}.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}"
+
+
+def generate_scenario(clients: int, servers: int, firewalls: int, rules: int, seed: int = 0) -> dict:
+    """
+    Generates a synthetic scenario. Servers are spread evenly behind the firewalls, and each firewall gets a ruleset of
+    the given size, made of blocked client addresses and subnets plus a few port-range rules.
+    :param clients:     the number of clients
+    :param servers:     the number of servers
+    :param firewalls:   the number of firewalls
+    :param rules:       the number of blocked addresses per firewall
+    :param seed:        the random seed
+    :return:            the scenario, see fyre.fyre_scenario.build_scenario
+    """
+    rng = random.Random(seed)
+    client_ips = [_address(index, 10) for index in range(clients)]
+    server_ips = [_address(index, 172) for index in range(servers)]
+
+    scenario_firewalls = []
+    for index in range(firewalls):
+        blocked = [_address(rng.randrange(1 << 20), 10) for _ in range(rules)]
+        blocked += [f"192.168.{rng.randrange(256)}.0/24" for _ in range(rules // 100)]
+        scenario_firewalls.append({
+            "name": f"Firewall {index}",
+            "allowed_ports": rng.sample(SERVICE_PORTS, 4),
+            "blocked_ips": blocked,
+            "rules": [{"action": "deny", "dport": f"{port}-{port + 99}", "protocol": "tcp"}
+                      for port in range(10000, 10000 + max(rules // 1000, 1) * 100, 100)],
+            "members": server_ips[index::firewalls]
+        })
+
+    return {
+        "firewalls": scenario_firewalls,
+        "clients": [{"name": f"Client {index}", "ip": ip} for index, ip in enumerate(client_ips)],
+        "servers": [{"name": f"Server {index}", "ip": ip} for index, ip in enumerate(server_ips)]
+    }
+
+
+def generate_traffic(platform, packets: int, mix: str = 'uniform', seed: int = 0) -> List[tuple]:
+    """
+    Generates (client, destination IP, destination port, source port) tuples.
+    :param platform:    the platform to generate traffic for
+    :param packets:     the number of packets
+    :param mix:         "uniform" to pick every flow at random, or "skewed" to send 80% of packets on 20% of flows
+    :param seed:        the random seed
+    :return:            the traffic
+    """
+    if mix not in TRAFFIC_MIXES:
+        raise ValueError(f"Unknown traffic mix {mix}, expected one of {TRAFFIC_MIXES}.")
+    rng = random.Random(seed)
+
+    def flow():
+        return (rng.choice(platform.clients), rng.choice(platform.servers).ip, rng.choice(SERVICE_PORTS),
+                rng.randrange(1024, 65536))
+
+    if mix == 'uniform':
+        return [flow() for _ in range(packets)]
+    hot = [flow() for _ in range(max(packets // 100, 1))]
+    return [rng.choice(hot) if rng.random() < 0.8 else flow() for _ in range(packets)]
+
+
+def measure(operation: Callable, inputs: list) -> dict:
+    """
+    Runs an operation once per input, timing each call.
+    :param operation:   the function to benchmark, called with each input
+    :param inputs:      the inputs
+    :return:            the throughput and latency percentiles
+    """
+    durations = []
+    clock = time.perf_counter_ns
+    started = clock()
+    for value in inputs:
+        start = clock()
+        operation(value)
+        durations.append(clock() - start)
+    elapsed = clock() - started
+    durations.sort()
+    return {
+        "operations": len(inputs),
+        "ops_per_second": len(inputs) / (elapsed / 1e9) if elapsed else 0.0,
+        "p50_ns": durations[len(durations) // 2] if durations else 0,
+        "p99_ns": durations[min(int(len(durations) * 0.99), len(durations) - 1)] if durations else 0
+    }
+
+
+def _benchmarks(platform, traffic: List[tuple]) -> Dict[str, tuple]:
+    firewall_packets = []
+    for client, ip, dport, sport in traffic:
+        typehint, server = platform.get_fyre_component_by_ip(ip)
+        firewall = platform.determine_if_component_is_within_firewall(server)
+        if firewall:
+            firewall_packets.append((firewall, FyrePacket(client.ip, ip, sport, dport)))
+    servers = [platform.get_fyre_component_by_ip(ip)[1] for _, ip, _, _ in traffic]
+
+    return {
+        "get_fyre_component_by_ip": (lambda ip: platform.get_fyre_component_by_ip(ip),
+                                     [ip for _, ip, _, _ in traffic]),
+        "determine_if_component_is_within_firewall": (platform.determine_if_component_is_within_firewall, servers),
+        "create_packet": (lambda flow: create_packet(flow[1], flow[2], "GET / HTTP/1.1\r\n", "Host: fyre\r\n\r\n",
+                                                     flow[0].ip, flow[3]), traffic),
+        "process_packet": (lambda item: item[0].process_packet(item[1]), firewall_packets),
+        "send_packet": (lambda flow: flow[0].send_packet(flow[1], flow[2], flow[3], "Hello, World!"), traffic)
+    }
+
+
+def run_benchmarks(clients: int = 100, servers: int = 20, firewalls: int = 4, rules: int = 1000,
+                   packets: int = 20000, mix: str = 'uniform', seed: int = 0, memory: bool = True,
+                   overhead: bool = True) -> dict:
+    """
+    Builds a synthetic topology and times the platform's hot paths against generated traffic.
+    :param clients:     the number of clients
+    :param servers:     the number of servers
+    :param firewalls:   the number of firewalls
+    :param rules:       the number of blocked addresses per firewall
+    :param packets:     the number of packets per benchmark
+    :param mix:         the traffic mix, see generate_traffic
+    :param seed:        the random seed
+    :param memory:      True to also measure the peak traced memory of each benchmark, in a separate pass
+    :param overhead:    True to also rerun the benchmarks that record metrics with metrics off, on a fresh topology
+    :return:            the parameters, the results of each benchmark and, with overhead, the metrics overhead
+    """
+    params = {"clients": clients, "servers": servers, "firewalls": firewalls, "rules": rules, "packets": packets,
+              "mix": mix, "seed": seed}
+
+    def setup():
+        platform = build_scenario(generate_scenario(clients, servers, firewalls, rules, seed))
+        platform.events.level = WARNING
+        return platform, generate_traffic(platform, packets, mix, seed)
+
+    platform, traffic = setup()
+    results = {name: measure(operation, inputs) for name, (operation, inputs) in _benchmarks(platform, traffic).items()}
+
+    if memory:
+        for name in results:
+            tracemalloc.start()
+            platform, traffic = setup()
+            operation, inputs = _benchmarks(platform, traffic)[name]
+            for value in inputs:
+                operation(value)
+            results[name]["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    report = {"params": params, "python": sys.version.split()[0], "benchmarks": results}
+    if overhead:
+        report["metrics_overhead"] = {name: metrics_overhead(setup, name) for name in METRICS_BENCHMARKS}
+    return report
+
+
+def metrics_overhead(setup: Callable, name: str, rounds: int = 3) -> dict:
+    """
+    Measures what recording metrics costs a benchmark. Runs with metrics on and off alternate, each on a fresh
+    topology, and the fastest run of each is kept, so that drift over the run does not favour either.
+    :param setup:   builds a fresh platform and its traffic
+    :param name:    the benchmark, see METRICS_BENCHMARKS
+    :param rounds:  the number of runs with metrics on and with metrics off
+    :return:        the best throughput and median latency with metrics on and off, and the overhead as the fraction
+                    of throughput lost to metrics; differences of a few percent are within timing noise
+    """
+    best = {}
+    for _ in range(rounds):
+        for enabled in (True, False):
+            platform, traffic = setup()
+            platform.metrics_enabled = enabled
+            result = measure(*_benchmarks(platform, traffic)[name])
+            if enabled not in best or result["ops_per_second"] > best[enabled]["ops_per_second"]:
+                best[enabled] = result
+    on, off = best[True]["ops_per_second"], best[False]["ops_per_second"]
+    return {"ops_per_second_on": on, "ops_per_second_off": off, "p50_ns_on": best[True]["p50_ns"],
+            "p50_ns_off": best[False]["p50_ns"], "overhead": 1 - on / off if off else 0.0}
+
+
+def compare(results: dict, baseline: dict, threshold: float = 0.2) -> List[str]:
+    """
+    Compares benchmark results against a saved baseline.
+    :param results:     the results of run_benchmarks
+    :param baseline:    the baseline results
+    :param threshold:   the allowed relative regression, such as 0.2 for 20%
+    :return:            a description of each regression beyond the threshold
+    """
+    regressions = []
+    for name, current in results["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if not previous:
+            continue
+        if current["ops_per_second"] < previous["ops_per_second"] * (1 - threshold):
+            regressions.append(f"{name}: throughput {current['ops_per_second']:.0f}/s is below the baseline of "
+                               f"{previous['ops_per_second']:.0f}/s")
+        for metric in ("p50_ns", "p99_ns", "peak_memory_bytes"):
+            if metric in current and previous.get(metric) and current[metric] > previous[metric] * (1 + threshold):
+                regressions.append(f"{name}: {metric} {current[metric]} is above the baseline of {previous[metric]}")
+    if results.get("params") != baseline.get("params"):
+        regressions.append(f"Parameters differ from the baseline: {baseline.get('params')}")
+    return regressions
+
+
+def format_results(results: dict) -> str:
+    lines = [f"{'benchmark':<45}{'ops/s':>12}{'p50 (us)':>12}{'p99 (us)':>12}{'peak (KiB)':>12}"]
+    for name, result in results["benchmarks"].items():
+        peak = result.get("peak_memory_bytes")
+        lines.append(f"{name:<45}{result['ops_per_second']:>12.0f}{result['p50_ns'] / 1000:>12.2f}"
+                     f"{result['p99_ns'] / 1000:>12.2f}{peak / 1024 if peak is not None else float('nan'):>12.1f}")
+    if results.get("metrics_overhead"):
+        lines.append("")
+        lines.append(f"{'metrics overhead':<45}{'on ops/s':>12}{'off ops/s':>12}{'overhead':>12}")
+        for name, result in results["metrics_overhead"].items():
+            lines.append(f"{name:<45}{result['ops_per_second_on']:>12.0f}{result['ops_per_second_off']:>12.0f}"
+                         f"{result['overhead']:>12.1%}")
+    return "\n".join(lines)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks the FyreFyre platform against synthetic topologies.")
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--servers', type=int, default=20)
+    parser.add_argument('--firewalls', type=int, default=4)
+    parser.add_argument('--rules', type=int, default=1000, help="blocked addresses per firewall")
+    parser.add_argument('--packets', type=int, default=20000, help="packets per benchmark")
+    parser.add_argument('--mix', choices=TRAFFIC_MIXES, default='uniform')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help="skip the peak memory pass")
+    parser.add_argument('--no-overhead', action='store_true', help="skip the metrics-off pass")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="compare the results against this JSON file")
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed relative regression (default 0.2)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.clients, args.servers, args.firewalls, args.rules, args.packets, args.mix,
+                             args.seed, not args.no_memory, not args.no_overhead)
+    print(format_results(results))
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=4)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} of the baseline.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,264 @@
+from typing import Dict, List, Set, Tuple
+
+from fyre.common.fyre_spatial import bounds_contain
+
+FRAME_INTERVAL_MS = 16
+ROW_HEIGHT = 20
+TITLE_HEIGHT = 20
+
+
+class CanvasNode:
+    """
+    A component drawn as items on a shared canvas: a rectangle, a title and one text item per row. All items carry the
+    node's tag, so moving the node is a single canvas call.
+    """
+    def __init__(self, renderer, title: str, x: int, y: int, width: int, height: int, outline: str = 'black',
+                 fill: str = 'white'):
+        self.renderer = renderer
+        self.tag = f'node{id(self)}'
+        self.title = title
+        self.x, self.y = x, y
+        self.width, self.height = width, height
+        self.drawn_x, self.drawn_y = x, y
+        self.rows: List[int] = []
+        self.badge = None
+        self.geometry_callbacks = []
+
+        canvas = renderer.canvas
+        self.rectangle = canvas.create_rectangle(x, y, x + width, y + height, outline=outline, width=2, fill=fill,
+                                                 tags=(self.tag, 'node'))
+        self.title_item = canvas.create_text(x + 6, y + 4, text=title, anchor='nw', font=('TkDefaultFont', 9, 'bold'),
+                                             tags=(self.tag, 'node'))
+
+    def __str__(self):
+        return f"{self.title} at ({self.x}, {self.y})"
+
+    def _add_row(self, text: str, min_width: int, min_height: int, **options) -> int:
+        canvas = self.renderer.canvas
+        item = canvas.create_text(self.drawn_x + self.width // 2, self.drawn_y + TITLE_HEIGHT + ROW_HEIGHT * len(self.rows),
+                                  text=text, anchor='n', tags=(self.tag, 'node'), **options)
+        self.rows.append(item)
+        self.resize(max(self.width, min_width), max(self.height, min_height, TITLE_HEIGHT + ROW_HEIGHT * len(self.rows)))
+        return item
+
+    def add_label(self, text: str, drags_component: bool = True, min_width: int = 0, min_height: int = 0) -> int:
+        """
+        Adds a line of text to the node.
+        :param text:                The text to display
+        :param drags_component:     Unused, every part of a canvas node drags it
+        :param min_width:           The minimum width of the node
+        :param min_height:          The minimum height of the node
+        :return:                    The canvas item of the text
+        """
+        return self._add_row(text, min_width, min_height)
+
+    def add_button(self, text: str, command, min_width: int = 0, min_height: int = 0) -> int:
+        """
+        Adds a clickable line of text to the node.
+        :param text:        The text of the button
+        :param command:     The function to call when the button is clicked
+        :param min_width:   The minimum width of the node
+        :param min_height:  The minimum height of the node
+        :return:            The canvas item of the button
+        """
+        item = self._add_row(f'[ {text} ]', min_width, min_height, fill='blue')
+        self.renderer.buttons[item] = command
+        return item
+
+    def set_text(self, item: int, text: str):
+        self.renderer.canvas.itemconfigure(item, text=text)
+
+    def set_badge(self, text: str, fill: str = 'black'):
+        """
+        Shows a short status text in the top-right corner of the node, replacing the previous one.
+        :param text:    The text of the badge, or an empty string to hide it
+        :param fill:    The colour of the text
+        """
+        canvas = self.renderer.canvas
+        if self.badge is None:
+            self.badge = canvas.create_text(self.drawn_x + self.width - 6, self.drawn_y + 4, anchor='ne',
+                                            font=('TkDefaultFont', 8), tags=(self.tag, 'node'))
+        canvas.itemconfigure(self.badge, text=text, fill=fill)
+
+    def resize(self, width: int, height: int):
+        if (width, height) == (self.width, self.height):
+            return
+        self.width, self.height = width, height
+        canvas = self.renderer.canvas
+        canvas.coords(self.rectangle, self.drawn_x, self.drawn_y, self.drawn_x + width, self.drawn_y + height)
+        for index, item in enumerate(self.rows):
+            canvas.coords(item, self.drawn_x + width // 2, self.drawn_y + TITLE_HEIGHT + ROW_HEIGHT * index)
+        if self.badge is not None:
+            canvas.coords(self.badge, self.drawn_x + width - 6, self.drawn_y + 4)
+        self.renderer.request_redraw(self)
+
+    def move_to(self, x: int, y: int):
+        """
+        Moves the node. The canvas is updated on the next frame, together with every other node moved before then.
+        :param x:   The new x-coordinate of the top-left corner
+        :param y:   The new y-coordinate of the top-left corner
+        """
+        self.x, self.y = x, y
+        self.renderer.request_redraw(self)
+
+    def on_geometry_change(self, callback):
+        """
+        Registers a callback that is invoked, at most once per frame, whenever this node is moved or resized.
+        :param callback:    A function taking no arguments
+        """
+        self.geometry_callbacks.append(callback)
+
+    def bounds(self) -> Tuple[int, int, int, int]:
+        return self.x, self.y, self.width, self.height
+
+    def center(self) -> Tuple[int, int]:
+        return self.x + self.width // 2, self.y + self.height // 2
+
+    def screen_bounds(self) -> Tuple[int, int, int, int]:
+        """
+        Gets the position of this node on the screen, for placing dialogues over it.
+        :return:    A tuple of (x, y, width, height) in screen coordinates
+        """
+        canvas = self.renderer.canvas
+        x = canvas.winfo_rootx() + self.x - int(canvas.canvasx(0))
+        y = canvas.winfo_rooty() + self.y - int(canvas.canvasy(0))
+        return x, y, self.width, self.height
+
+    def has_component(self, other) -> bool:
+        return bounds_contain(self.bounds(), other.bounds())
+
+    def draw_line_from_center(self, canvas, other):
+        self.renderer.link(self, other)
+
+    def lower(self):
+        """
+        Moves this node below every other node, so the nodes placed inside it stay visible and clickable.
+        """
+        self.renderer.canvas.tag_lower(self.tag)
+
+    def apply(self) -> bool:
+        """
+        Moves the node's canvas items to its current position.
+        :return:    True if the node moved
+        """
+        dx, dy = self.x - self.drawn_x, self.y - self.drawn_y
+        if dx or dy:
+            self.renderer.canvas.move(self.tag, dx, dy)
+            self.drawn_x, self.drawn_y = self.x, self.y
+        return bool(dx or dy)
+
+
+class CanvasRenderer:
+    """
+    Draws nodes and the links between them as reusable items on a single canvas. Moves are recorded immediately but
+    drawn at most once per frame, so dragging or bulk updates cost one canvas update per changed node per frame no
+    matter how many events caused them. Right-button dragging pans the whole canvas.
+    """
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.nodes: Dict[str, CanvasNode] = {}
+        self.links: Dict[Tuple[CanvasNode, CanvasNode], int] = {}
+        self.node_links: Dict[CanvasNode, Set[Tuple[CanvasNode, CanvasNode]]] = {}
+        self.buttons: Dict[int, object] = {}
+        self.dirty: Set[CanvasNode] = set()
+        self.frame_scheduled = False
+        self.frames_drawn = 0
+        self._drag = None
+
+        canvas.tag_bind('node', '<ButtonPress-1>', self._start_drag)
+        canvas.tag_bind('node', '<B1-Motion>', self._drag_node)
+        canvas.tag_bind('node', '<ButtonRelease-1>', self._end_drag)
+        canvas.bind('<ButtonPress-3>', lambda event: canvas.scan_mark(event.x, event.y))
+        canvas.bind('<B3-Motion>', lambda event: canvas.scan_dragto(event.x, event.y, gain=1))
+
+    def add_node(self, title: str, x: int, y: int, width: int, height: int, outline: str = 'black',
+                 fill: str = 'white') -> CanvasNode:
+        """
+        Draws a new node.
+        :param title:   The title shown in the top-left corner of the node
+        :param x:       The x-coordinate of the top-left corner
+        :param y:       The y-coordinate of the top-left corner
+        :param width:   The initial width, which grows to fit the rows added to the node
+        :param height:  The initial height, which grows to fit the rows added to the node
+        :param outline: The colour of the border
+        :param fill:    The background colour, or an empty string for a transparent node that is only dragged by its
+                        border, title and rows
+        :return:        The node
+        """
+        node = CanvasNode(self, title, x, y, width, height, outline, fill)
+        self.nodes[node.tag] = node
+        return node
+
+    def link(self, source: CanvasNode, destination: CanvasNode, **options) -> int:
+        """
+        Draws a line between the centers of two nodes, reusing the existing line if there is one. The line follows the
+        nodes when they move.
+        :param source:          The node the line starts at
+        :param destination:     The node the line ends at
+        :param options:         Canvas line options such as fill and width
+        :return:                The canvas item of the line
+        """
+        key = (source, destination)
+        item = self.links.get(key)
+        if item is None:
+            item = self.canvas.create_line(*source.center(), *destination.center(), fill='black', width=2,
+                                           tags=('link',))
+            self.canvas.tag_lower(item)
+            self.links[key] = item
+            self.node_links.setdefault(source, set()).add(key)
+            self.node_links.setdefault(destination, set()).add(key)
+        else:
+            self.canvas.coords(item, *source.center(), *destination.center())
+        if options:
+            self.canvas.itemconfigure(item, **options)
+        return item
+
+    def request_redraw(self, node: CanvasNode):
+        self.dirty.add(node)
+        if not self.frame_scheduled:
+            self.frame_scheduled = True
+            self.canvas.after(FRAME_INTERVAL_MS, self.flush)
+
+    def flush(self):
+        """
+        Draws every node changed since the last frame, along with the links attached to them, and notifies their
+        geometry callbacks once each.
+        """
+        self.frame_scheduled = False
+        dirty, self.dirty = self.dirty, set()
+        moved_links = set()
+        for node in dirty:
+            node.apply()
+            moved_links.update(self.node_links.get(node, ()))
+            for callback in node.geometry_callbacks:
+                callback()
+        for source, destination in moved_links:
+            self.canvas.coords(self.links[(source, destination)], *source.center(), *destination.center())
+        self.frames_drawn += 1
+
+    def _node_at(self, event) -> Tuple[CanvasNode, int]:
+        item = self.canvas.find_withtag('current')
+        if not item:
+            return None, None
+        for tag in self.canvas.gettags(item[0]):
+            if tag in self.nodes:
+                return self.nodes[tag], item[0]
+        return None, None
+
+    def _start_drag(self, event):
+        node, item = self._node_at(event)
+        if node is None:
+            return
+        if item in self.buttons:
+            self.buttons[item]()
+            return
+        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+        self._drag = (node, x - node.x, y - node.y)
+
+    def _drag_node(self, event):
+        if self._drag:
+            node, offset_x, offset_y = self._drag
+            node.move_to(int(self.canvas.canvasx(event.x) - offset_x), int(self.canvas.canvasy(event.y) - offset_y))
+
+    def _end_drag(self, event):
+        self._drag = None
@@ -1,7 +1,8 @@
-from scapy.all import *
-from scapy.layers.inet import TCP, IP
+from fyre.common.fyre_packet import FyrePacket
 
 
-def create_packet(ip, port, body, headers) -> Packet:
-    # Create a web request with the given body using scapy
-    return IP(dst=ip) / TCP(dport=port) / body / headers
+def create_packet(ip, port, body, headers, src: str = '0.0.0.0', sport: int = 20) -> FyrePacket:
+    # Create a web request with the given body, converted to scapy only when it is displayed or exported
+    load = (body.encode() if isinstance(body, str) else bytes(body)) + \
+        (headers.encode() if isinstance(headers, str) else bytes(headers))
+    return FyrePacket(src, ip, sport, port, load=load)
@@ -0,0 +1,325 @@
+import ipaddress
+import random
+
+from bisect import bisect_right
+from typing import List, Optional, Tuple
+
+from fyre.common.fyre_rules import ALLOW, DENY, PROTOCOLS, FyreRule, parse_networks, parse_port_ranges
+from fyre.parts.firewall import Fyrewall
+
+DUPLICATE = 'duplicate'
+SHADOWED = 'shadowed'
+REDUNDANT = 'redundant'
+
+# IPv4 and IPv6 addresses are mapped onto one integer line, with each version in its own disjoint span
+_VERSION_SPAN = 1 << 129
+
+
+class _Ranges:
+    """
+    A set of integers stored as sorted, disjoint and non-adjacent inclusive intervals.
+    """
+    def __init__(self, intervals):
+        merged: List[List[int]] = []
+        for low, high in sorted(intervals):
+            if merged and low <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], high)
+            else:
+                merged.append([low, high])
+        self.intervals = [(low, high) for low, high in merged]
+        self.starts = [low for low, _ in self.intervals]
+
+    def __eq__(self, other):
+        return isinstance(other, _Ranges) and self.intervals == other.intervals
+
+    def _find(self, value: int) -> int:
+        return bisect_right(self.starts, value) - 1
+
+    def covers(self, other: '_Ranges') -> bool:
+        for low, high in other.intervals:
+            index = self._find(low)
+            if index < 0 or self.intervals[index][1] < high:
+                return False
+        return True
+
+    def overlaps(self, other: '_Ranges') -> bool:
+        small, large = (self, other) if len(self.intervals) <= len(other.intervals) else (other, self)
+        for low, high in small.intervals:
+            index = large._find(high)
+            if index >= 0 and large.intervals[index][1] >= low:
+                return True
+        return False
+
+
+def _network_ranges(networks) -> Optional[_Ranges]:
+    if networks is None:
+        return None
+    return _Ranges((network.version * _VERSION_SPAN + int(network.network_address),
+                    network.version * _VERSION_SPAN + int(network.broadcast_address)) for network in networks)
+
+
+def _port_ranges(ranges) -> Optional[_Ranges]:
+    return None if ranges is None else _Ranges(ranges)
+
+
+class _Shape:
+    """
+    The set of packets a rule matches, as one optional range set per field. None matches everything.
+    """
+    def __init__(self, action: str, src=None, dst=None, sport=None, dport=None, protocol=None):
+        self.action = action
+        self.fields = (_network_ranges(src), _network_ranges(dst), _port_ranges(sport), _port_ranges(dport))
+        self.protocol = protocol
+
+    @classmethod
+    def of(cls, rule: FyreRule) -> '_Shape':
+        return cls(rule.action, rule.src, rule.dst, rule.sport, rule.dport, rule.protocol)
+
+    def covers(self, other: '_Shape') -> bool:
+        if self.protocol is not None and self.protocol != other.protocol:
+            return False
+        return all(mine is None or (theirs is not None and mine.covers(theirs))
+                   for mine, theirs in zip(self.fields, other.fields))
+
+    def overlaps(self, other: '_Shape') -> bool:
+        if self.protocol is not None and other.protocol is not None and self.protocol != other.protocol:
+            return False
+        return all(mine is None or theirs is None or mine.overlaps(theirs)
+                   for mine, theirs in zip(self.fields, other.fields))
+
+    def same_match(self, other: '_Shape') -> bool:
+        return self.protocol == other.protocol and self.fields == other.fields
+
+
+def collapse_networks(entries) -> List[str]:
+    """
+    Merges addresses and networks into the smallest list of CIDR blocks covering exactly the same addresses.
+    :param entries: IP addresses or CIDR networks
+    :return:        the CIDR blocks, IPv4 first, in address order; single addresses are written without a prefix length
+    """
+    networks = parse_networks(list(entries)) or []
+    collapsed = []
+    for version in (4, 6):
+        collapsed += ipaddress.collapse_addresses(network for network in networks if network.version == version)
+    return [str(network.network_address) if network.num_addresses == 1 else str(network) for network in collapsed]
+
+
+def collapse_ports(entries) -> list:
+    """
+    Merges ports and port ranges into the smallest list of ranges covering exactly the same ports.
+    :param entries: ports, "low-high" strings or (low, high) tuples
+    :return:        the ports, as integers for single ports and "low-high" strings for ranges
+    """
+    ranges = parse_port_ranges(list(entries)) or []
+    return [low if low == high else f"{low}-{high}" for low, high in _Ranges(ranges).intervals]
+
+
+def _normalize_rule(config: dict) -> dict:
+    rule = FyreRule.from_dict(config)
+    normalized = {key: value for key, value in config.items() if key in ('action', 'name', 'protocol')}
+    for key in ('src', 'dst'):
+        if getattr(rule, key) is not None:
+            normalized[key] = collapse_networks(str(network) for network in getattr(rule, key))
+    for key in ('sport', 'dport'):
+        if getattr(rule, key) is not None:
+            normalized[key] = [str(port) for port in collapse_ports(getattr(rule, key))]
+    return normalized
+
+
+def _describe(index: int, config: dict) -> str:
+    return f"rule {index} ({config['name']})" if config.get('name') else f"rule {index} {config}"
+
+
+class OptimizationReport:
+    """
+    What an optimization changed: the rules removed and why, and the sizes of the configuration before and after.
+    """
+    def __init__(self):
+        self.findings: List[Tuple[str, int, str]] = []
+        self.before = {}
+        self.after = {}
+
+    def add(self, kind: str, index: int, reason: str):
+        """
+        :param kind:    "duplicate", "shadowed" or "redundant"
+        :param index:   the index of the removed rule in the original rule list
+        :param reason:  a description of the finding
+        """
+        self.findings.append((kind, index, reason))
+
+    def count(self, kind: str) -> int:
+        return sum(1 for finding in self.findings if finding[0] == kind)
+
+    def to_dict(self) -> dict:
+        return {
+            "before": self.before,
+            "after": self.after,
+            "findings": [{"kind": kind, "rule": index, "reason": reason} for kind, index, reason in self.findings]
+        }
+
+    def format(self) -> str:
+        lines = [f"{key}: {self.before[key]} -> {self.after[key]}" for key in self.before]
+        lines += [f"{kind}: {reason}" for kind, _, reason in self.findings]
+        return "\n".join(lines)
+
+
+def _sizes(config: dict) -> dict:
+    return {"rules": len(config.get("rules", [])), "allowed_ports": len(config["allowed_ports"]),
+            "blocked_ips": len(config["blocked_ips"])}
+
+
+def optimize_configuration(config: dict) -> Tuple[dict, OptimizationReport]:
+    """
+    Produces a smaller configuration that gives every packet the same verdict. Blocked IPs are merged into minimal CIDR
+    blocks and allowed ports into ranges, the networks and ports of each rule are merged the same way, and rules are
+    removed when they can never decide a packet:
+    - duplicate rules repeat an earlier rule exactly,
+    - shadowed rules are covered by an earlier rule with the opposite action, so they never match,
+    - redundant rules are covered by an earlier rule with the same action, or are covered by a later rule (including
+      the blocked IPs, allowed ports and default deny) with the same action and no rule in between that would give a
+      different verdict.
+    Packets that matched a removed redundant rule are decided by the rule that covers it instead, so their verdict is
+    unchanged but the rule they are counted against may differ.
+    :param config:  the configuration, see Fyrewall.configuration
+    :return:        the optimized configuration and a report of what changed
+    """
+    report = OptimizationReport()
+    report.before = _sizes(config)
+
+    allowed_ports = collapse_ports(config["allowed_ports"])
+    blocked_ips = collapse_networks(config["blocked_ips"])
+    rules = [_normalize_rule(rule) for rule in config.get("rules", [])]
+    shapes = [_Shape.of(FyreRule.from_dict(rule)) for rule in rules]
+
+    # Rules covered by an earlier rule never match
+    kept: List[int] = []
+    covered: List[Tuple[str, int, int]] = []
+    for index, shape in enumerate(shapes):
+        for earlier in kept:
+            if shapes[earlier].covers(shape):
+                if shapes[earlier].action != shape.action:
+                    kind = SHADOWED
+                elif shape.same_match(shapes[earlier]):
+                    kind = DUPLICATE
+                else:
+                    kind = REDUNDANT
+                covered.append((kind, index, earlier))
+                break
+        else:
+            kept.append(index)
+
+    # Rules covered by a later rule with the same verdict can be left to that rule
+    tail = []
+    if allowed_ports:
+        if blocked_ips:
+            tail.append(('the blocked IPs', _Shape(DENY, src=parse_networks(blocked_ips),
+                                                   dport=parse_port_ranges(allowed_ports))))
+        tail.append(('the allowed ports', _Shape(ALLOW, dport=parse_port_ranges(allowed_ports))))
+    tail.append(('the default deny', _Shape(DENY)))
+
+    replaced_by = {}
+    for position in range(len(kept) - 1, -1, -1):
+        index = kept[position]
+        shape = shapes[index]
+        later = [(_describe(other, config['rules'][other]), shapes[other]) for other in kept[position + 1:]] + tail
+        for description, other in later:
+            if other.action != shape.action:
+                if other.overlaps(shape):
+                    break
+            elif other.covers(shape):
+                report.add(REDUNDANT, index, f"{_describe(index, config['rules'][index])} is covered by "
+                                             f"{description}, which gives the same verdict")
+                replaced_by[index] = description
+                del kept[position]
+                break
+
+    # A rule covered by an earlier rule that was itself removed is decided by the rule that replaced the earlier one
+    for kind, index, earlier in covered:
+        reason = f"{_describe(index, config['rules'][index])} is covered by "
+        if earlier in replaced_by:
+            reason += f"{replaced_by[earlier]}, through {_describe(earlier, config['rules'][earlier])}, which is also " \
+                      f"removed"
+        else:
+            reason += _describe(earlier, config['rules'][earlier])
+        report.add(kind, index, reason)
+
+    report.findings.sort(key=lambda finding: finding[1])
+    optimized = {"allowed_ports": allowed_ports, "blocked_ips": blocked_ips, "rules": [rules[index] for index in kept]}
+    report.after = _sizes(optimized)
+    return optimized, report
+
+
+def _boundaries(config: dict) -> Tuple[List[str], List[int]]:
+    addresses, ports = [], [0, 65535]
+    rules = [FyreRule.from_dict(rule) for rule in config.get("rules", [])]
+    networks = [network for rule in rules for field in (rule.src, rule.dst) for network in field or []]
+    networks += parse_networks(config["blocked_ips"]) or []
+    for network in networks:
+        first, last = int(network.network_address), int(network.broadcast_address)
+        for value in (first - 1, first, last, last + 1):
+            try:
+                address_type = ipaddress.IPv4Address if network.version == 4 else ipaddress.IPv6Address
+                addresses.append(str(address_type(value)))
+            except ValueError:
+                pass
+    ranges = [port_range for rule in rules for field in (rule.sport, rule.dport) for port_range in field or []]
+    ranges += parse_port_ranges(config["allowed_ports"]) or []
+    for low, high in ranges:
+        ports += [port for port in (low - 1, low, high, high + 1) if 0 <= port <= 65535]
+    return addresses, ports
+
+
+def sample_traffic(config: dict, count: int = 10000, seed: int = 0) -> List[tuple]:
+    """
+    Generates packets for comparing rulesets: half at the edges of the configuration's networks and port ranges, where
+    a mistake in merging would show, and half at random. Protocols are drawn from TCP, UDP, ICMP, every protocol the
+    rules name, and one protocol that no rule names.
+    :param config:  the configuration whose edges to test
+    :param count:   the number of packets
+    :param seed:    the random seed
+    :return:        (src, dst, sport, dport, protocol) tuples
+    """
+    rng = random.Random(seed)
+    addresses, ports = _boundaries(config)
+    # Every protocol the rules name, the common ones, and one that no rule names
+    protocols = set(PROTOCOLS.values())
+    protocols.update(FyreRule.from_dict(rule).protocol for rule in config.get("rules", []))
+    protocols.discard(None)
+    protocols.add(min(set(range(256)) - protocols))
+    protocols = sorted(protocols)
+
+    def address():
+        if addresses and rng.random() < 0.5:
+            return rng.choice(addresses)
+        return str(ipaddress.IPv4Address(rng.getrandbits(32)))
+
+    def port():
+        return rng.choice(ports) if rng.random() < 0.5 else rng.randrange(65536)
+
+    return [(address(), address(), port(), port(), rng.choice(protocols)) for _ in range(count)]
+
+
+def verify(original: dict, optimized: dict, packets: List[tuple] = None, count: int = 10000, seed: int = 0) -> list:
+    """
+    Checks that two configurations give the same verdicts.
+    :param original:    the original configuration
+    :param optimized:   the optimized configuration
+    :param packets:     the (src, dst, sport, dport, protocol) tuples to check, or None to sample them from the original
+    :param count:       the number of packets to sample
+    :param seed:        the random seed for sampling
+    :return:            the packets with different verdicts, with the original and optimized action of each
+    """
+    if packets is None:
+        packets = sample_traffic(original, count, seed)
+
+    def compile_configuration(config):
+        return Fyrewall._compile([FyreRule.from_dict(rule) for rule in config.get("rules", [])],
+                                 config["allowed_ports"], config["blocked_ips"])
+
+    before, after = compile_configuration(original), compile_configuration(optimized)
+    mismatches = []
+    for packet in packets:
+        expected, actual = before.match(*packet)[0], after.match(*packet)[0]
+        if expected != actual:
+            mismatches.append((packet, expected, actual))
+    return mismatches
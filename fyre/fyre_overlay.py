@@ -0,0 +1,110 @@
+import math
+
+from fyre.common.fyre_traffic import TrafficMonitor
+from fyre.fyre_canvas import CanvasNode, CanvasRenderer
+
+IDLE_COLOUR = 'grey'
+
+
+def link_style(packets_per_second: float, drops_per_second: float) -> dict:
+    """
+    Gets the line options for a link: thicker for more packets, and green, orange or red by the share of packets
+    dropped.
+    :param packets_per_second:  the packet rate on the link
+    :param drops_per_second:    the drop rate on the link
+    :return:                    the canvas line options
+    """
+    drop_ratio = drops_per_second / packets_per_second if packets_per_second else 0.0
+    colour = 'green' if drop_ratio < 0.01 else 'orange' if drop_ratio < 0.1 else 'red'
+    return {"width": min(1 + math.log2(1 + packets_per_second), 10), "fill": colour}
+
+
+def format_rate(value: float) -> str:
+    if value >= 1e6:
+        return f"{value / 1e6:.1f}M"
+    if value >= 1e3:
+        return f"{value / 1e3:.1f}k"
+    return f"{value:.0f}"
+
+
+class TrafficOverlay:
+    """
+    Draws live traffic over the topology: each active link is a line whose thickness follows its packet rate and whose
+    colour follows its drop rate, and each firewall shows a badge with its allowed and dropped packets per second. The
+    overlay samples the platform's traffic monitor at a fixed refresh rate, so the canvas is updated the same number of
+    times per second whatever the packet rate.
+    """
+    def __init__(self, renderer: CanvasRenderer, platform, refresh_ms: int = 250):
+        """
+        :param renderer:    the renderer the topology is drawn with
+        :param platform:    the platform to show the traffic of; a traffic monitor is installed if it has none
+        :param refresh_ms:  how often to redraw the overlay, in milliseconds
+        """
+        self.renderer = renderer
+        self.platform = platform
+        self.refresh_ms = refresh_ms
+        if platform.traffic is None:
+            platform.traffic = TrafficMonitor()
+        self.monitor = platform.traffic
+        self.views = {}
+        self.active_links = set()
+        self.active_firewalls = set()
+        self.refreshes = 0
+        self.running = False
+
+    def _view_of(self, ip: str):
+        view = self.views.get(ip)
+        if view is None:
+            try:
+                typehint, component = self.platform.get_fyre_component_by_ip(ip)
+            except ValueError:
+                component = None
+            view = component.parent_ui_component if component else None
+            if isinstance(view, CanvasNode):
+                self.views[ip] = view
+            else:
+                view = None
+        return view
+
+    def refresh(self):
+        """
+        Samples the traffic since the last refresh and redraws the links and badges that changed.
+        """
+        sample = self.monitor.sample()
+        links = set()
+        for (source, destination), (packets, size, drops) in sample.link_rates().items():
+            source_view, destination_view = self._view_of(source), self._view_of(destination)
+            if source_view is None or destination_view is None:
+                continue
+            self.renderer.link(source_view, destination_view, **link_style(packets, drops))
+            links.add((source_view, destination_view))
+        for source_view, destination_view in self.active_links - links:
+            self.renderer.link(source_view, destination_view, width=1, fill=IDLE_COLOUR)
+        self.active_links = links
+
+        firewalls = set()
+        for firewall, (allowed, dropped) in sample.firewall_rates().items():
+            if isinstance(firewall.parent_ui_component, CanvasNode):
+                firewall.parent_ui_component.set_badge(f"{format_rate(allowed)}/s ok {format_rate(dropped)}/s drop",
+                                                       'red' if dropped > allowed else 'black')
+                firewalls.add(firewall)
+        for firewall in self.active_firewalls - firewalls:
+            firewall.parent_ui_component.set_badge('')
+        self.active_firewalls = firewalls
+        self.refreshes += 1
+
+    def start(self):
+        """
+        Starts refreshing the overlay from the tkinter event loop.
+        """
+        def tick():
+            if self.running:
+                self.refresh()
+                self.renderer.canvas.after(self.refresh_ms, tick)
+
+        if not self.running:
+            self.running = True
+            tick()
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,188 @@
+import os
+import pickle
+import zlib
+
+from collections import Counter
+from typing import List, Tuple
+
+from fyre.common.fyre_rules import ALLOW, PROTOCOLS, address_to_int
+from fyre.common.fyre_topology import zone_path
+from fyre.parts.platform import parse_address
+
+# Each worker process's private copy of the rules and zone graph, unpickled from shared memory when the worker starts
+_worker_state = None
+
+
+def shard_of(flow: tuple, shards: int) -> int:
+    """
+    Picks the shard for a flow from a hash of its 5-tuple. Uses CRC32 rather than hash() so every process agrees.
+    :param flow:    the (src, dst, sport, dport, protocol) tuple
+    :param shards:  the number of shards
+    :return:        the shard index
+    """
+    return zlib.crc32(repr(flow).encode()) % shards
+
+
+def compile_flow_table(platform) -> Tuple[list, dict, dict, list]:
+    """
+    Snapshots what is needed to evaluate flows without the platform: the compiled ruleset of every firewall, the zone
+    of each registered address, and the zone graph the paths between zones are computed from.
+    :param platform:    the platform to snapshot
+    :return:            a tuple of (rulesets, zone of each address, nesting, links), with zones as firewall indices;
+                        addresses outside every firewall map to -1, and top-level firewalls are nested in None
+    """
+    rulesets = [firewall.ruleset for firewall in platform.firewalls]
+    indices = {firewall: index for index, firewall in enumerate(platform.firewalls)}
+    indices[None] = -1
+    topology = platform.topology
+    zones = {address_to_int(address): indices[topology.zone_of(component)]
+             for address, (typehint, component) in platform.addresses.items()}
+    parents = {indices[firewall]: None if parent is None else indices[parent]
+               for firewall, parent in topology.parents.items()}
+    links = {indices[firewall]: [indices[other] for other in others] for firewall, others in topology.links.items()}
+    return rulesets, zones, parents, links
+
+
+def evaluate_flows(rulesets: list, zones: dict, parents: dict, links: dict, flows: List[tuple],
+                   indices: List[int]) -> tuple:
+    """
+    Evaluates flows against every firewall on the path from the source's zone to the destination's, in order, until
+    one drops the flow.
+    :param rulesets:        the compiled ruleset of every firewall
+    :param zones:           the map from address to zone
+    :param parents:         the map from each zone to the zone it is nested in
+    :param links:           the map from each zone to the zones it is linked to
+    :param flows:           the (src, dst, sport, dport, protocol) tuples to evaluate
+    :param indices:         the position of each flow in the original flow list
+    :return:                a tuple of (indices, verdicts, counts), where each verdict is (firewall index, allowed,
+                            rule index) for the firewall that decided the flow, and counts maps (firewall index, action)
+                            to the number of flows each firewall evaluated
+    """
+    verdicts, counts, paths = [], Counter(), {}
+    for src, dst, sport, dport, protocol in flows:
+        dst = parse_address(dst)
+        destination_zone = zones.get(address_to_int(dst))
+        if destination_zone is None:
+            raise ValueError(f"Fyre component with IP address {dst} not found.")
+        source_zone = zones.get(address_to_int(src), -1)
+        path = paths.get((source_zone, destination_zone))
+        if path is None:
+            path = paths[(source_zone, destination_zone)] = zone_path(
+                parents, links, None if source_zone < 0 else source_zone,
+                None if destination_zone < 0 else destination_zone)
+        firewall, action, rule = -1, ALLOW, -1
+        for firewall in path:
+            action, rule = rulesets[firewall].match(src, dst, sport, dport, protocol)
+            counts[(firewall, action)] += 1
+            if action != ALLOW:
+                break
+        if not path:
+            counts[(-1, action)] += 1
+        verdicts.append((firewall, action == ALLOW, rule))
+    return indices, verdicts, counts
+
+
+def _attach_worker(name: str, size: int):
+    global _worker_state
+    from multiprocessing import shared_memory
+
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        _worker_state = pickle.loads(memory.buf[:size])
+    finally:
+        memory.close()
+
+
+def _evaluate_shard(flows: List[tuple], indices: List[int]) -> tuple:
+    return evaluate_flows(*_worker_state, flows, indices)
+
+
+class FlowResults:
+    """
+    The verdicts for a list of flows, in the order the flows were given.
+    """
+    def __init__(self, count: int):
+        self.firewalls = [-1] * count
+        self.allowed = [False] * count
+        self.rules = [-1] * count
+        self.counts = Counter()
+
+    def merge(self, indices: List[int], verdicts: List[tuple], counts: Counter):
+        for index, (firewall, allowed, rule) in zip(indices, verdicts):
+            self.firewalls[index] = firewall
+            self.allowed[index] = allowed
+            self.rules[index] = rule
+        self.counts.update(counts)
+
+
+def _normalize(flow: tuple) -> tuple:
+    if len(flow) == 4:
+        return (*flow, PROTOCOLS['tcp'])
+    return tuple(flow)
+
+
+def _record(platform, results: FlowResults):
+    platform.record_verdicts({(platform.firewalls[firewall] if firewall >= 0 else None, action): count
+                              for (firewall, action), count in results.counts.items()})
+
+
+def run_flows(platform, flows: List[tuple]) -> FlowResults:
+    """
+    Evaluates flows in the current process. Produces the same results as run_flows_parallel, for cross-checking.
+    :param platform:    the platform whose firewalls evaluate the flows
+    :param flows:       (src, dst, sport, dport[, protocol]) tuples, where the protocol defaults to TCP
+    :return:            the verdict of every flow
+    """
+    flows = [_normalize(flow) for flow in flows]
+    results = FlowResults(len(flows))
+    results.merge(*evaluate_flows(*compile_flow_table(platform), flows, list(range(len(flows)))))
+    _record(platform, results)
+    return results
+
+
+def run_flows_parallel(platform, flows: List[tuple], workers: int = None, shards: int = None) -> FlowResults:
+    """
+    Evaluates flows on a process pool. Flows are sharded by a hash of their 5-tuple. The compiled rules are pickled
+    into shared memory once, and each worker unpickles its own copy when it starts, so the rules are not pickled with
+    every task; memory use still grows with the number of workers. Per-worker counts are merged back into the platform
+    once every shard is done. Connection tracking and verdict caching are not applied, since each flow is evaluated
+    against the rules alone. Whether this is faster than run_flows depends on the number of cores and flows; measure
+    it on the target machine.
+    :param platform:    the platform whose firewalls evaluate the flows
+    :param flows:       (src, dst, sport, dport[, protocol]) tuples, where the protocol defaults to TCP
+    :param workers:     the number of worker processes, or None for one per core
+    :param shards:      the number of shards, or None for four per worker
+    :return:            the verdict of every flow, identical to run_flows
+    """
+    # Process pools are only loaded when used, since they are slow to import
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import shared_memory
+
+    workers = workers if workers else os.cpu_count() or 1
+    shards = shards if shards else workers * 4
+    flows = [_normalize(flow) for flow in flows]
+
+    sharded_flows = [[] for _ in range(shards)]
+    sharded_indices = [[] for _ in range(shards)]
+    for index, flow in enumerate(flows):
+        shard = shard_of(flow, shards)
+        sharded_flows[shard].append(flow)
+        sharded_indices[shard].append(index)
+
+    data = pickle.dumps(compile_flow_table(platform), protocol=pickle.HIGHEST_PROTOCOL)
+    memory = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+    results = FlowResults(len(flows))
+    try:
+        memory.buf[:len(data)] = data
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_worker,
+                                 initargs=(memory.name, len(data))) as executor:
+            futures = [executor.submit(_evaluate_shard, shard_flows, shard_indices)
+                       for shard_flows, shard_indices in zip(sharded_flows, sharded_indices) if shard_flows]
+            for future in futures:
+                results.merge(*future.result())
+    finally:
+        memory.close()
+        memory.unlink()
+
+    _record(platform, results)
+    return results
@@ -0,0 +1,232 @@
+import mmap
+import socket
+import struct
+import time
+
+from typing import Iterator, Tuple
+
+from fyre.common.fyre_packet import FyrePacket
+from fyre.parts.platform import parse_address
+
+PCAP_MAGIC = {b'\xd4\xc3\xb2\xa1': ('<', 1e-6), b'\xa1\xb2\xc3\xd4': ('>', 1e-6),
+              b'\x4d\x3c\xb2\xa1': ('<', 1e-9), b'\xa1\xb2\x3c\x4d': ('>', 1e-9)}
+PCAPNG_SECTION_HEADER = b'\x0a\x0d\x0d\x0a'
+# The smallest valid length of the pcapng blocks that are read, by block type; other blocks need at least 12 bytes
+PCAPNG_MIN_LENGTH = {0x0a0d0d0a: 28, 1: 20, 3: 16, 6: 32}
+
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = (12, 14, 101, 228, 229)
+LINKTYPE_LINUX_SLL = 113
+
+TCP_FLAGS = 'FSRPAUEC'
+
+
+def _tcp_flags(value: int) -> str:
+    return ''.join(flag for bit, flag in enumerate(TCP_FLAGS) if value & (1 << bit))
+
+
+def parse_frame(linktype: int, data, timestamp: float):
+    """
+    Parses the IP and TCP/UDP headers of a captured frame.
+    :param linktype:    the link-layer header type of the capture
+    :param data:        the captured bytes
+    :param timestamp:   the capture time, in seconds
+    :return:            the frame as a fyre packet, or None if it is not an IP packet
+    """
+    if linktype == LINKTYPE_ETHERNET:
+        offset, ethertype = 14, int.from_bytes(data[12:14], 'big')
+        while ethertype in (0x8100, 0x88a8) and len(data) >= offset + 4:
+            ethertype, offset = int.from_bytes(data[offset + 2:offset + 4], 'big'), offset + 4
+        if ethertype not in (0x0800, 0x86dd):
+            return None
+    elif linktype == LINKTYPE_LINUX_SLL:
+        offset = 16
+    elif linktype == LINKTYPE_NULL:
+        offset = 4
+    elif linktype in LINKTYPE_RAW:
+        offset = 0
+    else:
+        return None
+
+    if len(data) < offset + 20:
+        return None
+    version = data[offset] >> 4
+    if version == 4:
+        header_length = (data[offset] & 0x0f) * 4
+        protocol = data[offset + 9]
+        src = socket.inet_ntop(socket.AF_INET, bytes(data[offset + 12:offset + 16]))
+        dst = socket.inet_ntop(socket.AF_INET, bytes(data[offset + 16:offset + 20]))
+        offset += header_length
+    elif version == 6 and len(data) >= offset + 40:
+        protocol = data[offset + 6]
+        src = socket.inet_ntop(socket.AF_INET6, bytes(data[offset + 8:offset + 24]))
+        dst = socket.inet_ntop(socket.AF_INET6, bytes(data[offset + 24:offset + 40]))
+        offset += 40
+    else:
+        return None
+
+    sport, dport, flags, load = 0, 0, '', b''
+    if protocol in (6, 17) and len(data) >= offset + 8:
+        sport, dport = struct.unpack_from('>HH', data, offset)
+        if protocol == 6 and len(data) >= offset + 20:
+            flags = _tcp_flags(data[offset + 13])
+            load = data[offset + (data[offset + 12] >> 4) * 4:]
+        else:
+            load = data[offset + 8:]
+    return FyrePacket(src, dst, sport, dport, protocol, flags, load, timestamp)
+
+
+def _read_pcap(buffer, endian: str, resolution: float) -> Iterator[Tuple[int, memoryview, float]]:
+    linktype = struct.unpack_from(endian + 'I', buffer, 20)[0] & 0x0fffffff
+    record = struct.Struct(endian + 'IIII')
+    offset = 24
+    while offset + record.size <= len(buffer):
+        seconds, fraction, captured, _ = record.unpack_from(buffer, offset)
+        offset += record.size
+        yield linktype, buffer[offset:offset + captured], seconds + fraction * resolution
+        offset += captured
+
+
+def _read_pcapng(buffer) -> Iterator[Tuple[int, memoryview, float]]:
+    endian, interfaces, offset = '<', [], 0
+    while offset + 12 <= len(buffer):
+        block_type = bytes(buffer[offset:offset + 4])
+        if block_type == PCAPNG_SECTION_HEADER:
+            endian = '<' if bytes(buffer[offset + 8:offset + 12]) == b'\x4d\x3c\x2b\x1a' else '>'
+            interfaces = []
+        block_type, block_length = struct.unpack_from(endian + 'II', buffer, offset)
+        if block_length < PCAPNG_MIN_LENGTH.get(block_type, 12) or block_length % 4 or \
+                offset + block_length > len(buffer):
+            raise ValueError(f"Malformed pcapng block of type {block_type} and length {block_length} at offset "
+                             f"{offset}.")
+        body = offset + 8
+        if block_type == 1:
+            linktype = struct.unpack_from(endian + 'H', buffer, body)[0]
+            interfaces.append((linktype, _pcapng_resolution(buffer, endian, body + 8, offset + block_length - 4)))
+        elif block_type == 6:
+            interface, high, low, captured = struct.unpack_from(endian + 'IIII', buffer, body)
+            if interface >= len(interfaces):
+                raise ValueError(f"Packet block at offset {offset} refers to unknown interface {interface}.")
+            linktype, resolution = interfaces[interface]
+            yield linktype, buffer[body + 20:body + 20 + captured], ((high << 32) | low) * resolution
+        elif block_type == 3 and interfaces:
+            captured = min(struct.unpack_from(endian + 'I', buffer, body)[0], block_length - 16)
+            yield interfaces[0][0], buffer[body + 4:body + 4 + captured], 0.0
+        offset += block_length
+
+
+def _pcapng_resolution(buffer, endian: str, offset: int, end: int) -> float:
+    while offset + 4 <= end:
+        code, length = struct.unpack_from(endian + 'HH', buffer, offset)
+        if code == 0:
+            break
+        if code == 9:
+            value = buffer[offset + 4]
+            return 2 ** -(value & 0x7f) if value & 0x80 else 10 ** -value
+        offset += 4 + (length + 3) // 4 * 4
+    return 1e-6
+
+
+def read_capture(path: str) -> Iterator[FyrePacket]:
+    """
+    Streams the IP packets of a pcap or pcapng file. The file is memory-mapped and parsed one record at a time, so
+    captures larger than memory can be read.
+    :param path:    the path of the capture file
+    :return:        an iterator over the packets in the capture
+    """
+    with open(path, 'rb') as capture:
+        with mmap.mmap(capture.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            buffer = memoryview(mapped)
+            try:
+                magic = bytes(buffer[:4])
+                if magic in PCAP_MAGIC:
+                    records = _read_pcap(buffer, *PCAP_MAGIC[magic])
+                elif magic == PCAPNG_SECTION_HEADER:
+                    records = _read_pcapng(buffer)
+                else:
+                    raise ValueError(f"{path} is not a pcap or pcapng file.")
+                for linktype, data, timestamp in records:
+                    packet = parse_frame(linktype, data, timestamp)
+                    del data
+                    if packet:
+                        yield packet
+            finally:
+                records = None
+                buffer.release()
+
+
+class ReplayStats:
+    def __init__(self):
+        self.packets = 0
+        self.bytes = 0
+        self.unmatched = 0
+        self.allowed = 0
+        self.dropped = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def packets_per_second(self) -> float:
+        return self.packets / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self) -> dict:
+        return {"packets": self.packets, "bytes": self.bytes, "unmatched": self.unmatched, "allowed": self.allowed,
+                "dropped": self.dropped, "elapsed": self.elapsed, "packets_per_second": self.packets_per_second}
+
+
+def replay_capture(platform, path: str, realtime: bool = False, speed: float = 1.0,
+                   stats: ReplayStats = None) -> Iterator[Tuple[FyrePacket, object, bool]]:
+    """
+    Streams a capture through the platform. Each packet is delivered to the registered component with its destination
+    IP, which passes it through its firewall. Packets to unregistered addresses are counted but not delivered.
+    :param platform:    the platform to replay the capture through
+    :param path:        the path of the pcap or pcapng file
+    :param realtime:    True to pace packets by their capture timestamps, False to replay as fast as possible
+    :param speed:       how many times faster than captured to replay when pacing by timestamps
+    :param stats:       the stats object to update, or None to create one
+    :return:            an iterator over (packet, destination, allowed) for each delivered packet
+    """
+    stats = stats if stats else ReplayStats()
+    first_timestamp, started = None, time.perf_counter()
+    for packet in read_capture(path):
+        if realtime:
+            if first_timestamp is None:
+                first_timestamp = packet.timestamp
+            delay = (packet.timestamp - first_timestamp) / speed - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+        stats.packets += 1
+        stats.bytes += len(packet)
+        entry = platform.addresses.get(parse_address(packet.dst))
+        if entry is None:
+            stats.unmatched += 1
+            stats.elapsed = time.perf_counter() - stats.started
+            continue
+        typehint, destination = entry
+        allowed = destination.receive_packet(packet)
+        if allowed:
+            stats.allowed += 1
+        else:
+            stats.dropped += 1
+        stats.elapsed = time.perf_counter() - stats.started
+        yield packet, destination, allowed
+    if platform.traffic is not None:
+        platform.traffic.flush()
+
+
+def replay(platform, path: str, realtime: bool = False, speed: float = 1.0) -> ReplayStats:
+    """
+    Replays a whole capture through the platform.
+    :param platform:    the platform to replay the capture through
+    :param path:        the path of the pcap or pcapng file
+    :param realtime:    True to pace packets by their capture timestamps, False to replay as fast as possible
+    :param speed:       how many times faster than captured to replay when pacing by timestamps
+    :return:            the throughput and verdict totals of the replay
+    """
+    stats = ReplayStats()
+    for _ in replay_capture(platform, path, realtime, speed, stats):
+        pass
+    stats.elapsed = time.perf_counter() - stats.started
+    return stats
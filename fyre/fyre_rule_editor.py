@@ -0,0 +1,341 @@
+import json
+import threading
+
+from typing import List, Tuple
+
+from fyre.fyre_rule_io import IMPORT_MODES, KIND_ALLOWED_PORT, KIND_BLOCKED_IP, KIND_RULE, RuleImportJob, \
+    export_rules, parse_allowed_port
+
+KIND_ALL = 'all'
+KINDS = (KIND_ALL, KIND_RULE, KIND_ALLOWED_PORT, KIND_BLOCKED_IP)
+CONFIG_KEYS = {KIND_RULE: "rules", KIND_ALLOWED_PORT: "allowed_ports", KIND_BLOCKED_IP: "blocked_ips"}
+POLL_INTERVAL_MS = 100
+
+
+def describe_rule(rule: dict) -> str:
+    """
+    Formats a rule in its JSON representation as a single line, such as "deny src=10.0.0.0/8 dport=22".
+    :param rule:    the rule as a dictionary
+    :return:        the description
+    """
+    fields = [f"{key}={','.join(value) if isinstance(value, list) else value}"
+              for key, value in rule.items() if key not in ('action', 'name')]
+    text = ' '.join([rule.get('action', '?')] + fields)
+    return f"{rule['name']}: {text}" if rule.get('name') else text
+
+
+class ConfigurationSaveJob(threading.Thread):
+    """
+    Compiles an edited configuration on a worker thread. Once it is done, call apply from the thread that owns the
+    firewall to switch it to the new configuration in one step.
+    """
+    def __init__(self, firewall, config: dict):
+        """
+        :param firewall:    the firewall to save to
+        :param config:      the configuration to save, see Fyrewall.configuration
+        """
+        super().__init__(name='fyre-rule-save', daemon=True)
+        self.firewall = firewall
+        self.config = config
+        self.prepared = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.prepared = self.firewall.prepare_configuration(self.config)
+        except Exception as e:
+            # A field of the wrong type can fail in many ways; every error is reported rather than ending the thread
+            self.error = e
+
+    def summary(self) -> str:
+        if self.error:
+            return f"Invalid firewall configuration: {self.error}"
+        if self.prepared is None:
+            return "The configuration has not been compiled yet."
+        return f"Configuration saved for {self.firewall.name}."
+
+    def apply(self):
+        """
+        Applies the compiled configuration to the firewall. Must only be called once the job is done.
+        """
+        if self.error:
+            raise ValueError(f"Invalid firewall configuration: {self.error}")
+        if self.prepared is None:
+            raise ValueError("The configuration has not been compiled yet.")
+        self.firewall.apply_configuration(self.prepared)
+
+
+class RuleTable:
+    """
+    A working copy of a firewall configuration presented as one list of rows, filtered and split into pages. Only the
+    rows of the current page are ever handed to the interface, so the cost of drawing does not depend on the size of
+    the configuration.
+    """
+    def __init__(self, config: dict, page_size: int = 50):
+        """
+        :param config:      the configuration to edit, see Fyrewall.configuration; it is copied
+        :param page_size:   the number of rows per page
+        """
+        self.page_size = page_size
+        self.search = ''
+        self.kind = KIND_ALL
+        self.matches: List[Tuple[str, int]] = []
+        self.page = 0
+        self.load(config)
+
+    def load(self, config: dict):
+        """
+        Replaces the working copy, keeping the current filter.
+        :param config:  the configuration, see Fyrewall.configuration; it is copied
+        """
+        self.config = {key: list(config.get(key, [])) for key in CONFIG_KEYS.values()}
+        self.refilter()
+
+    def text(self, kind: str, index: int) -> str:
+        value = self.config[CONFIG_KEYS[kind]][index]
+        return describe_rule(value) if kind == KIND_RULE else str(value)
+
+    def set_filter(self, search: str = '', kind: str = KIND_ALL):
+        """
+        Shows only the rows of a kind whose text contains the search string, and goes back to the first page.
+        :param search:  the text to search for, case-insensitively
+        :param kind:    "all" or the kind of row to show
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Unknown row kind {kind}, expected one of {KINDS}.")
+        self.search, self.kind = search.strip().lower(), kind
+        self.page = 0
+        self.refilter()
+
+    def refilter(self):
+        kinds = CONFIG_KEYS if self.kind == KIND_ALL else [self.kind]
+        self.matches = [(kind, index) for kind in kinds for index in range(len(self.config[CONFIG_KEYS[kind]]))
+                        if not self.search or self.search in self.text(kind, index).lower()]
+        self.page = min(self.page, max(self.page_count - 1, 0))
+
+    @property
+    def page_count(self) -> int:
+        return (len(self.matches) + self.page_size - 1) // self.page_size
+
+    def page_rows(self) -> List[Tuple[str, int, str]]:
+        """
+        :return: the (kind, index, text) of each row on the current page
+        """
+        start = self.page * self.page_size
+        return [(kind, index, self.text(kind, index)) for kind, index in self.matches[start:start + self.page_size]]
+
+    def add(self, kind: str, value: str):
+        """
+        Adds a row. Values are checked when the configuration is saved.
+        :param kind:    "rule", "allowed_port" or "blocked_ip"
+        :param value:   a rule as JSON, a port or port range, or an IP address or network
+        """
+        if kind == KIND_RULE:
+            value = json.loads(value)
+        elif kind == KIND_ALLOWED_PORT:
+            value = parse_allowed_port(value)
+        self.config[CONFIG_KEYS[kind]].append(value)
+        self.refilter()
+
+    def remove(self, rows: List[Tuple[str, int]]):
+        """
+        Removes rows.
+        :param rows:    the (kind, index) of each row to remove
+        """
+        for kind, index in sorted(rows, key=lambda row: row[1], reverse=True):
+            del self.config[CONFIG_KEYS[kind]][index]
+        self.refilter()
+
+    def configuration(self) -> dict:
+        return {key: list(value) for key, value in self.config.items()}
+
+
+def open_rule_editor(firewall, x: int = None, y: int = None, page_size: int = 50):
+    """
+    Opens a window for editing a firewall's rules, allowed ports and blocked IPs a page at a time, with search, and
+    with import from and export to JSON, CSV and plain address lists. Saving, importing and exporting run on
+    worker threads; the window polls them and applies the result to the firewall in one step.
+    :param firewall:    the firewall to edit
+    :param x:           the screen x-coordinate of the window, or None to let the window manager place it
+    :param y:           the screen y-coordinate of the window
+    :param page_size:   the number of rows per page
+    """
+    import tkinter as tk
+    from tkinter import filedialog, ttk
+
+    window = tk.Toplevel()
+    window.title(f"{firewall.name} Configuration")
+    window.geometry(f'700x480+{x}+{y}' if x is not None else '700x480')
+    table = RuleTable(firewall.configuration(), page_size)
+
+    # Show the firewall's counters, refreshed every second while the window is open
+    counters_label = tk.Label(window, anchor='w', justify='left')
+    counters_label.pack(fill='x')
+
+    refresh = []
+
+    def refresh_counters():
+        counters_label.config(text=firewall.format_counters())
+        refresh[:] = [window.after(1000, refresh_counters)]
+
+    def stop_refreshing(event):
+        if event.widget is window and refresh:
+            window.after_cancel(refresh.pop())
+
+    refresh_counters()
+    window.bind('<Destroy>', stop_refreshing, add='+')
+
+    # Search and filter
+    filter_bar = tk.Frame(window)
+    filter_bar.pack(fill='x')
+    tk.Label(filter_bar, text="Search:").pack(side='left')
+    search = tk.StringVar()
+    tk.Entry(filter_bar, textvariable=search).pack(side='left', fill='x', expand=True)
+    kind = tk.StringVar(value=KIND_ALL)
+    ttk.Combobox(filter_bar, textvariable=kind, values=KINDS, state='readonly', width=12).pack(side='left')
+
+    # The rows of the current page
+    tree = ttk.Treeview(window, columns=('kind', 'entry'), show='headings', height=min(page_size, 12))
+    tree.heading('kind', text="Kind")
+    tree.heading('entry', text="Entry")
+    tree.column('kind', width=100, stretch=False)
+    tree.pack(fill='both', expand=True)
+
+    navigation = tk.Frame(window)
+    navigation.pack(fill='x')
+    page_label = tk.Label(navigation)
+
+    def show_page():
+        tree.delete(*tree.get_children())
+        for row_kind, index, text in table.page_rows():
+            tree.insert('', 'end', iid=f"{row_kind}:{index}", values=(row_kind, text))
+        page_label.config(text=f"Page {table.page + 1} of {max(table.page_count, 1)} ({len(table.matches)} rows)")
+
+    def turn_page(offset: int):
+        table.page = min(max(table.page + offset, 0), max(table.page_count - 1, 0))
+        show_page()
+
+    tk.Button(navigation, text="<", command=lambda: turn_page(-1)).pack(side='left')
+    page_label.pack(side='left')
+    tk.Button(navigation, text=">", command=lambda: turn_page(1)).pack(side='left')
+    tree.bind('<MouseWheel>', lambda event: turn_page(-1 if event.delta > 0 else 1))
+    tree.bind('<Button-4>', lambda event: turn_page(-1))
+    tree.bind('<Button-5>', lambda event: turn_page(1))
+
+    # Filtering runs once the user stops typing rather than on every key
+    pending_filter = []
+
+    def apply_filter():
+        pending_filter.clear()
+        table.set_filter(search.get(), kind.get())
+        show_page()
+
+    def schedule_filter(*args):
+        if pending_filter:
+            window.after_cancel(pending_filter.pop())
+        pending_filter.append(window.after(250, apply_filter))
+
+    search.trace_add('write', schedule_filter)
+    kind.trace_add('write', schedule_filter)
+
+    # Adding and removing rows
+    edit_bar = tk.Frame(window)
+    edit_bar.pack(fill='x')
+    new_kind = tk.StringVar(value=KIND_BLOCKED_IP)
+    ttk.Combobox(edit_bar, textvariable=new_kind, values=KINDS[1:], state='readonly', width=12).pack(side='left')
+    new_value = tk.Entry(edit_bar)
+    new_value.pack(side='left', fill='x', expand=True)
+    status = tk.Label(window, anchor='w')
+
+    def add_row():
+        try:
+            table.add(new_kind.get(), new_value.get())
+        except ValueError as e:
+            status.config(text=f"Invalid entry: {e}")
+            return
+        new_value.delete(0, tk.END)
+        show_page()
+
+    def remove_rows():
+        table.remove([(row.split(':')[0], int(row.split(':')[1])) for row in tree.selection()])
+        show_page()
+
+    tk.Button(edit_bar, text="Add", command=add_row).pack(side='left')
+    tk.Button(edit_bar, text="Remove selected", command=remove_rows).pack(side='left')
+
+    # Saving, importing and exporting, with progress
+    actions = tk.Frame(window)
+    actions.pack(fill='x')
+    progress = ttk.Progressbar(actions, maximum=1.0, length=200)
+    busy = []
+
+    def poll(job, get_progress, on_done):
+        progress['value'] = get_progress()
+        if job.is_alive():
+            window.after(POLL_INTERVAL_MS, lambda: poll(job, get_progress, on_done))
+        else:
+            busy.clear()
+            progress['value'] = 0
+            on_done()
+
+    def reload(message: str):
+        table.load(firewall.configuration())
+        show_page()
+        status.config(text=message)
+
+    def save():
+        if busy:
+            return
+        job = ConfigurationSaveJob(firewall, table.configuration())
+
+        def done():
+            if job.error or job.prepared is None:
+                status.config(text=job.summary())
+            else:
+                job.apply()
+                reload(job.summary())
+
+        busy.append(job)
+        status.config(text="Compiling...")
+        job.start()
+        poll(job, lambda: 0.5, done)
+
+    def import_file(mode: str):
+        path = filedialog.askopenfilename(parent=window, title=f"Import rules ({mode})", filetypes=[
+            ("Rules", "*.json *.csv *.txt *.lst"), ("All files", "*")])
+        if not path or busy:
+            return
+        job = RuleImportJob(firewall, path, mode, current=table.configuration())
+
+        def done():
+            if not job.done or job.error or job.prepared is None:
+                status.config(text=job.summary())
+            else:
+                job.apply()
+                reload(job.summary())
+
+        busy.append(job)
+        status.config(text=f"Importing {path}...")
+        job.start()
+        poll(job, lambda: job.progress, done)
+
+    def export_file():
+        path = filedialog.asksaveasfilename(parent=window, title="Export rules", defaultextension='.json', filetypes=[
+            ("JSON", "*.json"), ("CSV", "*.csv"), ("Address list", "*.txt")])
+        if not path or busy:
+            return
+        written = [0.0]
+        thread = export_rules(table.configuration(), path, lambda fraction: written.__setitem__(0, fraction))
+        busy.append(thread)
+        status.config(text=f"Exporting {path}...")
+        poll(thread, lambda: written[0], lambda: status.config(text=f"Exported to {path}."))
+
+    tk.Button(actions, text="Save", command=save).pack(side='left')
+    for mode in IMPORT_MODES:
+        tk.Button(actions, text=f"Import ({mode})", command=lambda mode=mode: import_file(mode)).pack(side='left')
+    tk.Button(actions, text="Export", command=export_file).pack(side='left')
+    progress.pack(side='left', padx=10)
+    status.pack(fill='x')
+
+    show_page()
+    return window
@@ -0,0 +1,243 @@
+import csv
+import json
+import os
+import threading
+
+from typing import Callable, List
+
+from fyre.common.fyre_rules import parse_port_ranges
+
+CSV_FIELDS = ['kind', 'action', 'name', 'src', 'dst', 'sport', 'dport', 'protocol']
+RULE_FIELDS = ['src', 'dst', 'sport', 'dport']
+KIND_RULE = 'rule'
+KIND_BLOCKED_IP = 'blocked_ip'
+KIND_ALLOWED_PORT = 'allowed_port'
+IMPORT_MODES = ('append', 'replace')
+
+
+def file_format(path: str) -> str:
+    """
+    Gets the format of a rules file from its extension: "json", "csv", or "list" for anything else.
+    :param path:    the path of the file
+    :return:        the format
+    """
+    extension = os.path.splitext(path)[1].lower()
+    return {'.json': 'json', '.csv': 'csv'}.get(extension, 'list')
+
+
+def parse_allowed_port(value: str):
+    """
+    Parses an allowed port as written in a file or typed by the user.
+    :param value:   a port, or a "low-high" range as written by the optimizer
+    :return:        the port as an integer, or the range as a string
+    """
+    value = value.strip()
+    parse_port_ranges(value)
+    return int(value) if value.isdigit() else value
+
+
+def empty_configuration() -> dict:
+    return {"allowed_ports": [], "blocked_ips": [], "rules": []}
+
+
+class _ProgressReader:
+    """
+    Wraps a text file, reporting the fraction of it read so far.
+    """
+    def __init__(self, file, size: int, progress: Callable[[float], None]):
+        self.file = file
+        self.size = size
+        self.progress = progress
+        self.lines = 0
+
+    def __iter__(self):
+        for line in self.file:
+            self.lines += 1
+            if self.progress and self.lines % 4096 == 0:
+                self.progress(min(self.file.buffer.tell() / self.size, 1.0) if self.size else 1.0)
+            yield line
+
+
+def read_rules(path: str, progress: Callable[[float], None] = None) -> dict:
+    """
+    Reads a firewall configuration from a file. JSON files hold a configuration, or a list of rules. CSV files have a
+    row per rule, blocked IP or allowed port, as written by write_rules. Any other file is a list of IP addresses or
+    CIDR networks to block, one per line, with # starting a comment.
+    :param path:        the path of the file
+    :param progress:    called with the fraction of the file read so far, from the thread reading it
+    :return:            the configuration, with "allowed_ports", "blocked_ips" and "rules"
+    """
+    size = os.path.getsize(path)
+    form = file_format(path)
+    config = empty_configuration()
+
+    if form == 'json':
+        with open(path) as file:
+            data = json.load(file)
+        if isinstance(data, list):
+            config["rules"] = data
+        elif isinstance(data, dict):
+            config.update({key: data[key] for key in config if key in data})
+        else:
+            raise ValueError(f"Expected a configuration or a list of rules in {path}.")
+    else:
+        with open(path, newline='') as file:
+            reader = _ProgressReader(file, size, progress)
+            if form == 'csv':
+                _read_csv(reader, config, path)
+            else:
+                for line in reader:
+                    entry = line.split('#', 1)[0].strip()
+                    if entry:
+                        config["blocked_ips"].append(entry)
+
+    if progress:
+        progress(1.0)
+    return config
+
+
+def _read_csv(lines, config: dict, path: str):
+    for number, row in enumerate(csv.DictReader(lines), start=2):
+        kind = (row.get('kind') or KIND_RULE).strip()
+        if kind == KIND_BLOCKED_IP:
+            if not row.get('src'):
+                raise ValueError(f"Missing blocked IP on line {number} of {path}.")
+            config["blocked_ips"].append(row['src'].strip())
+        elif kind == KIND_ALLOWED_PORT:
+            try:
+                config["allowed_ports"].append(parse_allowed_port(row['dport']))
+            except (AttributeError, ValueError):
+                raise ValueError(f"Invalid allowed port on line {number} of {path}: {row.get('dport')}")
+        elif kind == KIND_RULE:
+            rule = {key: row[key].strip() for key in ('action', 'name', 'protocol') if row.get(key)}
+            rule.update({key: row[key].split() for key in RULE_FIELDS if row.get(key)})
+            config["rules"].append(rule)
+        else:
+            raise ValueError(f"Unknown row kind on line {number} of {path}: {kind}")
+
+
+def write_rules(path: str, config: dict, progress: Callable[[float], None] = None):
+    """
+    Writes a firewall configuration to a file, in the format given by its extension. Plain lists only hold the
+    blocked IPs.
+    :param path:        the path of the file
+    :param config:      the configuration, see Fyrewall.configuration
+    :param progress:    called with the fraction of the configuration written so far
+    """
+    form = file_format(path)
+    if form == 'json':
+        with open(path, 'w') as file:
+            json.dump(config, file, indent=4)
+    elif form == 'csv':
+        rows = [dict(rule, kind=KIND_RULE) for rule in config.get("rules", [])]
+        rows += [{"kind": KIND_ALLOWED_PORT, "dport": port} for port in config.get("allowed_ports", [])]
+        rows += [{"kind": KIND_BLOCKED_IP, "src": ip} for ip in config.get("blocked_ips", [])]
+        with open(path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, CSV_FIELDS)
+            writer.writeheader()
+            for index, row in enumerate(rows):
+                writer.writerow({key: ' '.join(value) if isinstance(value, list) else value
+                                 for key, value in row.items()})
+                if progress and index % 4096 == 0:
+                    progress(index / len(rows))
+    else:
+        with open(path, 'w') as file:
+            file.writelines(f"{ip}\n" for ip in config.get("blocked_ips", []))
+    if progress:
+        progress(1.0)
+
+
+def merge_configurations(current: dict, imported: dict, mode: str = 'append') -> dict:
+    """
+    Combines an imported configuration with the current one.
+    :param current:     the current configuration
+    :param imported:    the imported configuration
+    :param mode:        "append" to add the imported entries after the current ones, or "replace" to use only them
+    :return:            the combined configuration
+    """
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"Unknown import mode {mode}, expected one of {IMPORT_MODES}.")
+    if mode == 'replace':
+        return imported
+    return {key: list(current.get(key, [])) + list(imported.get(key, [])) for key in empty_configuration()}
+
+
+class RuleImportJob(threading.Thread):
+    """
+    Reads, validates and compiles a rules file on a worker thread. Once it is done, call apply from the thread that
+    owns the firewall to switch it to the new configuration in one step. Progress and errors are exposed as attributes
+    so they can be polled, for example from the tkinter event loop.
+    """
+    def __init__(self, firewall, path: str, mode: str = 'append', current: dict = None):
+        """
+        :param firewall:    the firewall to import into
+        :param path:        the path of the file
+        :param mode:        "append" or "replace", see merge_configurations
+        :param current:     the configuration to append to, or None to use the firewall's configuration
+        """
+        super().__init__(name='fyre-rule-import', daemon=True)
+        if mode not in IMPORT_MODES:
+            raise ValueError(f"Unknown import mode {mode}, expected one of {IMPORT_MODES}.")
+        self.firewall = firewall
+        self.path = path
+        self.mode = mode
+        self.current = current if current is not None else firewall.configuration()
+        self.progress = 0.0
+        self.stage = 'reading'
+        self.imported = None
+        self.prepared = None
+        self.error = None
+
+    def _report(self, fraction: float):
+        # Reading is most of the work; compiling is reported as the last tenth
+        self.progress = fraction * 0.9
+
+    def run(self):
+        try:
+            self.imported = read_rules(self.path, self._report)
+            self.stage = 'compiling'
+            config = merge_configurations(self.current, self.imported, self.mode)
+            self.prepared = self.firewall.prepare_configuration(config)
+            self.progress = 1.0
+        except Exception as e:
+            # Malformed files can fail in many ways; every error is reported to the poller rather than ending the thread
+            self.error = e
+        finally:
+            self.stage = 'done' if self.prepared is not None and self.error is None else 'failed'
+
+    @property
+    def done(self) -> bool:
+        return self.stage in ('done', 'failed')
+
+    def summary(self) -> str:
+        if self.error:
+            return f"Import failed: {self.error}"
+        if self.imported is None:
+            return "Import failed."
+        counts: List[str] = [f"{len(self.imported[key])} {key.replace('_', ' ')}" for key in empty_configuration()]
+        return f"Imported {', '.join(counts)} from {os.path.basename(self.path)}"
+
+    def apply(self):
+        """
+        Applies the imported configuration to the firewall. Must only be called once the job is done.
+        """
+        if self.error:
+            raise ValueError(f"Import failed: {self.error}")
+        if self.prepared is None:
+            raise ValueError("The import has not finished yet.")
+        self.firewall.apply_configuration(self.prepared)
+
+
+def export_rules(config: dict, path: str, progress: Callable[[float], None] = None) -> threading.Thread:
+    """
+    Writes a configuration to a file on a worker thread. The configuration is copied first, so it may change while it
+    is written.
+    :param config:      the configuration, see Fyrewall.configuration
+    :param path:        the path of the file
+    :param progress:    called with the fraction written so far
+    :return:            the started thread
+    """
+    config = {key: list(value) for key, value in config.items()}
+    thread = threading.Thread(target=write_rules, args=(path, config, progress), name='fyre-rule-export', daemon=True)
+    thread.start()
+    return thread
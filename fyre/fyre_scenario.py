@@ -0,0 +1,125 @@
+import json
+
+from fyre.parts.client import FyreClient
+from fyre.parts.firewall import Fyrewall
+from fyre.parts.platform import Platform
+from fyre.parts.server import FyreServer
+
+
+def build_scenario(scenario: dict, platform: Platform = None) -> Platform:
+    """
+    Builds a headless topology from a scenario. A scenario is a dictionary of the form:
+
+        {
+            "firewalls": [{"name": "Perimeter", "allowed_ports": [80, 443], "blocked_ips": [], "rules": []},
+                          {"name": "DMZ", "allowed_ports": [80], "blocked_ips": [], "rules": [],
+                           "members": ["10.0.0.2"], "parent": "Perimeter", "links": []}],
+            "clients": [{"name": "Client 1", "ip": "10.0.0.1"}],
+            "servers": [{"name": "Web", "ip": "10.0.0.2", "services": {
+                "website": 80, "api": {"port": 8080, "workers": 4, "queue_limit": 50, "service_time": 0.005}}}]
+        }
+
+    Firewall membership is declared by listing member IPs rather than inferred from the UI, so no display is needed.
+    A firewall may name the firewall it is nested in as its parent, and the firewalls it is directly linked to. Firewall
+    names must be unique for these references. Set "connection_tracking" to true on a firewall to let packets of flows it
+    has allowed skip its rules, and "verdict_cache" to remember its verdicts until its rules change. A service is given
+    as its port, or as a dictionary of its port and capacity, see FyreService.
+    :param scenario:    the scenario as a dictionary
+    :param platform:    the platform to register components with, or None to create a new one
+    :return:            the platform the scenario was built on
+    """
+    platform = platform if platform else Platform()
+
+    for client in scenario.get("clients", []):
+        FyreClient(platform, None, None, client.get("name", "Client"), client.get("ip"))
+
+    for server_config in scenario.get("servers", []):
+        server = FyreServer(platform, None, None, server_config.get("name", "Server"), server_config.get("ip"))
+        for service_name, service in server_config.get("services", {}).items():
+            if isinstance(service, dict):
+                service = dict(service)
+                server.register_service(service_name, service.pop("port"), **service)
+            else:
+                server.register_service(service_name, service)
+
+    created = []
+    for firewall_config in scenario.get("firewalls", []):
+        firewall = Fyrewall(platform, None, None, firewall_config.get("name", "Firewall"),
+                            firewall_config.get("connection_tracking", False),
+                            firewall_config.get("verdict_cache", False))
+        created.append(firewall)
+        firewall.load_configuration({
+            "allowed_ports": firewall_config.get("allowed_ports", []),
+            "blocked_ips": firewall_config.get("blocked_ips", []),
+            "rules": firewall_config.get("rules", [])
+        })
+        for ip in firewall_config.get("members", []):
+            typehint, component = platform.get_fyre_component_by_ip(ip)
+            platform.add_to_firewall(component, firewall)
+
+    firewalls = {firewall.name: firewall for firewall in platform.firewalls}
+    for firewall_config, firewall in zip(scenario.get("firewalls", []), created):
+        if firewall_config.get("parent"):
+            platform.add_to_firewall(firewall, _firewall_named(firewalls, firewall_config["parent"]))
+        for name in firewall_config.get("links", []):
+            platform.link_firewalls(firewall, _firewall_named(firewalls, name))
+
+    return platform
+
+
+def _firewall_named(firewalls: dict, name: str):
+    if name not in firewalls:
+        raise ValueError(f"Unknown firewall {name}.")
+    return firewalls[name]
+
+
+def load_scenario(path: str, platform: Platform = None) -> Platform:
+    """
+    Loads a headless topology from a JSON scenario file. See build_scenario for the file format.
+    :param path:        the path of the scenario file
+    :param platform:    the platform to register components with, or None to create a new one
+    :return:            the platform the scenario was built on
+    """
+    with open(path) as scenario_file:
+        return build_scenario(json.load(scenario_file), platform)
+
+
+def export_scenario(platform: Platform) -> dict:
+    """
+    Converts the topology of a platform into a scenario. Firewall membership is taken from the platform's containment
+    map, so components placed inside firewalls in the UI are exported as declared members.
+    :param platform:    the platform to export
+    :return:            the scenario as a dictionary
+    """
+    members = {firewall: [] for firewall in platform.firewalls}
+    for component in platform.clients + platform.servers:
+        firewall = platform.determine_if_component_is_within_firewall(component)
+        if firewall:
+            members[firewall].append(component.ip)
+
+    def firewall_scenario(firewall):
+        config = dict(name=firewall.name, members=members[firewall], **firewall.configuration())
+        parent = platform.topology.parents.get(firewall)
+        if parent:
+            config["parent"] = parent.name
+        links = [other.name for other in platform.topology.links.get(firewall, [])
+                 if platform.firewalls.index(other) > platform.firewalls.index(firewall)]
+        if links:
+            config["links"] = links
+        if firewall.connections is not None:
+            config["connection_tracking"] = True
+        if firewall.verdict_cache is not None:
+            config["verdict_cache"] = True
+        return config
+
+    def service_scenario(service):
+        return {"port": service.port, "workers": service.workers, "queue_limit": service.queue_limit,
+                "service_time": service.service_time, "distribution": service.distribution}
+
+    return {
+        "firewalls": [firewall_scenario(firewall) for firewall in platform.firewalls],
+        "clients": [{"name": client.name, "ip": client.ip} for client in platform.clients],
+        "servers": [{"name": server.name, "ip": server.ip,
+                     "services": {name: service_scenario(service) for name, service in server.services.items()}}
+                    for server in platform.servers]
+    }
@@ -2,8 +2,11 @@ import tkinter as tk
 import random as r
 
 from tkinter import Frame
-from typing import List
+from typing import List, Tuple
 
+from fyre.common.fyre_spatial import bounds_contain
+from fyre.fyre_canvas import CanvasRenderer
+from fyre.fyre_overlay import TrafficOverlay
 from fyre.parts.client import FyreClient
 from fyre.parts.server import FyreServer
 from fyre.parts.firewall import Fyrewall
@@ -26,10 +29,15 @@ def handle_drag(component, event):
 
 
 class FyreUIComponent:
-    ui_components: List = []
-
+    """
+    A component displayed as its own frame widget. Kept for embedding components in other tkinter layouts; the main
+    interface draws components on the canvas with fyre.fyre_canvas.CanvasRenderer instead, which scales to far more
+    nodes.
+    """
     def __init__(self, frame: Frame):
         self.frame = frame
+        self.ui_components: List = []
+        self.lines = {}
         frame.grid_propagate(False)
 
     def add_ui_component(self, ui_component, drags_component: bool = True, min_width: int = 0, min_height: int = 0):
@@ -40,16 +48,39 @@ class FyreUIComponent:
         :param ui_component:        The tkinter UI component to add
         :param drags_component:     True if the component should be draggable, False otherwise
         """
-        if len(self.ui_components) == 0:
-            ui_component.grid(row=0, column=0)
-        else:
-            ui_component.grid(row=len(self.ui_components), column=0)
+        ui_component.grid(row=len(self.ui_components), column=0)
         if drags_component:
             ui_component.bind('<B1-Motion>', lambda event: handle_drag(self.frame, event))
         self.ui_components.append(ui_component)
         self.frame.after_idle(lambda: self.resize_frame_by_ui_components(min_width, min_height))
         return ui_component
 
+    def add_label(self, text: str, drags_component: bool = True, min_width: int = 0, min_height: int = 0):
+        """
+        Adds a line of text to the frame of this component.
+        :param text:                The text to display
+        :param drags_component:     True if the label should drag the component, False otherwise
+        :param min_width:           The minimum width of the frame
+        :param min_height:          The minimum height of the frame
+        :return:                    The label widget
+        """
+        return self.add_ui_component(tk.Label(text=text, master=self.frame), drags_component, min_width, min_height)
+
+    def add_button(self, text: str, command, min_width: int = 0, min_height: int = 0):
+        """
+        Adds a button to the frame of this component.
+        :param text:        The text of the button
+        :param command:     The function to call when the button is clicked
+        :param min_width:   The minimum width of the frame
+        :param min_height:  The minimum height of the frame
+        :return:            The button widget
+        """
+        button = tk.Button(text=text, master=self.frame, command=command)
+        return self.add_ui_component(button, drags_component=False, min_width=min_width, min_height=min_height)
+
+    def set_text(self, ui_component, text: str):
+        ui_component.config(text=text)
+
     def resize_frame_by_ui_components(self, min_width: int, min_height: int):
         """
         Resizes the frame to fit all of the UI components that have been added to it.
@@ -58,32 +89,50 @@ class FyreUIComponent:
         height = sum([component.winfo_height() for component in self.ui_components])
         self.frame.config(width=max(width, min_width), height=max(height, min_height))
 
+    def on_geometry_change(self, callback):
+        """
+        Registers a callback that is invoked whenever the frame of this component is moved or resized.
+        :param callback:    A function taking no arguments
+        """
+        self.frame.bind('<Configure>', lambda event: callback(), add='+')
+
+    def bounds(self) -> Tuple[int, int, int, int]:
+        """
+        Gets the current position and size of the frame of this component.
+        :return:    A tuple of (x, y, width, height)
+        """
+        return self.frame.winfo_x(), self.frame.winfo_y(), self.frame.winfo_width(), self.frame.winfo_height()
+
+    def screen_bounds(self) -> Tuple[int, int, int, int]:
+        """
+        Gets the position of the frame of this component on the screen, for placing dialogues over it.
+        :return:    A tuple of (x, y, width, height) in screen coordinates
+        """
+        return self.frame.winfo_rootx(), self.frame.winfo_rooty(), self.frame.winfo_width(), self.frame.winfo_height()
+
     def has_component(self, other) -> bool:
         """
         Checks if the frame of this component is inside the frame of another component.
         :param other:   The other component to check against
         :return:        True if this component is inside the other component, False otherwise
         """
-        current_x_pos, current_y_pos = self.frame.winfo_x(), self.frame.winfo_y()
-        other_x_pos, other_y_pos = other.frame.winfo_x(), other.frame.winfo_y()
-
-        current_width, current_height = self.frame.winfo_width(), self.frame.winfo_height()
-        other_width, other_height = other.frame.winfo_width(), other.frame.winfo_height()
-
-        # Now, we want to return if the other component is inside the current component
-        return current_x_pos <= other_x_pos and current_y_pos <= other_y_pos and \
-               current_x_pos + current_width >= other_x_pos + other_width and current_y_pos + current_height >= other_y_pos + other_height
+        return bounds_contain(self.bounds(), other.bounds())
 
     def draw_line_from_center(self, canvas, other):
         """
-        Draws a line from the center of this component to the center of another component.
+        Draws a line from the center of this component to the center of another component. The line is created once
+        per pair of components and moved on later calls.
         :param canvas:  The canvas to draw the line on
         :param other:   The other component to draw the line to
         """
 
         x0, y0 = self.frame.winfo_x() + self.frame.winfo_width() // 2, self.frame.winfo_y() + self.frame.winfo_height() // 2
         x1, y1 = other.frame.winfo_x() + other.frame.winfo_width() // 2, other.frame.winfo_y() + other.frame.winfo_height() // 2
-        canvas.create_line(x0, y0, x1, y1, fill='black', width=2)
+        line = self.lines.get(other)
+        if line is None:
+            self.lines[other] = canvas.create_line(x0, y0, x1, y1, fill='black', width=2)
+        else:
+            canvas.coords(line, x0, y0, x1, y1)
 
 
 def make_draggable_fyre_component(frame, x: int, y: int) -> FyreUIComponent:
@@ -101,11 +150,11 @@ def make_draggable_fyre_component(frame, x: int, y: int) -> FyreUIComponent:
     return FyreUIComponent(frame)
 
 
-def create_interface_components(win: tk.Tk, canvas: tk.Canvas, platform):
+def create_interface_components(win: tk.Tk, renderer: CanvasRenderer, platform):
     """
     Creates the static components of the interface that do not change.
     :param win:         the tkinter window object
-    :param canvas:      the canvas object to draw lines on
+    :param renderer:    the renderer to draw components with
     :param platform:    the platform object to register components with
     :return:
     """
@@ -119,25 +168,20 @@ def create_interface_components(win: tk.Tk, canvas: tk.Canvas, platform):
         return x, y
 
     def create_client_component():
-        x, y = get_random_coordinates(120, 60)
-        client_frame = tk.LabelFrame(win, text="Client", width=120, height=60, borderwidth=2, relief='solid', border=2)
-        client_fyre_component = make_draggable_fyre_component(client_frame, x, y)
-        client_frame.lift()
-        return FyreClient(platform, canvas, client_fyre_component, f'Client {r.randint(0, 100000)}')
+        x, y = get_random_coordinates(175, 60)
+        node = renderer.add_node("Client", x, y, 175, 60)
+        return FyreClient(platform, renderer.canvas, node, f'Client {r.randint(0, 100000)}')
 
     def create_server_component():
-        x, y = get_random_coordinates(120, 60)
-        server_frame = tk.LabelFrame(win, text="Server", width=120, height=60, borderwidth=2, relief='solid', border=2)
-        server_fyre_component = make_draggable_fyre_component(server_frame, x, y)
-        server_frame.lift()
-        return FyreServer(platform, canvas, server_fyre_component, 'Server')
+        x, y = get_random_coordinates(200, 60)
+        node = renderer.add_node("Server", x, y, 200, 60)
+        return FyreServer(platform, renderer.canvas, node, 'Server')
 
     def create_firewall_component():
         x, y = get_random_coordinates(250, 250)
-        firewall_frame = tk.LabelFrame(win, text="Firewall", width=250, height=250, borderwidth=2, relief='solid', border=2)
-        firewall_fyre_component = make_draggable_fyre_component(firewall_frame, x, y)
-        firewall_frame.tkraise(canvas)
-        return Fyrewall(platform, canvas, firewall_fyre_component, 'Firewall')
+        node = renderer.add_node("Firewall", x, y, 250, 250, outline='red', fill='')
+        node.lower()
+        return Fyrewall(platform, renderer.canvas, node, 'Firewall')
 
     # Create a top-level menu for adding components
     menu = tk.Menu(win)
@@ -155,9 +199,54 @@ def create_interface_components(win: tk.Tk, canvas: tk.Canvas, platform):
     create_server_component()
 
 
+def attach_interface_components(renderer: CanvasRenderer, platform):
+    """
+    Creates views for the components of a platform that do not have one yet, such as those loaded from a scenario.
+    Firewalls are laid out in a grid, components declared behind a firewall are placed inside its node, and the rest
+    are placed randomly. The layout may extend past the window; drag with the right mouse button to pan.
+    :param renderer:    the renderer to draw components with
+    :param platform:    the platform whose components should be displayed
+    """
+    columns = WIN_WIDTH // 260
+    firewall_positions, member_counts = {}, {}
+    for index, firewall in enumerate(platform.firewalls):
+        if not firewall.has_view:
+            x, y = index % columns * 260, index // columns * 260
+            firewall_positions[firewall] = x, y
+            node = renderer.add_node("Firewall", x, y, 250, 250, outline='red', fill='')
+            node.lower()
+            firewall.attach_view(renderer.canvas, node)
+
+    for text, components in (("Client", platform.clients), ("Server", platform.servers)):
+        for component in components:
+            if component.has_view:
+                continue
+            firewall = platform.memberships.get(component)
+            if firewall in firewall_positions:
+                fx, fy = firewall_positions[firewall]
+                count = member_counts[firewall] = member_counts.get(firewall, 0) + 1
+                x, y = fx + 10, fy + 40 + 60 * (count - 1)
+            else:
+                x, y = r.randint(0, WIN_WIDTH - 120), r.randint(0, WIN_HEIGHT - 60)
+            component.attach_view(renderer.canvas, renderer.add_node(text, x, y, 120, 60))
+
+
+def pump_scheduler(win: tk.Tk, scheduler, interval_ms: int = 20):
+    """
+    Runs the scheduler's events in real time from the tkinter event loop, a slice of virtual time per interval, so
+    packet delivery never blocks the interface.
+    :param win:             the tkinter window object
+    :param scheduler:       the scheduler to run
+    :param interval_ms:     the length of each slice, in milliseconds
+    """
+    scheduler.run(until=scheduler.now + interval_ms / 1000)
+    win.after(interval_ms, lambda: pump_scheduler(win, scheduler, interval_ms))
+
+
 def create_interface(platform) -> tk.Tk:
     """
-    Creates a tkinter interface for the user to interact with the program.
+    Creates a tkinter interface for the user to interact with the program. If the platform already has components,
+    such as those loaded from a scenario, views are attached to them instead of creating the default components.
     :param platform: the platform object to register components with
     :return: the tkinter window object
     """
@@ -181,7 +270,18 @@ def create_interface(platform) -> tk.Tk:
 
     canvas = tk.Canvas(win, width=WIN_WIDTH, height=WIN_HEIGHT)
     canvas.pack()
+    renderer = CanvasRenderer(canvas)
+    win.renderer = renderer
+
+    if platform.clients or platform.servers or platform.firewalls:
+        attach_interface_components(renderer, platform)
+    else:
+        create_interface_components(win, renderer, platform)
+
+    if platform.scheduler:
+        pump_scheduler(win, platform.scheduler)
 
-    create_interface_components(win, canvas, platform)
+    win.overlay = TrafficOverlay(renderer, platform)
+    win.overlay.start()
 
     return win
\ No newline at end of file
@@ -1,5 +1,3 @@
-import tkinter as tk
-
 from fyre.common.fyre_common import FyreComponent, generate_ip_address
 
 
@@ -7,32 +5,60 @@ class FyreClient(FyreComponent):
     dialogue = None
 
     def __init__(self, platform, canvas, fyre_ui_component, name: str, ip: str = None):
-        super().__init__(platform, fyre_ui_component)
-        self.canvas = canvas
+        super().__init__(platform)
         self.ip = ip if ip else generate_ip_address()
         self.name = name
         self.dialogue = None
+        if fyre_ui_component is not None:
+            self.attach_view(canvas, fyre_ui_component)
+        self.platform.register_client(self)
 
-        label = tk.Label(text=f'{self.ip}', master=self.parent_ui_component.frame)
-        self.parent_ui_component.add_ui_component(label, drags_component=True, min_width=175)
+    def build_view(self):
+        """
+        Adds the IP label and manage button to the client's UI component.
+        """
+        self.parent_ui_component.add_label(f'{self.ip}', drags_component=True, min_width=175)
+        self.parent_ui_component.add_button("Manage", self.handle_dialogue_on_click, min_width=175)
 
-        button = tk.Button(text="Manage", master=self.parent_ui_component.frame, command=self.handle_dialogue_on_click)
-        self.parent_ui_component.add_ui_component(button, drags_component=False, min_width=175)
+    def generate_flows(self, rate: float, duration: float = None, **options):
+        """
+        Lazily generates the flows this client sends under load. See fyre.common.fyre_load.generate_flows for the
+        destination, service, port, payload and timing options.
+        :param rate:        the average number of flows per second
+        :param duration:    the length of the load, in seconds, or None to generate flows forever
+        :return:            an iterator over (time, client, destination IP, destination port, source port, payload size)
+        """
+        from fyre.common.fyre_load import generate_flows
+        return generate_flows(self, rate, duration, **options)
 
-        self.platform.register_client(self)
+    def start_load(self, rate: float, duration: float, max_pending: int = 10000, **options):
+        """
+        Starts sending load through the platform's scheduler. Use fyre.common.fyre_load.drive_clients to drive many
+        clients together.
+        :param rate:        the average number of flows per second
+        :param duration:    the length of the load, in seconds
+        :param max_pending: the number of pending scheduler events above which sending is held back
+        :return:            the driver, whose stats show what was sent, dropped and held back
+        """
+        from fyre.common.fyre_load import LoadDriver
+        driver = LoadDriver(self.platform, self.generate_flows(rate, duration, **options), max_pending)
+        driver.start()
+        return driver
 
     def handle_dialogue_on_click(self):
         """
         Handles the dialogue when the client is clicked.
         """
+        import tkinter as tk
+
         if self.dialogue:
             self.dialogue.destroy()
         self.dialogue = tk.Toplevel()
         self.dialogue.title(f"{self.name} - {self.ip}: Command Window")
         self.dialogue.resizable(False, False)
         # Position the dialogue window on top of the client
-        window_x, window_y = self.parent_ui_component.frame.winfo_rootx(), self.parent_ui_component.frame.winfo_rooty()
-        x, y = window_x + self.parent_ui_component.frame.winfo_width() // 2, window_y + self.parent_ui_component.frame.winfo_height() // 2
+        window_x, window_y, width, height = self.parent_ui_component.screen_bounds()
+        x, y = window_x + width // 2, window_y + height // 2
         self.dialogue.geometry(f'{500}x{250}+{x}+{y}')
         self.dialogue.deiconify()
 
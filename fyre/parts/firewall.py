@@ -1,100 +1,316 @@
-import json
-import tkinter as tk
+import time
 
-from scapy.layers.inet import TCP, IP
-from scapy.packet import Packet
+from typing import List
 
+from fyre.common.fyre_cache import VerdictCache
 from fyre.common.fyre_common import FyreComponent
+from fyre.common.fyre_conntrack import ConnectionTracker
+from fyre.common.fyre_events import DEBUG, INFO
+from fyre.common.fyre_packet import as_fyre_packet
+from fyre.common.fyre_rules import ALLOW, DENY, FyreRule, FyreRuleSet
 
 
 class Fyrewall(FyreComponent):
-    def __init__(self, platform, canvas, fyre_ui_component, name: str):
-        super().__init__(platform, fyre_ui_component)
-        self.canvas = canvas
+    def __init__(self, platform, canvas, fyre_ui_component, name: str, connection_tracking: bool = False,
+                 verdict_cache: bool = False):
+        """
+        :param platform:            the platform the firewall belongs to
+        :param canvas:              the canvas its view is drawn on, or None
+        :param fyre_ui_component:   the UI component to display it in, or None for a headless firewall
+        :param name:                the name of the firewall
+        :param connection_tracking: True to let packets of flows the firewall has allowed skip rule evaluation, see
+                                    set_connection_tracking
+        :param verdict_cache:       True to remember verdicts until the rules change, see set_verdict_cache
+        """
+        super().__init__(platform)
         self.name = name
         self.allowed_ports = []
         self.blocked_ips = []
-        self.add_configuration_buttons()
+        self.rules: List[FyreRule] = []
+        self._ruleset = None
+        self.rule_generation = 0
+        self.connections = ConnectionTracker() if connection_tracking else None
+        self.verdict_cache = VerdictCache() if verdict_cache else None
+        if fyre_ui_component is not None:
+            self.attach_view(canvas, fyre_ui_component)
         self.platform.register_firewall(self)
 
+    def build_view(self):
+        """
+        Adds the configuration buttons to the firewall's UI component.
+        """
+        self.add_configuration_buttons()
+
     def add_allowed_port(self, port: int):
+        if port in self.allowed_ports:
+            return
         self.allowed_ports.append(port)
+        self.invalidate_rules()
 
     def add_blocked_ip(self, ip: str):
         self.blocked_ips.append(ip)
+        self.invalidate_rules()
 
-    def is_component_within_firewall(self, fyre_component: FyreComponent):
-        return self.parent_ui_component.has_component(fyre_component.parent_ui_component)
+    def add_rule(self, rule: FyreRule):
+        """
+        Appends a rule to the ordered rule list. Rules are evaluated first-match, before the allowed ports and blocked
+        IPs.
+        :param rule:    the rule to add
+        """
+        self.rules.append(rule)
+        self.invalidate_rules()
 
-    def process_packet(self, packet: Packet):
-        print(f"Packet received by {self.name}! Firewall will now process it.")
-        port = packet[TCP].dport
-        print(f"Packet is destined for port {port}. Determining if port is allowed...")
+    def invalidate_rules(self):
+        """
+        Discards the compiled ruleset so it is rebuilt on the next packet, bumps the rule generation so cached verdicts
+        are discarded, and forgets tracked connections so they are checked against the new rules. Must be called after
+        the rules, allowed ports or blocked IPs are changed.
+        """
+        self._ruleset = None
+        self.rule_generation += 1
+        if self.connections is not None:
+            self.connections.clear()
 
-        if port not in self.allowed_ports:
-            print(f"Port {port} is not allowed. Dropping packet.")
-            return
+    def set_connection_tracking(self, enabled: bool, **options):
+        """
+        Turns stateful connection tracking on or off; it is off by default. While it is on, packets of flows the
+        firewall has already allowed, in either direction, skip rule evaluation and are not counted against any rule.
+        Tracked flows are forgotten whenever the rules change, so a new configuration applies to every packet after it.
+        :param enabled: True to track connections, False to evaluate every packet against the rules
+        :param options: the options passed to ConnectionTracker, such as max_connections and idle_timeout
+        """
+        self.connections = ConnectionTracker(**options) if enabled else None
 
-        if packet[IP].src in self.blocked_ips:
-            print(f"Source IP {packet[IP].src} is blocked. Dropping packet.")
-            return
+    def set_verdict_cache(self, enabled: bool, max_entries: int = 4096):
+        """
+        Turns the verdict cache on or off; it is off by default. While it is on, verdicts are remembered per (src, dst, dport, protocol), and
+        per source port if any rule matches on it, until the rules change.
+        :param enabled:     True to cache verdicts, False to evaluate the rules for every packet
+        :param max_entries: the maximum number of cached verdicts
+        """
+        self.verdict_cache = VerdictCache(max_entries) if enabled else None
+
+    def now(self) -> float:
+        """
+        Gets the current time, from the platform's scheduler if it has one, or the wall clock otherwise.
+        :return: the time, in seconds
+        """
+        scheduler = self.platform.scheduler
+        return scheduler.now if scheduler else time.monotonic()
 
-        # Read dictionary from Raw layer of packet
-        print(f"Packet content: {packet.load.decode()}")
+    @property
+    def ruleset(self) -> FyreRuleSet:
+        if self._ruleset is None:
+            self._ruleset = self.compile_rules()
+        return self._ruleset
 
-    def add_configuration_buttons(self):
+    def compile_rules(self) -> FyreRuleSet:
         """
-        Adds buttons to the top of the UI frame for managing the firewall configuration.
-        :return:
+        Compiles the explicit rules, followed by the allowed ports and blocked IPs, into an indexed ruleset. Blocked IPs
+        are only checked for allowed ports, and anything that matches no rule is dropped.
+        :return:    the compiled ruleset
         """
-        button = tk.Button(text="Manage", master=self.parent_ui_component.frame, command=lambda: self.open_configuration_window())
-        self.parent_ui_component.add_ui_component(button, drags_component=False, min_width=250, min_height=250)
+        return self._compile(self.rules, self.allowed_ports, self.blocked_ips)
 
-    def open_configuration_window(self):
+    @staticmethod
+    def _compile(rules: List[FyreRule], allowed_ports: list, blocked_ips: list) -> FyreRuleSet:
+        rules = list(rules)
+        if allowed_ports:
+            if blocked_ips:
+                rules.append(FyreRule(DENY, src=blocked_ips, dport=allowed_ports, name='blocked_ips'))
+            rules.append(FyreRule(ALLOW, dport=allowed_ports, name='allowed_ports'))
+        return FyreRuleSet(rules, default_action=DENY)
+
+    def configuration(self) -> dict:
         """
-        Opens a configuration window for the firewall.
-        :return:
+        Gets the configuration of the firewall in its JSON representation.
+        :return:    the configuration as a dictionary
         """
-        def save_configuration():
-            """
-            Saves the configuration of the firewall.
-            :return:
-            """
-            data = text.get("1.0", tk.END)
-            try:
-                config = json.loads(data)
-                self.allowed_ports = config["allowed_ports"]
-                self.blocked_ips = config["blocked_ips"]
-                print(f"Configuration saved for {self.name}.")
-                config_window.destroy()
-            except json.JSONDecodeError:
-                print("Invalid JSON configuration.")
-
-        # Create a new top-level window for the firewall configuration
-        config_window = tk.Toplevel()
-        config_window.title(f"{self.name} Configuration")
-        config_window.resizable(False, False)
-        # Position the configuration window on top of the firewall
-        window_x, window_y = self.parent_ui_component.frame.winfo_rootx(), self.parent_ui_component.frame.winfo_rooty()
-        x, y = window_x + self.parent_ui_component.frame.winfo_width() // 2, window_y + self.parent_ui_component.frame.winfo_height() // 2
-        config_window.geometry(f'{500}x{250}+{x}+{y}')
-        config_window.deiconify()
-
-        # Show an editable text field that shows the configuration in a json format
-        text = tk.Text(config_window)
-        text.pack()
-        config_as_json = {
+        return {
             "allowed_ports": self.allowed_ports,
-            "blocked_ips": self.blocked_ips
+            "blocked_ips": self.blocked_ips,
+            "rules": [rule.to_dict() for rule in self.rules]
         }
 
-        text.insert(tk.END, json.dumps(config_as_json, indent=4))
+    def load_configuration(self, config: dict):
+        """
+        Replaces the configuration of the firewall. The configuration is validated before it is applied, so an invalid
+        port or address leaves the current configuration untouched.
+        :param config:  the configuration as a dictionary, with "allowed_ports", "blocked_ips" and optionally "rules"
+        """
+        self.apply_configuration(self.prepare_configuration(config))
 
-        # Add a menu for saving the configuration
-        save_menu = tk.Menu(config_window)
-        config_window.config(menu=save_menu)
-        save_menu.add_command(label="Save", command=save_configuration)
+    def prepare_configuration(self, config: dict) -> tuple:
+        """
+        Validates and compiles a configuration without applying it. This is the expensive part of loading a large
+        configuration, and it does not touch the firewall, so it can run on a worker thread.
+        :param config:  the configuration as a dictionary, see load_configuration
+        :return:        the prepared configuration, to pass to apply_configuration
+        """
+        rules = [FyreRule.from_dict(rule) for rule in config.get("rules", [])]
+        allowed_ports = list(config["allowed_ports"])
+        blocked_ips = list(config["blocked_ips"])
+        if not allowed_ports:
+            # Blocked IPs are only compiled alongside allowed ports, so validate them here instead
+            FyreRule(DENY, src=blocked_ips)
+        return rules, allowed_ports, blocked_ips, self._compile(rules, allowed_ports, blocked_ips)
 
-        config_window.mainloop()
+    def apply_configuration(self, prepared: tuple):
+        """
+        Replaces the configuration of the firewall with a prepared one. Nothing is parsed or compiled here, so the
+        switch is immediate.
+        :param prepared:    the result of prepare_configuration
+        """
+        self.rules, self.allowed_ports, self.blocked_ips, ruleset = prepared
+        self.invalidate_rules()
+        self._ruleset = ruleset
+
+    def optimize_rules(self, verify_packets: int = 10000):
+        """
+        Replaces the configuration with an equivalent, smaller one, see fyre.fyre_optimizer.optimize_configuration. The
+        optimized configuration is checked against the current one on sample traffic first, and is not applied if any
+        verdict differs.
+        :param verify_packets:  the number of sample packets to check
+        :return:                the report of what changed
+        """
+        from fyre.fyre_optimizer import optimize_configuration, verify
+
+        original = self.configuration()
+        optimized, report = optimize_configuration(original)
+        mismatches = verify(original, optimized, count=verify_packets)
+        if mismatches:
+            raise ValueError(f"The optimized rules give different verdicts, for example {mismatches[0]}.")
+        self.load_configuration(optimized)
+        return report
+
+    def is_component_within_firewall(self, fyre_component: FyreComponent):
+        if fyre_component in self.platform.memberships:
+            return self.platform.memberships[fyre_component] is self
+        if not self.has_view or not fyre_component.has_view:
+            return False
+        return self.parent_ui_component.has_component(fyre_component.parent_ui_component)
+
+    def process_packet(self, packet) -> bool:
+        """
+        Decides whether a packet may pass the firewall.
+        :param packet:  a fyre packet or a scapy packet
+        :return:        True if the packet is allowed, False if it is dropped
+        """
+        packet = as_fyre_packet(packet)
+        if not self.platform.metrics_enabled:
+            return self._filter_packet(packet, None)
+        start = time.perf_counter_ns()
+        metrics = self.metrics
+        allowed = self._filter_packet(packet, metrics)
+        metrics.observe('process_packet', time.perf_counter_ns() - start)
+        metrics.counters['packets'] += 1
+        metrics.counters['bytes'] += len(packet)
+        metrics.counters['allowed' if allowed else 'dropped'] += 1
+        return allowed
+
+    def _filter_packet(self, packet, metrics) -> bool:
+        events = self.platform.events
+        debug = events.enabled_for(DEBUG)
+        if debug:
+            events.emit(DEBUG, 'received', "Packet received by {firewall}! Firewall will now process it.",
+                        firewall=self.name)
+        connections = self.connections
+        if connections is not None:
+            now = self.now()
+            connection = connections.lookup(packet, now)
+            if connection is not None:
+                events.emit(INFO, 'allow', "Packet belongs to a tracked connection ({state}). Packet content: {content}",
+                            firewall=self.name, state=connection.state, src=packet.src, dst=packet.dst,
+                            dport=packet.dport, content=packet.load)
+                if metrics is not None:
+                    metrics.counters['allowed_tracked'] += 1
+                return True
+
+        port = packet.dport
+        if debug:
+            events.emit(DEBUG, 'evaluate', "Packet is destined for port {dport}. Determining if port is allowed...",
+                        firewall=self.name, dport=port)
+
+        ruleset = self.ruleset
+        cache = self.verdict_cache
+        if cache is not None:
+            key = (packet.src, packet.dst, packet.sport if ruleset.uses_sport else None, port, packet.proto)
+            verdict = cache.get(key, self.rule_generation)
+            if verdict is None:
+                verdict = ruleset.match(packet.src, packet.dst, packet.sport, port, packet.proto)
+                cache.put(key, verdict)
+            action, index = verdict
+        else:
+            action, index = ruleset.match(packet.src, packet.dst, packet.sport, port, packet.proto)
+        rule = ruleset.rules[index] if index >= 0 else None
+        if metrics is not None:
+            metrics.rule_hits[rule] += 1
+        if action == DENY:
+            if rule is None:
+                reason, template = 'port', "Port {dport} is not allowed. Dropping packet."
+            elif rule.name == 'blocked_ips':
+                reason, template = 'ip', "Source IP {src} is blocked. Dropping packet."
+            else:
+                reason, template = 'rule', "Packet matched rule {rule}. Dropping packet."
+            if metrics is not None:
+                metrics.counters[f'dropped_{reason}'] += 1
+            events.emit(INFO, 'drop', template, firewall=self.name, src=packet.src, dst=packet.dst, dport=port,
+                        rule=rule)
+            return False
+
+        if connections is not None:
+            connections.open(packet, now)
 
+        events.emit(INFO, 'allow', "Packet content: {content}", firewall=self.name, src=packet.src, dst=packet.dst,
+                    dport=port, content=packet.load)
+        return True
+
+    def evaluate_batch(self, src, dst, sport, dport, protocol=None):
+        """
+        Evaluates many flows against the firewall's ruleset at once, for what-if analysis. The verdicts match those of
+        process_packet for the same flows. Requires NumPy.
+        :param src:         the source IPv4 addresses, as an array of integers or a sequence of address strings
+        :param dst:         the destination IPv4 addresses, as an array of integers or a sequence of address strings
+        :param sport:       the source ports
+        :param dport:       the destination ports
+        :param protocol:    the IP protocol numbers, or None if every flow is TCP
+        :return:            A tuple of (allowed, rule index) arrays, where the index is -1 if no rule matched
+        """
+        return self.ruleset.evaluate_batch(src, dst, sport, dport, protocol)
+
+    def format_counters(self) -> str:
+        """
+        Formats the firewall's counters and most frequently hit rules for display.
+        :return:    the counters as text
+        """
+        if not self.platform.metrics_enabled:
+            return "Metrics are disabled."
+        snapshot = self.metrics.snapshot()
+        counters = snapshot["counters"]
+        latency = snapshot["latency"].get('process_packet', {})
+        text = f"Packets: {counters.get('packets', 0)} | Allowed: {counters.get('allowed', 0)} | " \
+               f"Dropped (port): {counters.get('dropped_port', 0)} | Dropped (IP): {counters.get('dropped_ip', 0)} | " \
+               f"Dropped (rule): {counters.get('dropped_rule', 0)}\n" \
+               f"Bytes: {counters.get('bytes', 0)} | p50: {latency.get('p50_ns', 0) / 1000:.1f}us | " \
+               f"p99: {latency.get('p99_ns', 0) / 1000:.1f}us"
+        top_rules = sorted(snapshot["rules"].items(), key=lambda item: item[1], reverse=True)[:3]
+        if top_rules:
+            text += "\nTop rules: " + ", ".join(f"{rule} ({hits})" for rule, hits in top_rules)
+        return text
+
+    def add_configuration_buttons(self):
+        """
+        Adds buttons to the top of the UI frame for managing the firewall configuration.
+        :return:
+        """
+        self.parent_ui_component.add_button("Manage", lambda: self.open_configuration_window(), min_width=250,
+                                            min_height=250)
+
+    def open_configuration_window(self):
+        """
+        Opens a configuration window for the firewall, positioned on top of it.
+        """
+        from fyre.fyre_rule_editor import open_rule_editor
 
+        window_x, window_y, width, height = self.parent_ui_component.screen_bounds()
+        open_rule_editor(self, window_x + width // 2, window_y + height // 2)
@@ -1,12 +1,54 @@
-from typing import List
+import ipaddress
+
+from collections import Counter
+from typing import Dict, Tuple
+
+from fyre.common.fyre_events import EventLog
+from fyre.common.fyre_topology import FyreTopology
+
+
+def parse_address(ip: str):
+    """
+    Parses an IP address into the key used by the platform's address registry.
+    :param ip: the IP address
+    :return: the ipaddress object for the address
+    """
+    try:
+        return ipaddress.ip_address(ip)
+    except ValueError:
+        raise ValueError(f"Invalid IP address {ip}.")
 
 
 class Platform:
-    def __init__(self):
-        self.addresses: List[str] = []
+    def __init__(self, scheduler=None, events: EventLog = None):
+        """
+        :param scheduler: the FyreScheduler used to deliver packets, or None to deliver them synchronously
+        :param events: the event log packet verdicts are recorded in, or None to create a default one
+
+        Set traffic to a fyre.common.fyre_traffic.TrafficMonitor to aggregate per-link traffic for display.
+        """
+        self.addresses: Dict[object, Tuple[str, object]] = {}
         self.clients = []
         self.servers = []
         self.firewalls = []
+        self.memberships = {}
+        self.scheduler = scheduler
+        self.events = events if events else EventLog()
+        self.metrics_enabled = True
+        self.verdict_totals = Counter()
+        self.traffic = None
+        self.topology = FyreTopology(self)
+        self._lookups: Dict[str, Tuple[str, object]] = {}
+
+    def _register_address(self, typehint: str, component) -> bool:
+        address = parse_address(component.ip)
+        if address in self.addresses:
+            return False
+        self.addresses[address] = (typehint, component)
+        self._lookups.clear()
+        self.topology.invalidate_addresses()
+        self.invalidate_containment(component)
+        return True
 
     def register_client(self, client):
         """
@@ -15,8 +57,7 @@ class Platform:
         """
         from fyre.parts.client import FyreClient
         if isinstance(client, FyreClient):
-            if client.ip not in self.addresses:
-                self.addresses.append(client.ip)
+            if self._register_address('client', client):
                 self.clients.append(client)
                 return True
             raise ValueError(f"CIP address {client.ip} already exists.")
@@ -28,8 +69,7 @@ class Platform:
         """
         from fyre.parts.server import FyreServer
         if isinstance(server, FyreServer):
-            if server.ip not in self.addresses:
-                self.addresses.append(server.ip)
+            if self._register_address('server', server):
                 self.servers.append(server)
                 return True
             raise ValueError(f"IP address {server.ip} already exists.")
@@ -42,17 +82,131 @@ class Platform:
         from fyre.parts.firewall import Fyrewall
         if isinstance(firewall, Fyrewall):
             self.firewalls.append(firewall)
+            self.invalidate_containment(firewall)
             return True
 
+    def remove_component(self, component):
+        """
+        Removes a client, server or firewall from the platform, along with its memberships and links. Components behind
+        a removed firewall move to the zone around it, whether they were declared members of it or placed inside it.
+        :param component: the component to remove
+        """
+        parent = self.topology.parents.get(component) if component in self.firewalls else None
+        for components in (self.clients, self.servers, self.firewalls):
+            if component in components:
+                components.remove(component)
+        if getattr(component, 'ip', None) is not None:
+            address = parse_address(component.ip)
+            if self.addresses.get(address, (None, None))[1] is component:
+                del self.addresses[address]
+        self.memberships.pop(component, None)
+        for member, firewall in list(self.memberships.items()):
+            if firewall is component:
+                self.memberships[member] = parent if parent is not None else False
+        if component in self.topology.links:
+            self.topology.unlink(component)
+        self._lookups.clear()
+        self.topology.invalidate_addresses()
+        self.invalidate_containment(component)
+
+    def add_to_firewall(self, component, firewall):
+        """
+        Declares that a fyre component sits behind a firewall. Declared membership takes precedence over the geometry of
+        the UI frames, and is the only way to place components behind a firewall when running headless. A firewall can
+        be placed behind another firewall, nesting its zone in the other's.
+        :param component: the client, server or firewall to place behind the firewall
+        :param firewall: the firewall, or None to declare that the component is not behind any firewall
+        """
+        if firewall is not None and firewall not in self.firewalls:
+            raise ValueError(f"Firewall {firewall} is not registered.")
+        if firewall is not None and component in self.firewalls and self.topology.would_nest(component, firewall):
+            raise ValueError(f"Placing {component} behind {firewall} would nest it inside itself.")
+        self.memberships[component] = firewall if firewall is not None else False
+        self.invalidate_containment(component)
+
+    def link_firewalls(self, first, second):
+        """
+        Declares a direct link between the zones of two firewalls, so packets between them only pass the firewall of
+        the zone they enter, rather than the firewalls around both zones.
+        :param first: a firewall
+        :param second: another firewall
+        """
+        for firewall in (first, second):
+            if firewall not in self.firewalls:
+                raise ValueError(f"Firewall {firewall} is not registered.")
+        self.topology.link(first, second)
+
+    def invalidate_containment(self, component=None):
+        """
+        Discards the cached zones and paths that depend on a component. Called whenever a component is registered,
+        moved, resized or removed, so they are recomputed on the next packet.
+        :param component: the component that changed, or None to discard everything
+        """
+        self.topology.invalidate(component)
+
+    def build_containment_map(self) -> dict:
+        """
+        Builds the map from each client and server to the innermost firewall containing it.
+        :return: the containment map, with False for components not behind any firewall
+        """
+        return {component: self.topology.zone_of(component) or False for component in self.clients + self.servers}
+
     def determine_if_component_is_within_firewall(self, component):
         """
-        Determines if a fyre component is within a firewall.
+        Determines the innermost firewall a fyre component is behind.
         :param component: the fyre component to check
+        :return: the firewall, or False if the component is not behind any firewall
+        """
+        return self.topology.zone_of(component) or False
+
+    def firewalls_between(self, source_ip: str, destination) -> tuple:
+        """
+        Gets the firewalls a packet passes on its way to a component, in the order they check it. Paths are computed
+        from the topology once per pair of zones and cached.
+        :param source_ip: the source address of the packet
+        :param destination: the receiving client or server
+        :return: the firewalls, outermost first
+        """
+        return self.topology.firewalls_between(source_ip, destination)
+
+    def record_verdicts(self, counts: dict):
+        """
+        Adds verdict counts from an offline or parallel run to the platform's totals.
+        :param counts: a map from (firewall, action) to a packet count, where the firewall is None for components not
+                       behind a firewall
+        """
+        self.verdict_totals.update(counts)
+
+    def metrics(self) -> dict:
+        """
+        Takes a snapshot of the counters and latency histograms of every component, without pausing traffic.
+        :return: a dictionary of metrics per firewall, client and server, plus scheduler and event log totals
+        """
+        def component_metrics(component, **extra):
+            return {"name": component.name, **extra, **component.metrics.snapshot()}
+
+        return {
+            "enabled": self.metrics_enabled,
+            "firewalls": [component_metrics(
+                firewall,
+                connections=firewall.connections.stats() if firewall.connections is not None else None,
+                verdict_cache=firewall.verdict_cache.stats() if firewall.verdict_cache is not None else None)
+                for firewall in self.firewalls],
+            "clients": [component_metrics(client, ip=client.ip) for client in self.clients],
+            "servers": [component_metrics(server, ip=server.ip, services=server.service_stats())
+                        for server in self.servers],
+            "scheduler": self.scheduler.stats() if self.scheduler else None,
+            "events": self.events.stats(),
+            "verdict_totals": {f"{firewall.name if firewall else 'none'}:{action}": count
+                               for (firewall, action), count in dict(self.verdict_totals).items()}
+        }
+
+    def reset_metrics(self):
         """
-        for firewall in self.firewalls:
-            if firewall.is_component_within_firewall(component):
-                return firewall
-        return False
+        Clears the counters and latency histograms of every component.
+        """
+        for component in self.firewalls + self.clients + self.servers:
+            component.metrics.reset()
 
     def get_server_by_ip(self, ip: str):
         """
@@ -60,10 +214,9 @@ class Platform:
         :param ip: the IP address of the server
         :return: the server object
         """
-        from fyre.parts.server import FyreServer
-        for server in self.servers:
-            if isinstance(server, FyreServer) and server.ip == ip:
-                return server
+        typehint, server = self.addresses.get(parse_address(ip), (None, None))
+        if typehint == 'server':
+            return server
         raise ValueError(f"Server with IP address {ip} not found.")
 
     def get_client_by_ip(self, ip: str):
@@ -72,10 +225,9 @@ class Platform:
         :param ip: the IP address of the client
         :return: the client object
         """
-        from fyre.parts.client import FyreClient
-        for client in self.clients:
-            if isinstance(client, FyreClient) and client.ip == ip:
-                return client
+        typehint, client = self.addresses.get(parse_address(ip), (None, None))
+        if typehint == 'client':
+            return client
         raise ValueError(f"Client with IP address {ip} not found.")
 
     def get_fyre_component_by_ip(self, ip: str):
@@ -84,12 +236,10 @@ class Platform:
         :param ip: the IP address of the fyre component
         :return: the fyre component object
         """
-        from fyre.parts.client import FyreClient
-        from fyre.parts.server import FyreServer
-        for client in self.clients:
-            if isinstance(client, FyreClient) and client.ip == ip:
-                return 'client', client
-        for server in self.servers:
-            if isinstance(server, FyreServer) and server.ip == ip:
-                return 'server', server
-        raise ValueError(f"Fyre component with IP address {ip} not found.")
\ No newline at end of file
+        entry = self._lookups.get(ip)
+        if entry is None:
+            entry = self.addresses.get(parse_address(ip))
+            if not entry:
+                raise ValueError(f"Fyre component with IP address {ip} not found.")
+            self._lookups[ip] = entry
+        return entry
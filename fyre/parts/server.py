@@ -1,15 +1,52 @@
-import tkinter as tk
+import random
+
+from collections import deque
 
 from fyre.common.fyre_common import FyreComponent, generate_ip_address
+from fyre.common.fyre_events import INFO
+from fyre.common.fyre_metrics import FyreMetrics
+
+SERVICE_TIME_DISTRIBUTIONS = ('exponential', 'fixed')
 
 
 class FyreService:
-    def __init__(self, server, name: str, port: int):
+    """
+    A service listening on one port of a server. Requests are handled by a pool of workers, each busy for the service
+    time of one request in virtual time; requests that arrive while every worker is busy wait in a bounded queue, and
+    are dropped when the queue is full. Without a scheduler every request is handled immediately.
+    """
+    def __init__(self, server, name: str, port: int, workers: int = 1, queue_limit: int = 100,
+                 service_time: float = 0.001, distribution: str = 'exponential', seed: int = None):
+        """
+        :param server:          the server the service runs on
+        :param name:            the name of the service
+        :param port:            the port the service listens on
+        :param workers:         the number of requests handled at the same time
+        :param queue_limit:     the number of requests that may wait for a worker, or None for no limit
+        :param service_time:    the mean time one request keeps a worker busy, in seconds of virtual time
+        :param distribution:    "exponential" for service times drawn around the mean, or "fixed"
+        :param seed:            the random seed for service times, or None for a random one
+        """
+        if workers < 1:
+            raise ValueError(f"A service needs at least one worker: {workers}")
+        if distribution not in SERVICE_TIME_DISTRIBUTIONS:
+            raise ValueError(f"Unknown service time distribution {distribution}, "
+                             f"expected one of {SERVICE_TIME_DISTRIBUTIONS}.")
         self.server = server
         self.name = name
         self.port = port
         self.status = 'stopped'  # Default status
-        self.allowed_ips = []
+        self.allowed_ips = set()
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.service_time = service_time
+        self.distribution = distribution
+        self.rng = random.Random(seed)
+        self.queue = deque()
+        self.busy = 0
+        self.busy_time = 0.0
+        self.first_arrival = None
+        self.metrics = FyreMetrics()
 
     def start(self):
         self.status = 'running'
@@ -18,34 +55,172 @@ class FyreService:
         self.status = 'stopped'
 
     def add_ip(self, ip: str):
-        self.allowed_ips.append(ip)
+        self.allowed_ips.add(ip)
+
+    def remove_ip(self, ip: str):
+        self.allowed_ips.discard(ip)
+
+    def accepts(self, ip: str) -> bool:
+        """
+        :param ip:  the source IP of a request
+        :return:    True if the service allows the IP; a service without allowed IPs accepts every IP
+        """
+        return not self.allowed_ips or ip in self.allowed_ips
+
+    def _now(self) -> float:
+        scheduler = self.server.platform.scheduler
+        return scheduler.now if scheduler else 0.0
+
+    def _duration(self) -> float:
+        if self.distribution == 'fixed':
+            return self.service_time
+        return self.rng.expovariate(1.0 / self.service_time) if self.service_time > 0 else 0.0
+
+    def handle(self, packet) -> bool:
+        """
+        Accepts a request, starting it on a free worker or queueing it.
+        :param packet:  the request
+        :return:        True if the request was accepted, False if it was rejected or dropped
+        """
+        if self.status != 'running':
+            outcome, accepted = 'rejected_stopped', False
+        elif not self.accepts(packet.src):
+            outcome, accepted = 'rejected_ip', False
+        else:
+            now = self._now()
+            if self.first_arrival is None:
+                self.first_arrival = now
+            if self.busy < self.workers:
+                outcome, accepted = 'started', True
+                self._begin(packet, now)
+            elif self.queue_limit is None or len(self.queue) < self.queue_limit:
+                outcome, accepted = 'queued', True
+                self.queue.append((packet, now))
+            else:
+                outcome, accepted = 'dropped_queue', False
+        if self.server.platform.metrics_enabled:
+            counters = self.metrics.counters
+            counters['received'] += 1
+            counters[outcome] += 1
+            if accepted:
+                counters['accepted'] += 1
+        return accepted
+
+    def _begin(self, packet, arrival: float):
+        scheduler = self.server.platform.scheduler
+        if self.server.platform.metrics_enabled:
+            self.metrics.observe('queue_wait', int((self._now() - arrival) * 1e9))
+        if scheduler is None:
+            self._finish(packet, arrival, 0.0)
+            return
+        duration = self._duration()
+        self.busy += 1
+        scheduler.schedule(duration, self._complete, packet, arrival, duration)
+
+    def _complete(self, packet, arrival: float, duration: float):
+        self.busy -= 1
+        self._finish(packet, arrival, duration)
+        if self.queue and self.busy < self.workers:
+            self._begin(*self.queue.popleft())
+
+    def _finish(self, packet, arrival: float, duration: float):
+        self.busy_time += duration
+        if not self.server.platform.metrics_enabled:
+            return
+        self.metrics.counters['completed'] += 1
+        self.metrics.counters['bytes'] += len(packet)
+        self.metrics.observe('response', int((self._now() - arrival) * 1e9))
+
+    def stats(self) -> dict:
+        """
+        :return: the service's counters, its throughput in completed requests per second of virtual time, the fraction
+                 of worker time spent busy, and queue wait and response latencies in nanoseconds of virtual time
+        """
+        snapshot = self.metrics.snapshot()
+        elapsed = self._now() - self.first_arrival if self.first_arrival is not None else 0.0
+        return {
+            "name": self.name,
+            "port": self.port,
+            "status": self.status,
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "busy": self.busy,
+            "queued": len(self.queue),
+            "counters": snapshot["counters"],
+            "throughput": snapshot["counters"].get('completed', 0) / elapsed if elapsed > 0 else 0.0,
+            "utilization": min(self.busy_time / (elapsed * self.workers), 1.0) if elapsed > 0 else 0.0,
+            "latency": snapshot["latency"]
+        }
 
 
 class FyreServer(FyreComponent):
     def __init__(self, platform, canvas, fyre_ui_component, name: str, ip: str = None):
-        super().__init__(platform, fyre_ui_component)
-        self.canvas = canvas
+        super().__init__(platform)
         self.ip = ip if ip else generate_ip_address()
         self.name = name
         self.status = 'running'  # Default status
         self.services = {}  # Dictionary to hold services and their statuses
+        self.ports = {}  # The service listening on each port
+        if fyre_ui_component is not None:
+            self.attach_view(canvas, fyre_ui_component)
+        self.platform.register_server(self)
 
+    def build_view(self):
+        """
+        Adds the IP and status label to the server's UI component.
+        """
         # Adding a label to display IP address on the server's component UI
-        label = tk.Label(text=f'IP: {self.ip} | Status: {self.status}', master=self.parent_ui_component.frame)
-        self.parent_ui_component.add_ui_component(label, drags_component=True, min_width=200)
+        self.parent_ui_component.add_label(f'IP: {self.ip} | Status: {self.status}', drags_component=True, min_width=200)
 
-        self.platform.register_server(self)
-
-    def register_service(self, service_name: str, port: int):
+    def register_service(self, service_name: str, port: int, **options) -> FyreService:
         """
         Starts a service on the server.
         :param service_name: the name of the service
         :param port: the port number for the service
+        :param options: the capacity of the service, see FyreService
+        :return: the service, or the existing service if one with the same name is already registered
+        """
+        if service_name in self.services:
+            return self.services[service_name]
+        if port in self.ports:
+            raise ValueError(f"Port {port} on {self.name} is already used by {self.ports[port].name}.")
+        service = FyreService(self, service_name, port, **options)
+        service.start()
+        self.services[service_name] = service
+        self.ports[port] = service
+        return service
+
+    def remove_service(self, service_name: str):
+        """
+        Stops a service and frees its port.
+        :param service_name: the name of the service
+        """
+        service = self.services.pop(service_name)
+        service.stop()
+        del self.ports[service.port]
+
+    def process_packet(self, packet):
+        """
+        Hands a packet to the service listening on its destination port.
+        :param packet:  the packet
+        :return:        True if the service accepted it, False if no service listens on the port or the service
+                        rejected or dropped it
+        """
+        service = self.ports.get(packet.dport)
+        if service is None:
+            if self.platform.metrics_enabled:
+                self.metrics.counters['no_service'] += 1
+            self.platform.events.emit(INFO, 'refused', "No service on port {dport} of {server}. Dropping packet.",
+                                      server=self.name, src=packet.src, dport=packet.dport)
+            return False
+        accepted = service.handle(packet)
+        if not accepted:
+            self.platform.events.emit(INFO, 'rejected', "Service {service} on {server} did not accept the packet.",
+                                      server=self.name, service=service.name, src=packet.src, dport=packet.dport)
+        return accepted
+
+    def service_stats(self) -> list:
+        """
+        :return: the stats of every service, see FyreService.stats
         """
-        if service_name not in self.services:
-            service = FyreService(self, service_name, port)
-            service.start()
-            self.services[service_name] = service
-            # self.parent_ui_component.add_ui_component(
-            #     tk.Label(text=f"Service: {service_name} | Port: {port} | Status: {service.status}",
-            #              master=self.parent_ui_component.frame), drags_component=True)
+        return [service.stats() for service in self.services.values()]
@@ -1,15 +1,25 @@
-import tkinter as tk
+import sys
 
+from fyre.common.fyre_scheduler import FyreScheduler
+from fyre.fyre_scenario import load_scenario
 from fyre.fyre_ui import create_interface
 from fyre.parts.platform import Platform
 
+# The file the interface's events are appended to
+EVENTS_PATH = 'fyre_events.jsonl'
+
 if __name__ == '__main__':
-    platform = Platform()
+    # Optionally load a scenario file and display it instead of the default components
+    platform = load_scenario(sys.argv[1]) if len(sys.argv) > 1 else Platform()
+    # Deliver packets through the event scheduler so sending never blocks the interface
+    platform.scheduler = FyreScheduler()
+    # Write packet verdicts to a JSON Lines file from a background thread, so the interface never waits on the output
+    platform.events.start_writer(EVENTS_PATH)
     main_window = create_interface(platform)
     # Get each server
     from fyre.parts.server import FyreServer
     for server in platform.servers:
-        if isinstance(server, FyreServer):
+        if isinstance(server, FyreServer) and not server.services:
             server.register_service('website', 80)
             server.register_service('email', 25)
             server.register_service('ftp', 21)
@@ -17,4 +27,7 @@ if __name__ == '__main__':
             server.register_service('webapp', 8080)
             server.register_service('database', 3306)
     # Start the main loop
-    main_window.mainloop()
+    try:
+        main_window.mainloop()
+    finally:
+        platform.events.stop_writer()
@@ -0,0 +1,38 @@
+from fyre.common.fyre_cache import VerdictCache
+from fyre.parts.firewall import Fyrewall
+from fyre.parts.platform import Platform
+
+
+def test_put_existing_key_does_not_evict():
+    cache = VerdictCache(max_entries=2)
+    cache.put('a', ('allow', 0))
+    cache.put('b', ('deny', -1))
+    cache.put('a', ('deny', 1))
+    assert len(cache) == 2
+    assert cache.evictions == 0
+    assert cache.get('a', 0) == ('deny', 1)
+    assert cache.get('b', 0) == ('deny', -1)
+
+
+def test_put_new_key_evicts_least_recently_used():
+    cache = VerdictCache(max_entries=2)
+    cache.put('a', ('allow', 0))
+    cache.put('b', ('allow', 0))
+    cache.put('a', ('allow', 0))
+    cache.put('c', ('allow', 0))
+    assert cache.evictions == 1
+    assert cache.get('b', 0) is None
+    assert cache.get('a', 0) is not None
+
+
+def test_new_generation_drops_entries():
+    cache = VerdictCache()
+    cache.put('a', ('allow', 0))
+    assert cache.get('a', 1) is None
+    assert cache.invalidations == 1
+
+
+def test_verdict_cache_is_opt_in():
+    platform = Platform()
+    assert Fyrewall(platform, None, None, "Firewall").verdict_cache is None
+    assert Fyrewall(platform, None, None, "Cached", verdict_cache=True).verdict_cache is not None
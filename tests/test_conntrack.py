@@ -0,0 +1,65 @@
+from fyre.common.fyre_conntrack import ConnectionTracker
+from fyre.common.fyre_events import WARNING
+from fyre.common.fyre_packet import FyrePacket
+from fyre.common.fyre_rules import PROTOCOLS
+from fyre.parts.firewall import Fyrewall
+from fyre.parts.platform import Platform
+
+
+def udp(src='10.0.0.1', dst='10.0.0.2', sport=5000, dport=53):
+    return FyrePacket(src, dst, sport, dport, PROTOCOLS['udp'])
+
+
+def test_flow_expires_after_expire_runs_mid_tick():
+    tracker = ConnectionTracker(idle_timeout=10, tick=1.0)
+    tracker.expire(0.0)
+    tracker.open(udp(), 0.5)
+    # Runs during the flow's expiry tick, before it is due at 10.5
+    tracker.expire(10.2)
+    assert len(tracker) == 1
+    tracker.expire(11.0)
+    assert len(tracker) == 0
+    assert tracker.idle_evictions == 1
+
+
+def test_flow_is_not_tracked_at_later_times_after_mid_tick_expire():
+    for later in (11, 20, 100, 300, 500):
+        tracker = ConnectionTracker(idle_timeout=10, tick=1.0)
+        tracker.expire(0.0)
+        tracker.open(udp(), 0.5)
+        tracker.expire(10.2)
+        assert tracker.lookup(udp(), later) is None
+        assert len(tracker) == 0
+
+
+def test_lookup_rejects_idle_flow_between_ticks():
+    tracker = ConnectionTracker(idle_timeout=0.5, tick=1.0)
+    tracker.expire(0.0)
+    tracker.open(udp(), 0.1)
+    assert tracker.lookup(udp(), 0.4) is not None
+    assert tracker.lookup(udp(), 0.95) is None
+    assert len(tracker) == 0
+
+
+def test_active_flow_stays_tracked():
+    tracker = ConnectionTracker(idle_timeout=10, tick=1.0)
+    tracker.open(udp(), 0.0)
+    for now in range(5, 100, 5):
+        assert tracker.lookup(udp(dst='10.0.0.1', src='10.0.0.2', sport=53, dport=5000), now) is not None
+    tracker.expire(200.0)
+    assert len(tracker) == 0
+
+
+def test_connection_tracking_is_opt_in():
+    platform = Platform()
+    platform.events.level = WARNING
+    firewall = Fyrewall(platform, None, None, "Firewall")
+    assert firewall.connections is None
+    firewall.load_configuration({"allowed_ports": [53], "blocked_ips": [], "rules": []})
+    assert firewall.process_packet(udp())
+    assert not firewall.process_packet(udp(dst='10.0.0.1', src='10.0.0.2', sport=53, dport=5000))
+
+    tracked = Fyrewall(platform, None, None, "Tracked", connection_tracking=True)
+    tracked.load_configuration({"allowed_ports": [53], "blocked_ips": [], "rules": []})
+    assert tracked.process_packet(udp())
+    assert tracked.process_packet(udp(dst='10.0.0.1', src='10.0.0.2', sport=53, dport=5000))
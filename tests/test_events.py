@@ -0,0 +1,58 @@
+import json
+
+from fyre.common.fyre_events import DEBUG, INFO, WARNING, EventLog
+
+
+def kinds(log: EventLog) -> list:
+    return [event.kind for event in log.events()]
+
+
+def test_ring_overwrites_oldest_events():
+    log = EventLog(capacity=3)
+    for index in range(5):
+        log.emit(INFO, f'event{index}', "Event {index}", index=index)
+    assert kinds(log) == ['event2', 'event3', 'event4']
+    assert log.stats() == {"buffered": 3, "capacity": 3, "emitted": 5, "filtered": 0, "sampled_out": 0,
+                           "overwritten": 2}
+
+
+def test_events_below_the_level_are_filtered():
+    log = EventLog(level=INFO)
+    log.emit(DEBUG, 'trace', "Trace")
+    log.emit(INFO, 'allow', "Allow")
+    log.emit(WARNING, 'drop', "Drop")
+    assert kinds(log) == ['allow', 'drop']
+    assert log.stats()["filtered"] == 1
+    assert not log.enabled_for(DEBUG) and log.enabled_for(INFO)
+
+
+def test_sampling_keeps_one_in_n_but_every_warning():
+    log = EventLog(sample_every=3)
+    for index in range(9):
+        log.emit(INFO, 'allow', "Allow {index}", index=index)
+    log.emit(WARNING, 'drop', "Drop")
+    log.emit(WARNING, 'drop', "Drop")
+    assert [event.fields.get('index') for event in log.events()] == [2, 5, 8, None, None]
+    assert log.stats()["sampled_out"] == 6
+
+
+def test_messages_are_formatted_when_read():
+    log = EventLog()
+    log.emit(INFO, 'drop', "Dropped packet from {src}.", src=b'10.0.0.1')
+    event = log.events()[0]
+    assert event.fields == {"src": b'10.0.0.1'} and event.message == "Dropped packet from 10.0.0.1."
+    assert log.drain() == [event] and log.events() == []
+
+
+def test_writer_drains_to_json_lines(tmp_path):
+    path = tmp_path / 'events.jsonl'
+    log = EventLog()
+    log.start_writer(str(path), interval=60)
+    log.emit(INFO, 'allow', "Allowed {src} to port {dport}.", src='10.0.0.1', dport=80)
+    log.emit(WARNING, 'drop', "Dropped {src}.", src=b'10.0.0.2')
+    log.stop_writer()
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(line["level"], line["kind"], line["message"]) for line in lines] == [
+        ('info', 'allow', "Allowed 10.0.0.1 to port 80."), ('warning', 'drop', "Dropped 10.0.0.2.")]
+    assert lines[0]["dport"] == 80 and lines[1]["src"] == '10.0.0.2'
+    assert log.events() == []
@@ -0,0 +1,101 @@
+import itertools
+
+import pytest
+
+from fyre.common.fyre_load import LoadDriver, drive_clients, merge_flows, service_ports
+from fyre.common.fyre_scheduler import FyreScheduler
+from fyre.fyre_scenario import build_scenario
+
+
+def platform(scheduler: FyreScheduler = None):
+    platform = build_scenario({"clients": [{"name": "Client 1", "ip": "10.0.0.1"},
+                                           {"name": "Client 2", "ip": "10.0.0.3"}],
+                               "servers": [{"name": "Web", "ip": "10.0.0.2",
+                                            "services": {"website": 80, "ssh": 22}}]})
+    platform.scheduler = scheduler
+    return platform
+
+
+class Counting:
+    """
+    Wraps a flow iterator and counts how many flows were taken from it.
+    """
+    def __init__(self, flows):
+        self.flows = iter(flows)
+        self.taken = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        flow = next(self.flows)
+        self.taken += 1
+        return flow
+
+
+def test_endless_generator_is_consumed_lazily():
+    client = platform().clients[0]
+    flows = client.generate_flows(1000, seed=0)
+    first = list(itertools.islice(flows, 5))
+    assert [flow[0] for flow in first] == sorted(flow[0] for flow in first)
+    assert all(flow[1] is client and flow[2] == "10.0.0.2" and flow[3] in (80, 22) for flow in first)
+
+
+def test_evenly_spaced_flows_and_weighted_services():
+    client = platform().clients[0]
+    flows = list(client.generate_flows(10, duration=1.0, poisson=False, service_mix={'ssh': 1}, seed=0))
+    assert [flow[0] for flow in flows] == pytest.approx([index / 10 for index in range(10)])
+    assert {flow[3] for flow in flows} == {22}
+    with pytest.raises(ValueError):
+        service_ports(client.platform.servers[0], {'telnet': 1})
+
+
+def test_merged_flows_are_in_time_order():
+    clients = platform().clients
+    flows = list(merge_flows(client.generate_flows(100, duration=1.0, seed=index)
+                             for index, client in enumerate(clients)))
+    assert [flow[0] for flow in flows] == sorted(flow[0] for flow in flows)
+    assert {flow[1] for flow in flows} == set(clients)
+
+
+def test_driver_takes_one_flow_at_a_time():
+    scheduler = FyreScheduler()
+    load = platform(scheduler)
+    flows = Counting(load.clients[0].generate_flows(1000, duration=1.0, seed=0))
+    driver = LoadDriver(load, flows)
+    driver.start()
+    assert flows.taken == 1
+    scheduler.step()
+    assert flows.taken == 2 and driver.sent == 1
+
+
+def test_driver_stops_generating_while_the_link_is_full():
+    scheduler = FyreScheduler()
+    load = platform(scheduler)
+    client, server = load.clients[0], load.servers[0]
+    # Each 64 byte payload takes about 0.1 seconds on the link, far slower than the flows arrive
+    scheduler.set_link(client, server, latency=0.0, bandwidth=8000, queue_limit=2)
+    flows = Counting(client.generate_flows(1000, duration=0.05, poisson=False, seed=0))
+    driver = LoadDriver(load, flows, backoff=0.01)
+    driver.start()
+    while scheduler.now < 0.05 and scheduler.step():
+        pass
+    # Two flows fill the queue; the third is held back, and nothing more is taken from the generator
+    assert driver.sent == 2 and driver.deferred > 0 and flows.taken == 3
+    stats = driver.run()
+    assert stats["done"] and stats["sent"] == 50 and stats["dropped"] == 0 and stats["max_lag"] > 1.0
+    assert flows.taken == 50 and scheduler.links[(client, server)].dropped == 0
+
+
+def test_driver_stops_generating_while_too_many_events_are_pending():
+    scheduler = FyreScheduler()
+    load = platform(scheduler)
+    for _ in range(10):
+        scheduler.schedule(1.0, lambda: None)
+    flows = Counting(load.clients[0].generate_flows(1000, duration=0.01, poisson=False, seed=0))
+    driver = drive_clients(load, [flows], max_pending=5, backoff=0.1)
+    driver.start()
+    while scheduler.now < 0.5 and scheduler.step():
+        pass
+    assert driver.sent == 0 and flows.taken == 1 and driver.deferred > 0
+    assert driver.run()["sent"] == 10
@@ -0,0 +1,64 @@
+import pytest
+
+from fyre.common.fyre_metrics import DEFAULT_RULE, FyreMetrics, LatencyHistogram
+from fyre.common.fyre_packet import FyrePacket
+from fyre.fyre_bench import METRICS_BENCHMARKS, run_benchmarks
+from fyre.fyre_scenario import build_scenario
+
+
+@pytest.mark.parametrize('duration, bucket', [(0, 0), (1, 1), (2, 2), (3, 2), (4, 3), (1023, 10), (1024, 11)])
+def test_durations_fall_in_power_of_two_buckets(duration, bucket):
+    histogram = LatencyHistogram()
+    histogram.record(duration)
+    assert histogram.buckets[bucket] == 1 and sum(histogram.buckets) == 1
+
+
+def test_percentiles_are_bucket_upper_bounds():
+    histogram = LatencyHistogram()
+    for duration in [100] * 90 + [5000] * 9 + [70000]:
+        histogram.record(duration)
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 100 and snapshot["max_ns"] == 70000
+    assert snapshot["mean_ns"] == pytest.approx((100 * 90 + 5000 * 9 + 70000) / 100)
+    assert (snapshot["p50_ns"], snapshot["p90_ns"], snapshot["p99_ns"]) == (127, 127, 8191)
+    assert histogram.percentile(1.0) == 131071
+    assert LatencyHistogram().snapshot()["p99_ns"] == 0
+
+
+def test_snapshot_copies_counters_rule_hits_and_latency():
+    metrics = FyreMetrics()
+    metrics.counters['packets'] += 2
+    metrics.rule_hits[None] += 1
+    metrics.rule_hits[3] += 4
+    metrics.observe('process_packet', 1500)
+    snapshot = metrics.snapshot()
+    metrics.counters['packets'] += 1
+    assert snapshot["counters"] == {'packets': 2}
+    assert snapshot["rules"] == {DEFAULT_RULE: 1, '3': 4}
+    assert snapshot["latency"]["process_packet"]["count"] == 1
+    metrics.reset()
+    assert metrics.snapshot() == {"counters": {}, "rules": {}, "latency": {}}
+
+
+def test_firewall_counts_packets_only_while_metrics_are_enabled():
+    platform = build_scenario({"firewalls": [{"name": "Firewall", "allowed_ports": [80], "members": ["10.0.0.2"]}],
+                               "servers": [{"name": "Web", "ip": "10.0.0.2"}]})
+    firewall = platform.firewalls[0]
+    firewall.process_packet(FyrePacket("10.0.0.1", "10.0.0.2", 40000, 80))
+    firewall.process_packet(FyrePacket("10.0.0.1", "10.0.0.2", 40000, 22))
+    counters = firewall.metrics.counters
+    assert (counters['packets'], counters['allowed'], counters['dropped']) == (2, 1, 1)
+    assert firewall.metrics.latency['process_packet'].count == 2
+    platform.metrics_enabled = False
+    firewall.process_packet(FyrePacket("10.0.0.1", "10.0.0.2", 40000, 80))
+    assert counters['packets'] == 2 and firewall.metrics.latency['process_packet'].count == 2
+
+
+def test_benchmark_reports_metrics_overhead():
+    results = run_benchmarks(clients=5, servers=2, firewalls=1, rules=10, packets=50, memory=False)
+    assert set(results["metrics_overhead"]) == set(METRICS_BENCHMARKS)
+    for result in results["metrics_overhead"].values():
+        assert result["ops_per_second_on"] > 0 and result["ops_per_second_off"] > 0
+        assert result["overhead"] == pytest.approx(1 - result["ops_per_second_on"] / result["ops_per_second_off"])
+    assert "metrics_overhead" not in run_benchmarks(clients=5, servers=2, firewalls=1, rules=10, packets=50,
+                                                    memory=False, overhead=False)
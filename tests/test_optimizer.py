@@ -0,0 +1,94 @@
+import ipaddress
+import random
+
+import pytest
+
+from fyre.common.fyre_rules import PROTOCOLS
+from fyre.fyre_optimizer import DUPLICATE, REDUNDANT, SHADOWED, optimize_configuration, sample_traffic, verify
+
+OTHER_PROTOCOL = 47
+
+
+def random_address(rng) -> str:
+    return str(ipaddress.IPv4Address((10 << 24) | rng.getrandbits(10)))
+
+
+def random_rule(rng) -> dict:
+    rule = {"action": rng.choice(("allow", "deny"))}
+    if rng.random() < 0.6:
+        rule["src"] = [f"{random_address(rng)}/{rng.randint(22, 32)}" for _ in range(rng.randint(1, 3))]
+    if rng.random() < 0.3:
+        rule["dst"] = [f"{random_address(rng)}/{rng.randint(22, 32)}"]
+    if rng.random() < 0.6:
+        low = rng.randrange(0, 100)
+        rule["dport"] = [f"{low}-{low + rng.randrange(30)}", str(rng.randrange(0, 130))]
+    if rng.random() < 0.2:
+        rule["sport"] = [str(rng.randrange(0, 130))]
+    if rng.random() < 0.5:
+        rule["protocol"] = rng.choice(("tcp", "udp", "icmp", OTHER_PROTOCOL))
+    return rule
+
+
+def random_configuration(rng) -> dict:
+    rules = [random_rule(rng) for _ in range(rng.randint(0, 30))]
+    # Repeat some rules so there are duplicates to find
+    rules += [dict(rng.choice(rules)) for _ in range(min(len(rules), 3))]
+    rng.shuffle(rules)
+    return {
+        "allowed_ports": [rng.randrange(0, 130) for _ in range(rng.randint(0, 10))],
+        "blocked_ips": [random_address(rng) if rng.random() < 0.7 else f"{random_address(rng)}/{rng.randint(24, 30)}"
+                        for _ in range(rng.randint(0, 20))],
+        "rules": rules
+    }
+
+
+def random_packets(rng, count: int):
+    protocols = list(PROTOCOLS.values()) + [OTHER_PROTOCOL, 99]
+    return [(random_address(rng), random_address(rng), rng.randrange(0, 140), rng.randrange(0, 140),
+             rng.choice(protocols)) for _ in range(count)]
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_optimized_configuration_keeps_verdicts(seed):
+    rng = random.Random(seed)
+    config = random_configuration(rng)
+    optimized, report = optimize_configuration(config)
+    assert len(optimized["rules"]) == len(config["rules"]) - len(report.findings)
+    assert verify(config, optimized, count=2000, seed=seed) == []
+    assert verify(config, optimized, packets=random_packets(rng, 2000)) == []
+
+
+def test_verify_reports_different_verdicts():
+    config = {"allowed_ports": [80], "blocked_ips": [], "rules": []}
+    changed = {"allowed_ports": [80, 443], "blocked_ips": [], "rules": []}
+    mismatches = verify(config, changed, packets=[("10.0.0.1", "10.0.0.2", 1000, 443, PROTOCOLS['tcp'])])
+    assert mismatches == [(("10.0.0.1", "10.0.0.2", 1000, 443, PROTOCOLS['tcp']), "deny", "allow")]
+
+
+def test_sample_traffic_covers_rule_protocols_and_an_unused_one():
+    config = {"allowed_ports": [], "blocked_ips": [], "rules": [{"action": "deny", "protocol": OTHER_PROTOCOL}]}
+    protocols = {packet[4] for packet in sample_traffic(config, count=2000)}
+    assert protocols >= set(PROTOCOLS.values()) | {OTHER_PROTOCOL}
+    assert protocols - set(PROTOCOLS.values()) - {OTHER_PROTOCOL}
+
+
+def test_verify_catches_differences_in_uncommon_protocols():
+    config = {"allowed_ports": [], "blocked_ips": [], "rules": [{"action": "allow", "protocol": OTHER_PROTOCOL}]}
+    assert verify(config, {"allowed_ports": [], "blocked_ips": [], "rules": []}, count=200)
+
+
+def test_finding_names_the_surviving_rule():
+    config = {"allowed_ports": [80], "blocked_ips": [], "rules": [
+        {"action": "allow", "name": "web", "dport": "80"},
+        {"action": "allow", "name": "web again", "dport": "80"},
+        {"action": "deny", "name": "no web", "dport": "80"}
+    ]}
+    optimized, report = optimize_configuration(config)
+    assert optimized["rules"] == []
+    findings = {index: (kind, reason) for kind, index, reason in report.findings}
+    assert findings[0][0] == REDUNDANT
+    assert findings[1][0] == DUPLICATE
+    assert "the allowed ports" in findings[1][1]
+    assert findings[2][0] == SHADOWED
+    assert "the allowed ports" in findings[2][1]
+    assert verify(config, optimized) == []
@@ -0,0 +1,92 @@
+import random
+
+import pytest
+
+from fyre.common.fyre_packet import FyrePacket
+from fyre.common.fyre_rules import ALLOW, DENY, PROTOCOLS
+from fyre.fyre_parallel import run_flows, run_flows_parallel
+from fyre.fyre_scenario import build_scenario
+
+# Perimeter holds DMZ and Office; Branch sits outside it, linked directly to Office
+SCENARIO = {
+    "firewalls": [
+        {"name": "Perimeter", "allowed_ports": [22, 53, 80, 443, 8080], "blocked_ips": ["10.9.0.0/16"],
+         "rules": [{"action": "deny", "dport": 8080, "src": "10.0.0.0/16"}], "members": ["10.1.0.1"]},
+        {"name": "DMZ", "allowed_ports": [80, 443], "blocked_ips": [], "parent": "Perimeter",
+         "rules": [{"action": "deny", "src": "10.3.0.0/16", "dport": 443}], "members": ["10.2.0.1", "10.2.0.2"]},
+        {"name": "Office", "allowed_ports": [22, 53, 80], "blocked_ips": ["10.2.0.2"], "parent": "Perimeter",
+         "links": ["Branch"], "rules": [{"action": "deny", "protocol": "udp", "dport": 53}],
+         "members": ["10.3.0.1", "10.3.0.2"]},
+        {"name": "Branch", "allowed_ports": [22, 80, 443], "blocked_ips": [], "rules": [],
+         "members": ["10.4.0.1"]},
+    ],
+    "clients": [{"name": "Outside", "ip": "10.0.0.1"}, {"name": "Blocked", "ip": "10.9.0.1"},
+                {"name": "Staff", "ip": "10.3.0.1"}, {"name": "Remote", "ip": "10.4.0.1"}],
+    "servers": [{"name": "Gateway", "ip": "10.1.0.1"}, {"name": "Web", "ip": "10.2.0.1"},
+                {"name": "Mail", "ip": "10.2.0.2"}, {"name": "Files", "ip": "10.3.0.2"},
+                {"name": "Public", "ip": "10.5.0.1"}],
+}
+
+
+def flows(count: int = 2000, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    sources = ["10.0.0.1", "10.9.0.1", "10.3.0.1", "10.4.0.1", "10.2.0.2", "172.16.0.1"]
+    destinations = ["10.1.0.1", "10.2.0.1", "10.2.0.2", "10.3.0.2", "10.4.0.1", "10.5.0.1"]
+    return [(rng.choice(sources), rng.choice(destinations), rng.randint(40000, 40010),
+             rng.choice([22, 53, 80, 443, 8080, 9999]), rng.choice([PROTOCOLS['tcp'], PROTOCOLS['udp']]))
+            for _ in range(count)]
+
+
+def totals(platform) -> dict:
+    return {(firewall.name if firewall else None, action): count
+            for (firewall, action), count in platform.verdict_totals.items()}
+
+
+def test_parallel_matches_serial_on_nested_and_linked_zones():
+    sample = flows()
+    serial_platform, parallel_platform = build_scenario(SCENARIO), build_scenario(SCENARIO)
+    serial = run_flows(serial_platform, sample)
+    parallel = run_flows_parallel(parallel_platform, sample, workers=2, shards=5)
+    assert parallel.allowed == serial.allowed
+    assert parallel.firewalls == serial.firewalls
+    assert parallel.rules == serial.rules
+    assert parallel.counts == serial.counts
+    assert totals(parallel_platform) == totals(serial_platform)
+    # Flows are decided by every firewall and by none, and both allowed and dropped
+    assert set(serial.firewalls) == {-1, 0, 1, 2, 3}
+    assert {action for _, action in serial.counts} == {ALLOW, DENY}
+
+
+def test_serial_matches_packet_delivery():
+    sample = flows(500, seed=1)
+    platform = build_scenario(SCENARIO)
+    results = run_flows(build_scenario(SCENARIO), sample)
+    for index, (src, dst, sport, dport, protocol) in enumerate(sample):
+        destination = platform.get_fyre_component_by_ip(dst)[1]
+        crossed = platform.firewalls_between(src, destination)
+        assert destination.receive_packet(FyrePacket(src, dst, sport, dport, protocol)) == results.allowed[index]
+        # The deciding firewall is the first on the path that drops the flow, or the last one if none does
+        dropping = [firewall for firewall in crossed
+                    if firewall.ruleset.match(src, dst, sport, dport, protocol)[0] != ALLOW]
+        decided = dropping[0] if dropping else crossed[-1] if crossed else None
+        assert results.firewalls[index] == (platform.firewalls.index(decided) if decided else -1)
+    for index, firewall in enumerate(platform.firewalls):
+        assert firewall.metrics.counters['packets'] == results.counts[(index, ALLOW)] + results.counts[(index, DENY)]
+        assert firewall.metrics.counters['dropped'] == results.counts[(index, DENY)]
+
+
+@pytest.mark.parametrize('src, dst, crossed', [
+    ("10.0.0.1", "10.2.0.1", ["Perimeter", "DMZ"]),
+    ("10.4.0.1", "10.3.0.2", ["Office"]),
+    ("10.4.0.1", "10.2.0.1", ["Office", "DMZ"]),
+    ("10.3.0.1", "10.4.0.1", ["Branch"]),
+    ("10.0.0.1", "10.5.0.1", []),
+])
+def test_flows_cross_nested_and_linked_firewalls(src, dst, crossed):
+    serial_platform, parallel_platform = build_scenario(SCENARIO), build_scenario(SCENARIO)
+    flow = [(src, dst, 40000, 22)]
+    serial, parallel = run_flows(serial_platform, flow), run_flows_parallel(parallel_platform, flow, workers=1)
+    # Port 22 is allowed by every firewall but DMZ, so each firewall on the path evaluates the flow, in order
+    assert [serial_platform.firewalls[firewall].name for firewall, _ in serial.counts if firewall >= 0] == crossed
+    assert totals(parallel_platform) == totals(serial_platform)
+    assert (parallel.firewalls, parallel.allowed, parallel.rules) == (serial.firewalls, serial.allowed, serial.rules)
@@ -0,0 +1,177 @@
+import socket
+import struct
+
+import pytest
+
+from fyre.common.fyre_events import WARNING
+from fyre.common.fyre_packet import FyrePacket, write_pcap
+from fyre.fyre_replay import read_capture, replay
+from fyre.fyre_scenario import build_scenario
+
+TCP, UDP = 6, 17
+
+# (src, dst, sport, dport, protocol, flags, payload)
+FLOWS = [
+    ("10.0.0.1", "10.0.0.2", 40000, 80, TCP, 'S', b''),
+    ("10.0.0.1", "10.0.0.2", 40000, 80, TCP, 'PA', b'GET / HTTP/1.1\r\n'),
+    ("10.0.0.3", "10.0.0.2", 40001, 22, TCP, 'S', b''),
+    ("10.0.0.1", "10.0.0.9", 5353, 53, UDP, '', b'query'),
+    ("2001:db8::1", "2001:db8::2", 50000, 443, TCP, 'SA', b''),
+]
+
+
+def transport(flow) -> bytes:
+    _, _, sport, dport, protocol, flags, payload = flow
+    if protocol == UDP:
+        return struct.pack('>HHHH', sport, dport, 8 + len(payload), 0) + payload
+    value = sum(1 << 'FSRPAUEC'.index(flag) for flag in flags)
+    return struct.pack('>HHIIBBHHH', sport, dport, 0, 0, 5 << 4, value, 1024, 0, 0) + payload
+
+
+def ip_packet(flow) -> bytes:
+    src, dst, _, _, protocol, _, _ = flow
+    body = transport(flow)
+    if ':' in src:
+        return struct.pack('>IHBB', 6 << 28, len(body), protocol, 64) + \
+            socket.inet_pton(socket.AF_INET6, src) + socket.inet_pton(socket.AF_INET6, dst) + body
+    return struct.pack('>BBHHHBBH', 0x45, 0, 20 + len(body), 0, 0, 64, protocol, 0) + \
+        socket.inet_aton(src) + socket.inet_aton(dst) + body
+
+
+def frame(linktype: int, flow, vlan: bool = False) -> bytes:
+    packet = ip_packet(flow)
+    ethertype = 0x86dd if ':' in flow[0] else 0x0800
+    if linktype == 1:
+        tags = struct.pack('>HH', 0x8100, 7) if vlan else b''
+        return b'\x00' * 12 + tags + struct.pack('>H', ethertype) + packet
+    if linktype == 113:
+        return struct.pack('>HHH', 0, 1, 6) + b'\x00' * 8 + struct.pack('>H', ethertype) + packet
+    if linktype == 0:
+        return struct.pack('<I', 30 if ':' in flow[0] else 2) + packet
+    return packet
+
+
+def pcap(linktype: int, frames, endian: str = '<', nanoseconds: bool = False) -> bytes:
+    magic = 0xa1b23c4d if nanoseconds else 0xa1b2c3d4
+    data = struct.pack(endian + 'IHHiIII', magic, 2, 4, 0, 0, 65535, linktype)
+    for index, payload in enumerate(frames):
+        data += struct.pack(endian + 'IIII', 100 + index, 500, len(payload), len(payload)) + payload
+    return data
+
+
+def block(endian: str, block_type: int, body: bytes) -> bytes:
+    body += b'\x00' * (-len(body) % 4)
+    length = len(body) + 12
+    return struct.pack(endian + 'II', block_type, length) + body + struct.pack(endian + 'I', length)
+
+
+def pcapng(linktype: int, frames, endian: str = '<', simple: bool = False) -> bytes:
+    data = block(endian, 0x0a0d0d0a, struct.pack(endian + 'IHHq', 0x1a2b3c4d, 1, 0, -1))
+    # if_tsresol of 10^-3 seconds, then the end of options
+    options = struct.pack(endian + 'HH', 9, 1) + b'\x03\x00\x00\x00' + struct.pack(endian + 'HH', 0, 0)
+    data += block(endian, 1, struct.pack(endian + 'HHI', linktype, 0, 65535) + options)
+    for index, payload in enumerate(frames):
+        if simple:
+            data += block(endian, 3, struct.pack(endian + 'I', len(payload)) + payload)
+        else:
+            timestamp = 2000 + index
+            data += block(endian, 6, struct.pack(endian + 'IIIII', 0, timestamp >> 32, timestamp & 0xffffffff,
+                                                 len(payload), len(payload)) + payload)
+    return data
+
+
+def decoded(path):
+    return [(packet.src, packet.dst, packet.sport, packet.dport, packet.proto, packet.flags, packet.load)
+            for packet in read_capture(str(path))]
+
+
+@pytest.mark.parametrize('linktype, vlan', [(1, False), (1, True), (113, False), (0, False), (101, False)])
+@pytest.mark.parametrize('endian', ['<', '>'])
+def test_pcap_link_types(tmp_path, linktype, vlan, endian):
+    path = tmp_path / 'capture.pcap'
+    path.write_bytes(pcap(linktype, [frame(linktype, flow, vlan) for flow in FLOWS], endian))
+    assert decoded(path) == FLOWS
+    assert [packet.timestamp for packet in read_capture(str(path))] == [100 + index + 500e-6
+                                                                      for index in range(len(FLOWS))]
+
+
+def test_pcap_nanosecond_timestamps(tmp_path):
+    path = tmp_path / 'capture.pcap'
+    path.write_bytes(pcap(1, [frame(1, FLOWS[0])], nanoseconds=True))
+    assert next(read_capture(str(path))).timestamp == pytest.approx(100 + 500e-9)
+
+
+@pytest.mark.parametrize('linktype', [1, 113, 0, 101])
+@pytest.mark.parametrize('endian', ['<', '>'])
+@pytest.mark.parametrize('simple', [False, True])
+def test_pcapng_blocks(tmp_path, linktype, endian, simple):
+    path = tmp_path / 'capture.pcapng'
+    path.write_bytes(pcapng(linktype, [frame(linktype, flow) for flow in FLOWS], endian, simple))
+    assert decoded(path) == FLOWS
+    timestamps = [packet.timestamp for packet in read_capture(str(path))]
+    assert timestamps == ([0.0] * len(FLOWS) if simple else
+                          [pytest.approx((2000 + index) * 1e-3) for index in range(len(FLOWS))])
+
+
+def test_non_ip_frames_are_skipped(tmp_path):
+    arp = b'\x00' * 12 + struct.pack('>H', 0x0806) + b'\x00' * 28
+    path = tmp_path / 'capture.pcap'
+    path.write_bytes(pcap(1, [arp, frame(1, FLOWS[0])]))
+    assert decoded(path) == FLOWS[:1]
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'capture.txt'
+    path.write_bytes(b'not a capture')
+    with pytest.raises(ValueError):
+        list(read_capture(str(path)))
+
+
+@pytest.mark.parametrize('length', [0, 8, 14, 4096])
+def test_rejects_malformed_pcapng_block_lengths(tmp_path, length):
+    data = pcapng(1, [frame(1, FLOWS[0])])
+    # Overwrite the length of the enhanced packet block that follows the section header and interface blocks
+    interface = len(block('<', 0x0a0d0d0a, struct.pack('<IHHq', 0x1a2b3c4d, 1, 0, -1)))
+    offset = interface + struct.unpack_from('<I', data, interface + 4)[0]
+    data = data[:offset + 4] + struct.pack('<I', length) + data[offset + 8:]
+    path = tmp_path / 'capture.pcapng'
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        list(read_capture(str(path)))
+
+
+def test_rejects_unknown_pcapng_interface(tmp_path):
+    data = block('<', 0x0a0d0d0a, struct.pack('<IHHq', 0x1a2b3c4d, 1, 0, -1))
+    payload = frame(1, FLOWS[0])
+    data += block('<', 6, struct.pack('<IIIII', 3, 0, 0, len(payload), len(payload)) + payload)
+    path = tmp_path / 'capture.pcapng'
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        list(read_capture(str(path)))
+
+
+def test_write_pcap_round_trip(tmp_path):
+    pytest.importorskip('scapy')
+    path = tmp_path / 'capture.pcap'
+    packets = [FyrePacket(src, dst, sport, dport, protocol, flags or 'S', payload)
+               for src, dst, sport, dport, protocol, flags, payload in FLOWS if ':' not in src]
+    write_pcap(str(path), packets)
+    assert [(packet.src, packet.dst, packet.sport, packet.dport, packet.proto, packet.load)
+            for packet in read_capture(str(path))] == \
+        [(packet.src, packet.dst, packet.sport, packet.dport, packet.proto, packet.load) for packet in packets]
+
+
+@pytest.mark.parametrize('name, data', [('capture.pcap', pcap(1, [frame(1, flow) for flow in FLOWS])),
+                                        ('capture.pcapng', pcapng(1, [frame(1, flow) for flow in FLOWS], '>'))])
+def test_replay_verdict_counts(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    platform = build_scenario({
+        "firewalls": [{"name": "Firewall", "allowed_ports": [80], "blocked_ips": [], "members": ["10.0.0.2"]}],
+        "clients": [{"name": "Client", "ip": "10.0.0.1"}],
+        "servers": [{"name": "Web", "ip": "10.0.0.2"}, {"name": "Other", "ip": "2001:db8::2"}]
+    })
+    platform.events.level = WARNING
+    stats = replay(platform, str(path))
+    # Port 80 is allowed, port 22 is not, 10.0.0.9 is not registered and the IPv6 server is behind no firewall
+    assert (stats.packets, stats.allowed, stats.dropped, stats.unmatched) == (5, 3, 1, 1)
@@ -0,0 +1,33 @@
+import pytest
+
+from fyre.fyre_rule_editor import ConfigurationSaveJob
+from fyre.parts.firewall import Fyrewall
+from fyre.parts.platform import Platform
+
+
+def run(job: ConfigurationSaveJob) -> ConfigurationSaveJob:
+    job.start()
+    job.join(10)
+    assert not job.is_alive()
+    return job
+
+
+def test_save_applies_the_configuration():
+    firewall = Fyrewall(Platform(), None, None, "Firewall")
+    config = {"allowed_ports": [80], "blocked_ips": ["10.0.0.1"], "rules": [{"action": "deny", "dport": 22}]}
+    job = run(ConfigurationSaveJob(firewall, config))
+    job.apply()
+    assert job.error is None and job.summary() == "Configuration saved for Firewall."
+    assert firewall.configuration()["blocked_ips"] == ["10.0.0.1"]
+
+
+def test_save_with_a_field_of_the_wrong_type_fails():
+    firewall = Fyrewall(Platform(), None, None, "Firewall")
+    before = firewall.configuration()
+    config = {"allowed_ports": [], "blocked_ips": [], "rules": [{"action": "deny", "protocol": ["tcp"]}]}
+    job = run(ConfigurationSaveJob(firewall, config))
+    assert isinstance(job.error, AttributeError)
+    assert job.summary().startswith("Invalid firewall configuration:")
+    with pytest.raises(ValueError):
+        job.apply()
+    assert firewall.configuration() == before
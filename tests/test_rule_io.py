@@ -0,0 +1,54 @@
+import pytest
+
+from fyre.fyre_rule_io import RuleImportJob, write_rules
+from fyre.parts.firewall import Fyrewall
+from fyre.parts.platform import Platform
+
+
+def firewall() -> Fyrewall:
+    return Fyrewall(Platform(), None, None, "Firewall")
+
+
+def run(job: RuleImportJob) -> RuleImportJob:
+    job.start()
+    job.join(10)
+    assert job.done
+    return job
+
+
+def test_short_csv_row_fails_the_import(tmp_path):
+    path = tmp_path / 'short.csv'
+    path.write_text("kind,action,name,src,dst,sport,dport,protocol\nblocked_ip\n")
+    job = run(RuleImportJob(firewall(), str(path), 'replace'))
+    assert job.stage == 'failed'
+    assert "line 2" in job.summary()
+    with pytest.raises(ValueError):
+        job.apply()
+
+
+def test_unexpected_errors_fail_the_import(tmp_path):
+    path = tmp_path / 'rules.txt'
+    path.write_text("10.0.0.1\n")
+    target = firewall()
+
+    def prepare_configuration(config):
+        raise RuntimeError("compiler crashed")
+
+    target.prepare_configuration = prepare_configuration
+    job = run(RuleImportJob(target, str(path), 'append'))
+    assert job.stage == 'failed'
+    assert isinstance(job.error, RuntimeError)
+
+
+@pytest.mark.parametrize('name', ['rules.json', 'rules.csv'])
+def test_import_round_trip(tmp_path, name):
+    config = {"allowed_ports": [80, "1000-2000"], "blocked_ips": ["10.0.0.1", "192.168.0.0/24"],
+              "rules": [{"action": "deny", "name": "ssh", "dport": ["22"], "protocol": "tcp"}]}
+    write_rules(str(tmp_path / name), config)
+    target = firewall()
+    job = run(RuleImportJob(target, str(tmp_path / name), 'replace'))
+    assert job.stage == 'done', job.error
+    job.apply()
+    assert target.ruleset.match('10.0.0.5', '10.0.0.2', 1000, 1500)[0] == 'allow'
+    assert target.ruleset.match('10.0.0.1', '10.0.0.2', 1000, 1500)[0] == 'deny'
+    assert target.ruleset.match('10.0.0.5', '10.0.0.2', 1000, 22)[0] == 'deny'
@@ -0,0 +1,108 @@
+import ipaddress
+import random
+
+import pytest
+
+from fyre.common.fyre_rules import ALLOW, DENY, PROTOCOLS, FyreRule, FyreRuleSet
+
+OTHER_PROTOCOL = 47
+
+
+def reference_match(rules, default_action, src, dst, sport, dport, protocol):
+    """
+    Checks every rule in order, field by field.
+    """
+    src, dst = ipaddress.ip_address(src), ipaddress.ip_address(dst)
+    for index, rule in enumerate(rules):
+        if rule.src is not None and not any(src in network for network in rule.src):
+            continue
+        if rule.dst is not None and not any(dst in network for network in rule.dst):
+            continue
+        if rule.sport is not None and not any(low <= sport <= high for low, high in rule.sport):
+            continue
+        if rule.dport is not None and not any(low <= dport <= high for low, high in rule.dport):
+            continue
+        if rule.protocol is not None and rule.protocol != protocol:
+            continue
+        return rule.action, index
+    return default_action, -1
+
+
+def random_address(rng, ipv6: bool = False) -> str:
+    if ipv6:
+        return str(ipaddress.IPv6Address((0x20010db8 << 96) | rng.getrandbits(12)))
+    return str(ipaddress.IPv4Address((10 << 24) | rng.getrandbits(12)))
+
+
+def random_networks(rng, ipv6: bool = False):
+    if rng.random() < 0.4:
+        return None
+    networks = []
+    for _ in range(rng.randint(1, 3)):
+        bits = 128 if ipv6 else 32
+        networks.append(f"{random_address(rng, ipv6)}/{rng.randint(bits - 12, bits)}")
+    return networks
+
+
+def random_ports(rng):
+    if rng.random() < 0.4:
+        return None
+    ports = []
+    for _ in range(rng.randint(1, 3)):
+        low = rng.randrange(0, 200)
+        ports.append(str(low) if rng.random() < 0.5 else f"{low}-{min(low + rng.randrange(50), 65535)}")
+    return ports
+
+
+def random_rules(rng, count: int, ipv6: bool = False):
+    protocols = [None, 'tcp', 'udp', 'icmp', OTHER_PROTOCOL]
+    return [FyreRule(rng.choice((ALLOW, DENY)), random_networks(rng, ipv6), random_networks(rng, ipv6),
+                     random_ports(rng), random_ports(rng), rng.choice(protocols)) for _ in range(count)]
+
+
+def random_packets(rng, count: int, ipv6: bool = False):
+    protocols = list(PROTOCOLS.values()) + [OTHER_PROTOCOL]
+    return [(random_address(rng, ipv6), random_address(rng, ipv6), rng.randrange(0, 250), rng.randrange(0, 250),
+             rng.choice(protocols)) for _ in range(count)]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_match_agrees_with_reference(seed):
+    rng = random.Random(seed)
+    ipv6 = seed % 4 == 3
+    rules = random_rules(rng, rng.randint(1, 40), ipv6)
+    default_action = rng.choice((ALLOW, DENY))
+    ruleset = FyreRuleSet(rules, default_action)
+    for packet in random_packets(rng, 500, ipv6):
+        assert ruleset.match(*packet) == reference_match(rules, default_action, *packet), packet
+
+
+def test_empty_ruleset_applies_default_action():
+    rng = random.Random(0)
+    for default_action in (ALLOW, DENY):
+        ruleset = FyreRuleSet([], default_action)
+        for packet in random_packets(rng, 50):
+            assert ruleset.match(*packet) == (default_action, -1)
+
+
+def test_any_protocol_rule_matches_every_protocol():
+    ruleset = FyreRuleSet([FyreRule(DENY, protocol='udp'), FyreRule(ALLOW, dport='80-90')])
+    for protocol in list(PROTOCOLS.values()) + [OTHER_PROTOCOL]:
+        expected = (DENY, 0) if protocol == PROTOCOLS['udp'] else (ALLOW, 1)
+        assert ruleset.match('10.0.0.1', '10.0.0.2', 1000, 85, protocol) == expected
+    assert ruleset.match('10.0.0.1', '10.0.0.2', 1000, 91, PROTOCOLS['tcp']) == (DENY, -1)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_evaluate_batch_agrees_with_match(seed):
+    np = pytest.importorskip('numpy')
+    rng = random.Random(seed)
+    rules = random_rules(rng, rng.randint(0, 40))
+    default_action = rng.choice((ALLOW, DENY))
+    ruleset = FyreRuleSet(rules, default_action)
+    packets = random_packets(rng, 1000)
+    src, dst, sport, dport, protocol = (list(field) for field in zip(*packets))
+    allowed, indices = ruleset.evaluate_batch(src, dst, sport, dport, np.array(protocol))
+    for packet, packet_allowed, index in zip(packets, allowed, indices):
+        action, expected_index = reference_match(rules, default_action, *packet)
+        assert (bool(packet_allowed), int(index)) == (action == ALLOW, expected_index), packet
@@ -0,0 +1,101 @@
+import pytest
+
+from fyre.common.fyre_scheduler import FyreScheduler
+from fyre.fyre_scenario import build_scenario
+
+
+class Receiver:
+    """
+    Records when each packet arrives.
+    """
+    def __init__(self, scheduler: FyreScheduler):
+        self.scheduler = scheduler
+        self.arrivals = []
+
+    def receive_packet(self, packet):
+        self.arrivals.append((self.scheduler.now, packet))
+
+
+def test_events_run_in_time_order_with_ties_in_scheduling_order():
+    scheduler, order = FyreScheduler(), []
+    for delay, name in [(0.3, 'c'), (0.1, 'a'), (0.2, 'b1'), (0.2, 'b2'), (0.0, 'now')]:
+        scheduler.schedule(delay, lambda name=name: order.append((name, scheduler.now)))
+    assert scheduler.run() == 5
+    assert order == [('now', 0.0), ('a', 0.1), ('b1', 0.2), ('b2', 0.2), ('c', 0.3)]
+    assert scheduler.stats()["events_run"] == 5 and scheduler.pending == 0
+
+
+def test_events_scheduled_by_events_run_after_the_current_time():
+    scheduler, order = FyreScheduler(), []
+    scheduler.schedule(1.0, lambda: scheduler.schedule(0.5, lambda: order.append(scheduler.now)))
+    scheduler.schedule(1.2, lambda: order.append(scheduler.now))
+    scheduler.run()
+    assert order == [1.2, 1.5]
+
+
+def test_run_stops_at_until_and_advances_the_clock():
+    scheduler, order = FyreScheduler(), []
+    for delay in (1.0, 2.0, 3.0):
+        scheduler.schedule(delay, order.append, delay)
+    assert scheduler.run(until=2.5) == 2
+    assert order == [1.0, 2.0] and scheduler.now == 2.5 and scheduler.pending == 1
+    assert scheduler.run(max_events=1) == 1 and order == [1.0, 2.0, 3.0]
+
+
+def test_cannot_schedule_in_the_past():
+    with pytest.raises(ValueError):
+        FyreScheduler().schedule(-1.0, print)
+
+
+def test_latency_delays_delivery():
+    scheduler = FyreScheduler(default_latency=0.05)
+    receiver = Receiver(scheduler)
+    assert scheduler.transmit('client', receiver, b'x' * 100)
+    scheduler.run()
+    assert receiver.arrivals == [(pytest.approx(0.05), b'x' * 100)]
+
+
+def test_bandwidth_serializes_packets_one_after_another():
+    scheduler = FyreScheduler()
+    receiver = Receiver(scheduler)
+    # 1000 bytes at 80 kbit/s take 0.1 seconds to put on the link
+    scheduler.set_link('client', receiver, latency=0.01, bandwidth=80000)
+    for _ in range(3):
+        assert scheduler.transmit('client', receiver, b'x' * 1000)
+    scheduler.run()
+    assert [time for time, _ in receiver.arrivals] == [pytest.approx(0.11), pytest.approx(0.21),
+                                                        pytest.approx(0.31)]
+
+
+def test_full_queue_drops_packets_until_delivered():
+    scheduler = FyreScheduler()
+    receiver = Receiver(scheduler)
+    link = scheduler.set_link('client', receiver, latency=0.01, queue_limit=2)
+    assert [scheduler.transmit('client', receiver, bytes([index])) for index in range(4)] == [True, True, False, False]
+    assert link.stats() == {"queued": 2, "sent": 2, "delivered": 0, "dropped": 2}
+    scheduler.run()
+    assert scheduler.transmit('client', receiver, b'\x04')
+    scheduler.run()
+    assert [packet for _, packet in receiver.arrivals] == [b'\x00', b'\x01', b'\x04']
+    assert scheduler.stats()["dropped"] == 2 and link.queued == 0
+
+
+def test_links_are_directional():
+    scheduler = FyreScheduler(default_latency=0.02)
+    link = scheduler.set_link('a', 'b', latency=0.5)
+    assert scheduler.get_link('a', 'b') is link
+    assert scheduler.get_link('b', 'a').latency == 0.02
+
+
+def test_send_packet_goes_through_the_scheduler():
+    platform = build_scenario({"firewalls": [{"name": "Firewall", "allowed_ports": [80], "members": ["10.0.0.2"]}],
+                               "clients": [{"name": "Client", "ip": "10.0.0.1"}],
+                               "servers": [{"name": "Web", "ip": "10.0.0.2", "services": {"website": 80}}]})
+    platform.scheduler = FyreScheduler(default_latency=0.01)
+    client, firewall = platform.clients[0], platform.firewalls[0]
+    assert client.send_packet("10.0.0.2", 80, 40000, "GET /")
+    assert client.send_packet("10.0.0.2", 22, 40000, "SSH")
+    assert firewall.metrics.counters['packets'] == 0
+    platform.scheduler.run()
+    assert (firewall.metrics.counters['allowed'], firewall.metrics.counters['dropped']) == (1, 1)
+    assert platform.scheduler.stats()["delivered"] == 2
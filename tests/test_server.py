@@ -0,0 +1,58 @@
+from fyre.common.fyre_events import WARNING
+from fyre.common.fyre_packet import FyrePacket
+from fyre.common.fyre_scheduler import FyreScheduler
+from fyre.parts.platform import Platform
+from fyre.parts.server import FyreServer
+
+
+def server_with_service(metrics_enabled: bool = True, **options):
+    platform = Platform()
+    platform.events.level = WARNING
+    platform.metrics_enabled = metrics_enabled
+    server = FyreServer(platform, None, None, "Web", "10.0.0.2")
+    return platform, server, server.register_service('website', 80, **options)
+
+
+def request(src: str = '10.0.0.1', dport: int = 80) -> FyrePacket:
+    return FyrePacket(src, '10.0.0.2', 40000, dport, load=b'GET /')
+
+
+def test_packets_are_dispatched_by_port():
+    platform, server, service = server_with_service()
+    assert server.process_packet(request())
+    assert not server.process_packet(request(dport=81))
+    assert service.metrics.counters['completed'] == 1
+    assert server.metrics.counters['no_service'] == 1
+
+
+def test_allowed_ips_are_checked():
+    platform, server, service = server_with_service()
+    service.add_ip('10.0.0.1')
+    assert server.process_packet(request())
+    assert not server.process_packet(request('10.0.0.3'))
+    assert service.metrics.counters['rejected_ip'] == 1
+
+
+def test_saturated_service_queues_then_drops():
+    platform, server, service = server_with_service(workers=2, queue_limit=3, service_time=1.0, distribution='fixed')
+    platform.scheduler = FyreScheduler()
+    accepted = [server.process_packet(request()) for _ in range(7)]
+    assert accepted == [True] * 5 + [False] * 2
+    platform.scheduler.run()
+    stats = service.stats()
+    assert stats["counters"]["completed"] == 5
+    assert stats["counters"]["dropped_queue"] == 2
+    assert platform.scheduler.now == 3.0
+
+
+def test_counters_are_not_updated_when_metrics_are_disabled():
+    platform, server, service = server_with_service(metrics_enabled=False, workers=1, queue_limit=0,
+                                                    service_time=1.0, distribution='fixed')
+    platform.scheduler = FyreScheduler()
+    assert server.process_packet(request())
+    assert not server.process_packet(request())
+    assert not server.process_packet(request(dport=81))
+    platform.scheduler.run()
+    assert service.busy == 0
+    assert not service.metrics.counters and not service.metrics.latency
+    assert not server.metrics.counters
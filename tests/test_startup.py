@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import cli
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_startup_modules_are_within_budget_and_light():
+    assert cli.check_startup() == []
+
+
+def test_heavy_imports_are_reported():
+    pytest.importorskip('tkinter')
+    problems = cli.check_startup(['fyre.fyre_ui'], budget=None, repeat=1)
+    assert problems == ["fyre.fyre_ui loads tkinter"]
+
+
+def test_startup_command_fails_over_budget():
+    command = [sys.executable, os.path.join(ROOT, 'cli.py'), 'startup', '--repeat', '1', '--top', '0']
+    assert subprocess.run(command, capture_output=True).returncode == 0
+    assert subprocess.run(command + ['--budget', '0.001'], capture_output=True).returncode == 1
@@ -0,0 +1,122 @@
+import pytest
+
+from fyre.common.fyre_topology import zone_path
+from fyre.fyre_scenario import build_scenario
+
+# Perimeter holds DMZ and Office, Lab is nested in Office, and Branch sits outside, linked to Office
+PARENTS = {'Perimeter': None, 'DMZ': 'Perimeter', 'Office': 'Perimeter', 'Lab': 'Office', 'Branch': None}
+LINKS = {'Office': ['Branch'], 'Branch': ['Office']}
+
+
+@pytest.mark.parametrize('source, destination, path', [
+    (None, 'Perimeter', ('Perimeter',)),
+    (None, 'Lab', ('Perimeter', 'Office', 'Lab')),
+    ('Lab', None, ()),
+    ('Lab', 'DMZ', ('DMZ',)),
+    ('DMZ', 'Lab', ('Office', 'Lab')),
+    ('Office', 'Office', ('Office',)),
+    ('Lab', 'Perimeter', ('Perimeter',)),
+])
+def test_nested_paths(source, destination, path):
+    assert zone_path(PARENTS, {}, source, destination) == path
+
+
+@pytest.mark.parametrize('source, destination, path', [
+    ('Branch', 'Lab', ('Office', 'Lab')),
+    ('Lab', 'Branch', ('Branch',)),
+    ('Branch', 'DMZ', ('Office', 'DMZ')),
+    (None, 'Lab', ('Perimeter', 'Office', 'Lab')),
+])
+def test_linked_zones(source, destination, path):
+    assert zone_path(PARENTS, LINKS, source, destination) == path
+
+
+def scenario() -> dict:
+    return {
+        "firewalls": [{"name": "Perimeter", "members": ["10.0.1.1"]},
+                      {"name": "Office", "parent": "Perimeter", "members": ["10.0.2.1"]},
+                      {"name": "Branch", "members": ["10.0.3.1"]}],
+        "clients": [{"name": "Outside", "ip": "10.0.0.1"}, {"name": "Remote", "ip": "10.0.3.1"}],
+        "servers": [{"name": "Gateway", "ip": "10.0.1.1"}, {"name": "Files", "ip": "10.0.2.1"}],
+    }
+
+
+def names(firewalls) -> list:
+    return [firewall.name for firewall in firewalls]
+
+
+def component(platform, ip: str):
+    return platform.get_fyre_component_by_ip(ip)[1]
+
+
+def test_paths_are_cached_per_pair_of_zones():
+    platform = build_scenario(scenario())
+    files = component(platform, "10.0.2.1")
+    assert names(platform.firewalls_between("10.0.0.1", files)) == ["Perimeter", "Office"]
+    misses = platform.topology.path_misses
+    assert names(platform.firewalls_between("10.0.0.1", files)) == ["Perimeter", "Office"]
+    # Another outside address shares the outside zone, so its path is already cached
+    assert names(platform.firewalls_between("192.168.0.1", files)) == ["Perimeter", "Office"]
+    assert platform.topology.path_misses == misses
+
+
+def test_moving_a_client_only_forgets_its_zone():
+    platform = build_scenario(scenario())
+    files, remote = component(platform, "10.0.2.1"), component(platform, "10.0.3.1")
+    assert names(platform.firewalls_between("10.0.3.1", files)) == ["Perimeter", "Office"]
+    rebuilds = platform.topology.rebuilds
+    platform.add_to_firewall(remote, platform.firewalls[1])
+    assert names(platform.firewalls_between("10.0.3.1", files)) == ["Office"]
+    assert platform.topology.rebuilds == rebuilds
+
+
+def test_linking_firewalls_discards_paths():
+    platform = build_scenario(scenario())
+    perimeter, office, branch = platform.firewalls
+    files = component(platform, "10.0.2.1")
+    assert names(platform.firewalls_between("10.0.3.1", files)) == ["Perimeter", "Office"]
+    platform.link_firewalls(office, branch)
+    assert names(platform.firewalls_between("10.0.3.1", files)) == ["Office"]
+    platform.topology.unlink(office)
+    assert names(platform.firewalls_between("10.0.3.1", files)) == ["Perimeter", "Office"]
+
+
+def test_removing_a_firewall_moves_its_members_to_its_parent():
+    platform = build_scenario(scenario())
+    perimeter, office, branch = platform.firewalls
+    files = component(platform, "10.0.2.1")
+    assert names(platform.firewalls_between("10.0.0.1", files)) == ["Perimeter", "Office"]
+    platform.remove_component(office)
+    assert platform.determine_if_component_is_within_firewall(files) is perimeter
+    assert names(platform.firewalls_between("10.0.0.1", files)) == ["Perimeter"]
+    platform.remove_component(perimeter)
+    assert platform.determine_if_component_is_within_firewall(files) is False
+    assert names(platform.firewalls_between("10.0.0.1", files)) == []
+
+
+def test_removing_a_nested_firewall_keeps_its_children_nested():
+    config = scenario()
+    config["firewalls"].append({"name": "Lab", "parent": "Office"})
+    platform = build_scenario(config)
+    perimeter, office, branch, lab = platform.firewalls
+    platform.remove_component(office)
+    assert platform.topology.parents[lab] is perimeter
+
+
+def test_scapy_frames_are_routed_by_their_ip_source():
+    pytest.importorskip('scapy')
+    from scapy.layers.inet import IP, TCP
+    from scapy.layers.l2 import Ether
+
+    # The client and server share Office, so only Office checks the packet; Perimeter would drop it
+    platform = build_scenario({
+        "firewalls": [{"name": "Perimeter", "allowed_ports": []},
+                      {"name": "Office", "parent": "Perimeter", "allowed_ports": [80],
+                       "members": ["10.0.2.1", "10.0.2.2"]}],
+        "clients": [{"name": "Staff", "ip": "10.0.2.1"}],
+        "servers": [{"name": "Files", "ip": "10.0.2.2", "services": {"website": 80}}],
+    })
+    perimeter, office = platform.firewalls
+    frame = Ether(src='02:00:00:00:00:01') / IP(src='10.0.2.1', dst='10.0.2.2') / TCP(sport=40000, dport=80)
+    assert component(platform, "10.0.2.2").receive_packet(frame)
+    assert perimeter.metrics.counters['packets'] == 0 and office.metrics.counters['allowed'] == 1
@@ -0,0 +1,43 @@
+import threading
+
+from fyre.common.fyre_traffic import TrafficMonitor
+
+
+def record_on_thread(monitor: TrafficMonitor, packets: int, flush: bool):
+    def record():
+        for _ in range(packets):
+            monitor.record('10.0.0.1', '10.0.0.2', 100, True)
+        if flush:
+            monitor.flush()
+
+    thread = threading.Thread(target=record)
+    thread.start()
+    thread.join()
+
+
+def test_reader_does_not_publish_for_another_thread():
+    monitor = TrafficMonitor(interval=3600)
+    record_on_thread(monitor, 10, flush=False)
+    # The partial window belongs to the recording thread, so the reader leaves it alone
+    assert monitor.sample().links == {}
+    assert monitor.links
+
+
+def test_reader_does_not_publish_before_the_first_record():
+    monitor = TrafficMonitor(interval=3600)
+    monitor.sample()
+    assert monitor.writer is None
+
+
+def test_flush_publishes_the_final_window():
+    monitor = TrafficMonitor(interval=3600)
+    record_on_thread(monitor, 10, flush=True)
+    assert monitor.sample().links == {('10.0.0.1', '10.0.0.2'): [10, 1000, 0]}
+
+
+def test_sample_publishes_on_the_recording_thread():
+    monitor = TrafficMonitor(interval=3600)
+    monitor.record('10.0.0.1', '10.0.0.2', 100, False, firewall='firewall')
+    sample = monitor.sample()
+    assert sample.links == {('10.0.0.1', '10.0.0.2'): [1, 100, 1]}
+    assert sample.firewalls == {'firewall': [0, 1]}